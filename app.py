@@ -1,11 +1,26 @@
-from flask import Flask, session
-from config import Config
+from flask import Flask
+from config import Config, opcoes_engine
 from routes.main import bp as main_bp
 from routes.groups import bp as groups_bp
 from routes.playoffs import bp as playoffs_bp
+from routes.eventos import bp as eventos_bp
+from routes.debug import bp as debug_bp
+from routes.escopo import configurar_escopo
 from flask_sqlalchemy import SQLAlchemy
 from database.db import db
+from database.models import Confronto, JogadorPermanente, RankingJogador, RatingJogador
+from database.ranking import RankingManager
+from database.rating import RatingManager
+from database.estado import EstadoSessionInterface, criar_estado_store
+from database.migracoes import MigracaoManager
+from database.arquivo import ArquivoManager
+from database.sincronizacao import SincronizacaoManager
+from database.cache import CacheRespostas, criar_cache_respostas
+from database.instrumentacao import configurar_instrumentacao
+from database.replica import configurar_replica
 from sqlalchemy import text
+import click
+import time
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -13,6 +28,18 @@ def create_app(config_class=Config):
 
     db.init_app(app)
 
+    # Estado do torneio fica no servidor; o cookie guarda apenas o id da sessão
+    app.session_interface = EstadoSessionInterface(criar_estado_store(app))
+
+    # Cache das páginas de leitura (home, ranking, detalhes, perfil)
+    criar_cache_respostas(app)
+
+    # Contagem e tempo das consultas SQL por requisição (Server-Timing e /debug/metrics)
+    configurar_instrumentacao(app)
+
+    # Páginas somente leitura na réplica, quando configurada
+    configurar_replica(app)
+
     with app.app_context():
         # Comentado para preservar os dados entre reinicializações
         # db.session.execute(text('DROP SCHEMA public CASCADE'))
@@ -22,23 +49,99 @@ def create_app(config_class=Config):
         # Apenas cria tabelas que não existem ainda
         db.create_all()
 
+        # Índices e restrições em tabelas que já existiam
+        MigracaoManager.aplicar_pendentes()
+
+        # Popula o ranking materializado na primeira execução
+        if not RankingJogador.query.first() and JogadorPermanente.query.first():
+            RankingManager.reconstruir_ranking()
+
+        # Rating reprocessado a partir de todos os jogos na primeira execução
+        if not RatingJogador.query.first() and Confronto.query.first():
+            RatingManager.reconstruir()
+
     # --------------------------------------
     # Registro de Blueprints
     # --------------------------------------
     app.register_blueprint(main_bp)
     app.register_blueprint(groups_bp)
     app.register_blueprint(playoffs_bp)
+    app.register_blueprint(eventos_bp)
+    app.register_blueprint(debug_bp)
+
+    # Rotas de grupos e eliminatórias também em /torneio/<id>/... (vários torneios ao mesmo tempo)
+    configurar_escopo(app)
 
     # --------------------------------------
-    # Configurações de Sessão
+    # Comandos de Manutenção
     # --------------------------------------
-    @app.before_request
-    def init_session():
-        """Garante estruturas básicas na sessão"""
-        session.setdefault('jogadores', {})
-        session.setdefault('grupos', [])
-        session.setdefault('confrontos', [])
-        session.setdefault('modo_torneio', '28j')
+    @app.cli.command('reconstruir-ranking')
+    def reconstruir_ranking():
+        """Reconstrói o ranking materializado a partir de todos os torneios"""
+        total = RankingManager.reconstruir_ranking()
+        if total is None:
+            raise click.ClickException("Erro ao reconstruir o ranking")
+        CacheRespostas.invalidar()
+        click.echo(f"Ranking reconstruído com {total} jogadores")
+
+    @app.cli.command('reconstruir-ratings')
+    def reconstruir_ratings():
+        """Reprocessa o rating de todos os jogadores a partir de todos os jogos"""
+        inicio = time.perf_counter()
+        jogos = RatingManager.reconstruir()
+        if jogos is None:
+            raise click.ClickException("Erro ao reconstruir os ratings")
+        CacheRespostas.invalidar()
+        click.echo(f"Ratings reconstruídos com {jogos} jogos em {time.perf_counter() - inicio:.2f}s")
+
+    @app.cli.command('arquivar-torneios')
+    @click.option('--dias', type=int, default=None,
+                  help='Idade mínima dos torneios finalizados (padrão: ARQUIVO_IDADE_DIAS)')
+    def arquivar_torneios(dias):
+        """Move torneios finalizados antigos para o arquivo"""
+        if dias is None:
+            dias = app.config.get('ARQUIVO_IDADE_DIAS', 365)
+        total = ArquivoManager.arquivar_antigos(dias)
+        if total:
+            CacheRespostas.invalidar()
+        click.echo(f"{total} torneios arquivados")
+
+    @app.cli.command('sincronizar-torneios')
+    @click.option('--intervalo', type=int, default=None,
+                  help='Repete o envio a cada N segundos (padrão: envia uma vez e sai)')
+    def sincronizar_torneios(intervalo):
+        """Envia os torneios finalizados deste nó para o banco central (CENTRAL_DATABASE_URL)"""
+        url_central = app.config.get('CENTRAL_DATABASE_URL')
+        if not url_central:
+            raise click.ClickException("Defina CENTRAL_DATABASE_URL para sincronizar")
+
+        class ConfigCentral(config_class):
+            SQLALCHEMY_DATABASE_URI = url_central
+            SQLALCHEMY_ENGINE_OPTIONS = opcoes_engine(url_central)
+            SQLALCHEMY_BINDS = {}
+            CACHE_BACKEND = 'desligado'
+
+        app_central = create_app(ConfigCentral)
+        while True:
+            enviados = SincronizacaoManager.sincronizar(app_central, app.config['NO_LOCAL'])
+            pendentes = len(SincronizacaoManager.pendentes())
+            click.echo(f"{enviados} torneios enviados ao banco central, {pendentes} pendentes")
+            if intervalo is None:
+                break
+            time.sleep(intervalo)
+
+        if pendentes:
+            raise click.ClickException("Há torneios não sincronizados; veja o log")
+
+    @app.cli.command('migrar')
+    def migrar():
+        """Aplica as migrações de esquema pendentes"""
+        MigracaoManager.aplicar_pendentes()
+        pendentes = MigracaoManager.pendentes()
+        if pendentes:
+            nomes = ', '.join(f"{versao} ({nome})" for versao, nome in pendentes)
+            raise click.ClickException(f"Migrações não aplicadas: {nomes}")
+        click.echo("Esquema atualizado")
 
     return app
 
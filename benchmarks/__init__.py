@@ -0,0 +1 @@
+"""Benchmarks das rotas e do ranking com dados sintéticos"""
@@ -0,0 +1,197 @@
+"""Mede rotas e o ranking com um arquivo de torneios sintéticos
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.executar --jogadores 500 --torneios 100
+    python -m benchmarks.executar --saida benchmarks/baseline.json
+    python -m benchmarks.executar --comparar benchmarks/baseline.json
+
+Sem --banco usa um SQLite temporário; para Postgres passe a URL de um banco
+descartável (as tabelas são criadas nele e os dados não são apagados).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+
+def _percentil(valores, fracao):
+    """Percentil pelo método do posto mais próximo"""
+    ordenados = sorted(valores)
+    posicao = max(0, min(len(ordenados) - 1, int(round(fracao * len(ordenados) + 0.5)) - 1))
+    return ordenados[posicao]
+
+
+def _preparar_aplicacao(url_banco):
+    """Cria a aplicação apontando para o banco do benchmark"""
+    # Precisa estar no ambiente antes de importar config/app (o .env não sobrescreve)
+    os.environ['DATABASE_URL'] = url_banco
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+    import config
+    from app import create_app
+
+    class ConfigBenchmark(config.Config):
+        TESTING = True
+        # Mede a renderização, não o cache de páginas
+        CACHE_BACKEND = 'desligado'
+        INSTRUMENTACAO_SQL = False
+
+    return create_app(ConfigBenchmark)
+
+
+def _medir(funcao, repeticoes, contador):
+    """Executa `funcao` `repeticoes` vezes (mais um aquecimento) e resume latência e consultas"""
+    funcao()
+    tempos = []
+    consultas = []
+    for _ in range(repeticoes):
+        contador['consultas'] = 0
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(contador['consultas'])
+    return {
+        'p50_ms': round(_percentil(tempos, 0.50), 3),
+        'p95_ms': round(_percentil(tempos, 0.95), 3),
+        'media_ms': round(sum(tempos) / len(tempos), 3),
+        'consultas': max(consultas)
+    }
+
+
+def _requisicao(cliente, url):
+    def executar():
+        resposta = cliente.get(url)
+        if resposta.status_code != 200:
+            raise RuntimeError(f"GET {url}: status {resposta.status_code}")
+    return executar
+
+
+def executar_benchmark(url_banco, num_jogadores, num_torneios, repeticoes, semente):
+    from sqlalchemy import event
+    from benchmarks.gerador import criar_jogadores_permanentes, gerar_torneios, iniciar_torneio
+    from database.db import db
+    from database.models import RankingJogador, Torneio
+    from database.ranking import RankingManager
+
+    app = _preparar_aplicacao(url_banco)
+    inicio = time.perf_counter()
+    jogadores = criar_jogadores_permanentes(app, num_jogadores)
+    cliente = gerar_torneios(app, num_torneios, jogadores, semente)
+    # Um torneio em andamento, com os grupos jogados, para novo-torneio e fase_eliminatoria
+    iniciar_torneio(cliente, "Torneio em andamento", '28j', 'separados', jogadores, random.Random(semente))
+    geracao_s = time.perf_counter() - inicio
+    print(f"{num_torneios} torneios gerados em {geracao_s:.1f} s", file=sys.stderr)
+
+    contador = {'consultas': 0}
+    with app.app_context():
+        primeiro_id = db.session.query(db.func.min(Torneio.id)).filter(Torneio.finalizado.is_(True)).scalar()
+        # Perfil do líder do ranking: um dos jogadores com mais torneios
+        nome_perfil = db.session.query(RankingJogador.nome).order_by(
+            RankingJogador.posicao, RankingJogador.nome).limit(1).scalar()
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def contar(*args):
+            contador['consultas'] += 1
+
+    def ranking():
+        with app.app_context():
+            RankingManager.obter_ranking()
+
+    def ranking_top10():
+        with app.app_context():
+            RankingManager.obter_ranking(limite=10)
+
+    casos = {
+        'home': _requisicao(cliente, '/'),
+        'novo_torneio': _requisicao(cliente, '/novo-torneio'),
+        'fase_eliminatoria': _requisicao(cliente, '/fase_eliminatoria'),
+        'ranking_completo': _requisicao(cliente, '/ranking-completo'),
+        'detalhes_torneio': _requisicao(cliente, f'/detalhes-torneio/{primeiro_id}'),
+        'perfil_jogador': _requisicao(cliente, f'/perfil_jogador?nome_jogador={nome_perfil}'),
+        'RankingManager.obter_ranking': ranking,
+        'RankingManager.obter_ranking(limite=10)': ranking_top10,
+    }
+    resultados = {}
+    for nome, funcao in casos.items():
+        resultados[nome] = _medir(funcao, repeticoes, contador)
+        print(f"{nome:42s} p50 {resultados[nome]['p50_ms']:9.2f} ms  "
+              f"p95 {resultados[nome]['p95_ms']:9.2f} ms  consultas {resultados[nome]['consultas']}",
+              file=sys.stderr)
+
+    with app.app_context():
+        dialeto = db.engine.dialect.name
+
+    return {
+        'parametros': {
+            'jogadores': num_jogadores,
+            'torneios': num_torneios,
+            'repeticoes': repeticoes,
+            'semente': semente,
+            'banco': dialeto,
+            'python': platform.python_version(),
+            'data': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'geracao_s': round(geracao_s, 2)
+        },
+        'resultados': resultados
+    }
+
+
+def comparar(atual, referencia, tolerancia):
+    """Lista as regressões em relação à referência (p95 acima da tolerância ou mais consultas)"""
+    regressoes = []
+    for nome, medida in atual['resultados'].items():
+        base = referencia.get('resultados', {}).get(nome)
+        if base is None:
+            continue
+        if medida['consultas'] > base['consultas']:
+            regressoes.append(f"{nome}: {base['consultas']} -> {medida['consultas']} consultas")
+        if medida['p95_ms'] > base['p95_ms'] * (1 + tolerancia):
+            regressoes.append(f"{nome}: p95 {base['p95_ms']:.2f} -> {medida['p95_ms']:.2f} ms")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--banco', help='URL do banco (padrão: SQLite temporário)')
+    parser.add_argument('--jogadores', type=int, default=200, help='Jogadores permanentes cadastrados')
+    parser.add_argument('--torneios', type=int, default=30, help='Torneios completos gerados')
+    parser.add_argument('--repeticoes', type=int, default=30, help='Medições por rota')
+    parser.add_argument('--semente', type=int, default=1, help='Semente dos sorteios e placares')
+    parser.add_argument('--saida', help='Grava o resultado neste arquivo JSON')
+    parser.add_argument('--comparar', help='JSON de referência; sai com código 1 se houver regressão')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='Folga no p95 antes de acusar regressão')
+    args = parser.parse_args(argv)
+
+    if args.jogadores < 32:
+        parser.error('--jogadores precisa ser pelo menos 32 (modo 32j)')
+
+    url_banco = args.banco or 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='benchmark_'), 'benchmark.db')
+    resultado = executar_benchmark(url_banco, args.jogadores, args.torneios, args.repeticoes, args.semente)
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+    else:
+        print(texto)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            referencia = json.load(arquivo)
+        if referencia.get('parametros', {}).get('torneios') != args.torneios:
+            print("Aviso: a referência foi gerada com outra quantidade de torneios", file=sys.stderr)
+        regressoes = comparar(resultado, referencia, args.tolerancia)
+        for regressao in regressoes:
+            print(f"REGRESSÃO {regressao}", file=sys.stderr)
+        return 1 if regressoes else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
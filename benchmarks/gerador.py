@@ -0,0 +1,118 @@
+"""Gerador de torneios sintéticos
+
+Os torneios são jogados pelas próprias rotas (sorteio, grupos, eliminatórias
+e final) com o cliente de testes do Flask, então os dados gravados são os
+mesmos que um torneio real produziria.
+"""
+import random
+import re
+from sqlalchemy import insert
+from database.db import db
+from database.models import JogadorPermanente
+
+
+MODOS = ['16j', '20j', '24j', '28j', '32j']
+FORMATOS = ['separados', 'mistos']
+
+CAMPO_GRUPO = re.compile(r'name="(grupo_\d+_confronto_\d+_duplaA_favor)"')
+CAMPO_OCULTO = re.compile(r'name="((?:timeA|timeB)_jogador\d(?:_\d+)?)" value="([^"]*)"')
+CAMPO_JOGO = re.compile(r'name="jogo_(\d+)_timeA"')
+CAMPO_MODO = re.compile(r'name="modo" value="([^"]*)"')
+
+
+def placar(rng):
+    """Placar de um set (sem empate): quase sempre 6 x 0..4, às vezes 7 x 5 ou 7 x 6"""
+    sorteio = rng.random()
+    if sorteio < 0.8:
+        vencedor, perdedor = 6, rng.randint(0, 4)
+    elif sorteio < 0.92:
+        vencedor, perdedor = 7, 5
+    else:
+        vencedor, perdedor = 7, 6
+    return (vencedor, perdedor) if rng.random() < 0.5 else (perdedor, vencedor)
+
+
+def nomes_jogadores(quantidade):
+    return [f"Jogador {indice:05d}" for indice in range(1, quantidade + 1)]
+
+
+def criar_jogadores_permanentes(app, quantidade):
+    """Cadastra `quantidade` jogadores permanentes e devolve os nomes"""
+    nomes = nomes_jogadores(quantidade)
+    with app.app_context():
+        db.session.execute(insert(JogadorPermanente), [{'nome': nome} for nome in nomes])
+        db.session.commit()
+    return nomes
+
+
+def _formulario_eliminatoria(html, acao, rng):
+    """Campos do formulário `acao` da fase eliminatória preenchidos com placares"""
+    inicio = html.find(f'action="{acao}"')
+    if inicio < 0:
+        return None
+    trecho = html[inicio:html.find('</form>', inicio)]
+    campos = dict(CAMPO_OCULTO.findall(trecho))
+    for jogo in CAMPO_JOGO.findall(trecho):
+        pontos_a, pontos_b = placar(rng)
+        campos[f'jogo_{jogo}_timeA'] = str(pontos_a)
+        campos[f'jogo_{jogo}_timeB'] = str(pontos_b)
+    modo = CAMPO_MODO.search(trecho)
+    if modo:
+        campos['modo'] = modo.group(1)
+    return campos
+
+
+def _verificar(resposta, esperado, etapa):
+    if resposta.status_code != esperado:
+        raise RuntimeError(f"{etapa}: status {resposta.status_code} (esperado {esperado})")
+
+
+def iniciar_torneio(cliente, nome, modo, formato, jogadores, rng):
+    """Sorteia um torneio e salva todos os jogos da fase de grupos"""
+    _verificar(cliente.post('/sorteio', data={
+        'modo_torneio': modo,
+        'nome_torneio': nome,
+        'formato_eliminatoria': formato,
+        'jogadores': ', '.join(rng.sample(jogadores, int(modo[:-1])))
+    }), 302, 'sorteio')
+
+    resposta = cliente.get('/novo-torneio')
+    _verificar(resposta, 200, 'novo-torneio')
+    dados = {}
+    for campo in set(CAMPO_GRUPO.findall(resposta.get_data(as_text=True))):
+        pontos_a, pontos_b = placar(rng)
+        dados[campo] = str(pontos_a)
+        dados[campo.replace('duplaA', 'duplaB')] = str(pontos_b)
+    _verificar(cliente.post('/salvar_todos_grupos', data=dados), 302, 'salvar_todos_grupos')
+
+
+def jogar_torneio(cliente, nome, modo, formato, jogadores, rng):
+    """Joga um torneio completo, do sorteio até a finalização"""
+    iniciar_torneio(cliente, nome, modo, formato, jogadores, rng)
+
+    for acao in ('/salvar_eliminatorias', '/salvar_semi_finais', '/salvar_final'):
+        resposta = cliente.get('/fase_eliminatoria')
+        _verificar(resposta, 200, 'fase_eliminatoria')
+        campos = _formulario_eliminatoria(resposta.get_data(as_text=True), acao, rng)
+        # Modos sem quartas de final não têm o primeiro formulário
+        if campos is not None:
+            _verificar(cliente.post(acao, data=campos), 302, acao)
+
+    resposta = cliente.get('/finalizar_torneio')
+    if resposta.status_code != 302 or '/campeoes' not in (resposta.location or ''):
+        raise RuntimeError(f"finalizar_torneio: torneio {nome} não foi finalizado")
+    # Volta para a home como o usuário faz ao sair da tela de campeões (limpa a sessão)
+    _verificar(cliente.get('/home_page'), 302, 'home_page')
+
+
+def gerar_torneios(app, quantidade, jogadores, semente):
+    """Joga `quantidade` torneios alternando modos e formatos de eliminatória"""
+    rng = random.Random(semente)
+    # O sorteio dos grupos usa o módulo random diretamente
+    random.seed(semente)
+    cliente = app.test_client()
+    combinacoes = [(modo, formato) for formato in FORMATOS for modo in MODOS]
+    for indice in range(quantidade):
+        modo, formato = combinacoes[indice % len(combinacoes)]
+        jogar_torneio(cliente, f"Torneio {indice + 1}", modo, formato, jogadores, rng)
+    return cliente
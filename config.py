@@ -1,15 +1,70 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 load_dotenv()
 
+def opcoes_engine(url):
+    """Opções do engine do SQLAlchemy de acordo com o banco da URL"""
+    if url and url.startswith('sqlite'):
+        # Banco local: esperar o lock de escrita em vez de falhar (pragmas em database/db.py)
+        return {'connect_args': {'timeout': float(os.getenv('SQLITE_TIMEOUT', 15))}}
+    return {
+        'pool_pre_ping': True,
+        'pool_recycle': 300,
+        'connect_args': {'sslmode': os.getenv('DATABASE_SSLMODE', 'require')}
+    }
+
+
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY')
     TEMPLATES_AUTO_RELOAD = True
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ENGINE_OPTIONS = {
-    'pool_pre_ping': True,
-    'pool_recycle': 300,
-    'connect_args': {'sslmode': 'require'}
-    }
\ No newline at end of file
+    HISTORICO_POR_PAGINA = int(os.getenv('HISTORICO_POR_PAGINA', 20))
+    # Fase eliminatória: jogo entre os perdedores das semi-finais (database/chave.py); gravado no torneio ao sortear
+    DISPUTA_TERCEIRO_LUGAR = os.getenv('DISPUTA_TERCEIRO_LUGAR', '0') == '1'
+    # Tempo máximo da busca do sorteio que evita parcerias repetidas
+    SORTEIO_OTIMIZACAO_MS = int(os.getenv('SORTEIO_OTIMIZACAO_MS', 300))
+    # Chances de classificação (database/simulacao.py): tempo, teto de simulações e processos (0 = no próprio worker)
+    SIMULACAO_ORCAMENTO_MS = int(os.getenv('SIMULACAO_ORCAMENTO_MS', 200))
+    SIMULACAO_MAX_EXECUCOES = int(os.getenv('SIMULACAO_MAX_EXECUCOES', 20000))
+    SIMULACAO_PROCESSOS = int(os.getenv('SIMULACAO_PROCESSOS', 0))
+    SIMULACAO_MAX_TORNEIOS = int(os.getenv('SIMULACAO_MAX_TORNEIOS', 32))  # Resultados guardados (LRU)
+    # Estado do torneio no servidor: 'banco' (tabela estado_sessao) ou 'arquivo'
+    ESTADO_BACKEND = os.getenv('ESTADO_BACKEND', 'banco')
+    ESTADO_DIRETORIO = os.getenv('ESTADO_DIRETORIO')
+    # Autocomplete de jogadores: conferência de novos cadastros e cache do navegador
+    BUSCA_VERIFICACAO_SEGUNDOS = int(os.getenv('BUSCA_VERIFICACAO_SEGUNDOS', 5))
+    BUSCA_MAX_AGE = int(os.getenv('BUSCA_MAX_AGE', 30))
+    # Cache de páginas: 'memoria' (por processo), 'sqlite' (arquivo local, vários workers) ou 'desligado'
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memoria')
+    CACHE_ARQUIVO = os.getenv('CACHE_ARQUIVO')
+    CACHE_TTL = int(os.getenv('CACHE_TTL', 60))
+    CACHE_MAX_ITENS = int(os.getenv('CACHE_MAX_ITENS', 256))
+    # Placar ao vivo (SSE): consulta de eventos novos e renovação das conexões
+    EVENTOS_INTERVALO = float(os.getenv('EVENTOS_INTERVALO', 1.0))
+    EVENTOS_KEEPALIVE = int(os.getenv('EVENTOS_KEEPALIVE', 15))
+    EVENTOS_DURACAO_CONEXAO = int(os.getenv('EVENTOS_DURACAO_CONEXAO', 300))
+    EVENTOS_RETENCAO_HORAS = int(os.getenv('EVENTOS_RETENCAO_HORAS', 48))
+    # Arquivo: torneios finalizados há mais dias que isso saem das tabelas do dia a dia
+    ARQUIVO_IDADE_DIAS = int(os.getenv('ARQUIVO_IDADE_DIAS', 365))
+    # Instrumentação SQL: limites dos logs de lentidão e de comandos repetidos (N+1)
+    INSTRUMENTACAO_SQL = os.getenv('INSTRUMENTACAO_SQL', '1') == '1'
+    SQL_CONSULTA_LENTA_MS = float(os.getenv('SQL_CONSULTA_LENTA_MS', 100))
+    SQL_REQUISICAO_LENTA_MS = float(os.getenv('SQL_REQUISICAO_LENTA_MS', 500))
+    SQL_REPETICOES_N_MAIS_1 = int(os.getenv('SQL_REPETICOES_N_MAIS_1', 5))
+    # /debug/metrics fora do modo debug só com ?token= ou cabeçalho X-Metricas-Token
+    METRICAS_TOKEN = os.getenv('METRICAS_TOKEN')
+    # Nó local (SQLite na quadra): nome usado em torneio.origem e URL do Postgres central
+    NO_LOCAL = os.getenv('NO_LOCAL') or socket.gethostname()
+    CENTRAL_DATABASE_URL = os.getenv('CENTRAL_DATABASE_URL')
+    SQLALCHEMY_ENGINE_OPTIONS = opcoes_engine(SQLALCHEMY_DATABASE_URI)
+    # Réplica de leitura opcional para as páginas públicas (database/replica.py); quem
+    # gravou algo lê do principal durante REPLICA_ATRASO_SEGUNDOS
+    REPLICA_DATABASE_URL = os.getenv('REPLICA_DATABASE_URL')
+    REPLICA_ATRASO_SEGUNDOS = float(os.getenv('REPLICA_ATRASO_SEGUNDOS', 10))
+    SQLALCHEMY_BINDS = (
+        {'replica': {'url': REPLICA_DATABASE_URL, **opcoes_engine(REPLICA_DATABASE_URL)}}
+        if REPLICA_DATABASE_URL else {}
+    )
@@ -0,0 +1,101 @@
+"""Arquivo de torneios antigos: mantém pequenas as tabelas usadas no dia a dia
+
+Um torneio arquivado perde jogadores, participações, confrontos e eventos;
+ficam o registro em torneio, o snapshot da página de detalhes e uma linha
+por jogador em jogador_arquivado, que continua contando no ranking e no perfil.
+"""
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert
+from database.db import db
+from database.models import (Jogador, JogadorArquivado, Torneio, Confronto, ConfrontoEliminatoria,
+                             ParticipacaoTorneio, EventoTorneio)
+from database.snapshot import SnapshotManager
+
+
+logger = logging.getLogger(__name__)
+
+
+class ArquivoManager:
+    """Classe para mover torneios finalizados para o arquivo"""
+
+    @staticmethod
+    def candidatos(dias):
+        """Ids dos torneios finalizados, não arquivados, criados há mais de `dias` dias"""
+        limite = datetime.utcnow() - timedelta(days=dias)
+        return [torneio_id for (torneio_id,) in db.session.query(Torneio.id).filter(
+            Torneio.finalizado.is_(True),
+            Torneio.arquivado.is_(False),
+            Torneio.data_criacao < limite
+        ).order_by(Torneio.id)]
+
+    @staticmethod
+    def _resumir_jogadores(torneio_id):
+        """Linhas de jogador_arquivado com os dados que o ranking e o perfil usam"""
+        jogadores = Jogador.query.filter_by(torneio_id=torneio_id).all()
+        vitorias_grupo = dict(db.session.query(
+            ParticipacaoTorneio.jogador_permanente_id, ParticipacaoTorneio.vitorias
+        ).filter(ParticipacaoTorneio.torneio_id == torneio_id).all())
+
+        # Jogos e vitórias nas eliminatórias (empate conta para a dupla B, como no perfil)
+        jogos = {}
+        vitorias = {}
+        for confronto in ConfrontoEliminatoria.query.filter_by(torneio_id=torneio_id).all():
+            if confronto.pontos_dupla_a is None or confronto.pontos_dupla_b is None:
+                time_a_venceu = time_b_venceu = False
+            else:
+                time_a_venceu = confronto.pontos_dupla_a > confronto.pontos_dupla_b
+                time_b_venceu = not time_a_venceu
+            for jogador_id, venceu in ((confronto.jogador_a1_id, time_a_venceu),
+                                       (confronto.jogador_a2_id, time_a_venceu),
+                                       (confronto.jogador_b1_id, time_b_venceu),
+                                       (confronto.jogador_b2_id, time_b_venceu)):
+                jogos[jogador_id] = jogos.get(jogador_id, 0) + 1
+                vitorias[jogador_id] = vitorias.get(jogador_id, 0) + int(venceu)
+
+        return [{
+            'torneio_id': torneio_id,
+            'jogador_id': jogador.id,
+            'jogador_permanente_id': jogador.jogador_permanente_id,
+            'nome': jogador.nome,
+            'pontuacao': jogador.pontuacao or 0,
+            'vitorias_grupo': vitorias_grupo.get(jogador.jogador_permanente_id) or 0,
+            'jogos_eliminatorias': jogos.get(jogador.id, 0),
+            'vitorias_eliminatorias': vitorias.get(jogador.id, 0)
+        } for jogador in jogadores]
+
+    @staticmethod
+    def arquivar_torneio(torneio_id):
+        """Arquiva um torneio finalizado; retorna True se arquivou"""
+        try:
+            torneio = db.session.get(Torneio, torneio_id)
+            if not torneio or not torneio.finalizado or torneio.arquivado:
+                return False
+
+            # A página de detalhes passa a depender só do snapshot
+            if SnapshotManager.gerar(torneio_id) is None:
+                logger.error(f"Torneio {torneio_id} não arquivado: falha ao gerar o snapshot")
+                return False
+
+            resumo = ArquivoManager._resumir_jogadores(torneio_id)
+            if resumo:
+                db.session.execute(insert(JogadorArquivado), resumo)
+
+            # Confrontos antes dos jogadores, que eles referenciam
+            for modelo in (Confronto, ConfrontoEliminatoria, EventoTorneio, Jogador, ParticipacaoTorneio):
+                db.session.execute(delete(modelo).where(modelo.torneio_id == torneio_id))
+
+            torneio.arquivado = True
+            db.session.commit()
+            logger.info(f"Torneio {torneio_id} arquivado ({len(resumo)} jogadores)")
+            return True
+
+        except Exception as e:
+            logger.error(f"Erro ao arquivar torneio {torneio_id}: {str(e)}")
+            db.session.rollback()
+            return False
+
+    @staticmethod
+    def arquivar_antigos(dias):
+        """Arquiva os torneios finalizados há mais de `dias` dias; retorna quantos"""
+        return sum(ArquivoManager.arquivar_torneio(torneio_id) for torneio_id in ArquivoManager.candidatos(dias))
@@ -0,0 +1,145 @@
+"""Índice em memória para o autocomplete de nomes de jogadores"""
+import bisect
+import logging
+import threading
+import time
+import unicodedata
+from flask import current_app, jsonify, request
+from sqlalchemy import func
+from database.db import db
+from database.models import JogadorPermanente
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalizar_nome(texto):
+    """Remove acentos e caixa para comparar nomes ('Zé' -> 'ze')"""
+    decomposto = unicodedata.normalize('NFKD', texto)
+    sem_acento = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acento.casefold().split())
+
+
+class IndiceNomes:
+    """Nomes normalizados em ordem, com uma entrada por início de palavra
+
+    Buscas por prefixo (do nome ou de qualquer palavra) usam bisect; o
+    restante das ocorrências no meio de palavras cai numa varredura simples
+    dos nomes já normalizados.
+    """
+
+    def __init__(self, jogadores, max_id):
+        self.max_id = max_id
+        # (nome normalizado, nome, id) em ordem alfabética do nome original
+        self.jogadores = sorted(
+            ((normalizar_nome(nome), nome, jogador_id) for jogador_id, nome in jogadores),
+            key=lambda j: (j[1], j[2])
+        )
+        # (trecho a partir do início de cada palavra, posição em self.jogadores)
+        self.palavras = []
+        for posicao, (normalizado, _, _) in enumerate(self.jogadores):
+            inicio = 0
+            for palavra in normalizado.split(' '):
+                self.palavras.append((normalizado[inicio:], posicao))
+                inicio += len(palavra) + 1
+        self.palavras.sort()
+
+    def buscar(self, termo, limite=10, excluir=None):
+        """Retorna [{'id', 'nome'}] com prefixos primeiro e depois o restante"""
+        chave = normalizar_nome(termo)
+        if not chave:
+            return []
+        excluir = excluir or set()
+
+        # Prefixos de palavra: faixa contígua na lista ordenada
+        prefixos = set()
+        inicio = bisect.bisect_left(self.palavras, (chave,))
+        for trecho, posicao in self.palavras[inicio:]:
+            if not trecho.startswith(chave):
+                break
+            prefixos.add(posicao)
+
+        ordem = sorted(prefixos)
+        if len(ordem) < limite + len(excluir):
+            ordem += [
+                posicao for posicao, (normalizado, _, _) in enumerate(self.jogadores)
+                if posicao not in prefixos and chave in normalizado
+            ]
+
+        resultados = []
+        for posicao in ordem:
+            _, nome, jogador_id = self.jogadores[posicao]
+            if jogador_id in excluir:
+                continue
+            resultados.append({'id': jogador_id, 'nome': nome})
+            if len(resultados) >= limite:
+                break
+        return resultados
+
+
+class BuscaJogadores:
+    """Classe para manter e consultar o índice de nomes da aplicação atual"""
+
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _estado():
+        """Estado do índice guardado nas extensões da aplicação"""
+        return current_app.extensions.setdefault('busca_jogadores', {
+            'indice': None,
+            'verificado_em': 0.0
+        })
+
+    @staticmethod
+    def invalidar():
+        """Força a conferência do índice na próxima busca (chamar após criar jogadores)"""
+        BuscaJogadores._estado()['verificado_em'] = 0.0
+
+    @staticmethod
+    def obter_indice():
+        """Retorna o índice, reconstruindo-o se houver jogadores novos no banco
+
+        Outros processos também criam jogadores, então o maior id é conferido
+        no banco a cada BUSCA_VERIFICACAO_SEGUNDOS, e não a cada tecla.
+        """
+        estado = BuscaJogadores._estado()
+        intervalo = current_app.config.get('BUSCA_VERIFICACAO_SEGUNDOS', 5)
+        agora = time.monotonic()
+
+        if estado['indice'] is not None and agora - estado['verificado_em'] < intervalo:
+            return estado['indice']
+
+        with BuscaJogadores._lock:
+            if estado['indice'] is not None and agora - estado['verificado_em'] < intervalo:
+                return estado['indice']
+
+            max_id = db.session.query(func.max(JogadorPermanente.id)).scalar() or 0
+            if estado['indice'] is None or estado['indice'].max_id != max_id:
+                jogadores = db.session.query(JogadorPermanente.id, JogadorPermanente.nome).all()
+                estado['indice'] = IndiceNomes(jogadores, max_id)
+                logger.info(f"Índice de nomes reconstruído com {len(jogadores)} jogadores")
+            estado['verificado_em'] = agora
+
+        return estado['indice']
+
+    @staticmethod
+    def buscar(termo, limite=10, excluir=None):
+        """Busca jogadores pelo nome ignorando acentos e caixa"""
+        return BuscaJogadores.obter_indice().buscar(termo, limite, excluir)
+
+
+def responder_busca(resultados, privada=False):
+    """Resposta JSON com ETag e Cache-Control para o navegador reaproveitar
+
+    Resultados que dependem do torneio da sessão são privados e sempre
+    revalidados; os demais podem ser reusados por BUSCA_MAX_AGE segundos.
+    """
+    resposta = jsonify(resultados)
+    resposta.add_etag()
+    if privada:
+        resposta.cache_control.private = True
+        resposta.cache_control.no_cache = True
+    else:
+        resposta.cache_control.public = True
+        resposta.cache_control.max_age = current_app.config.get('BUSCA_MAX_AGE', 30)
+    return resposta.make_conditional(request)
@@ -0,0 +1,198 @@
+"""Cache das páginas de leitura, invalidado por uma versão global dos dados"""
+import functools
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g, make_response, request
+
+
+logger = logging.getLogger(__name__)
+
+
+class CacheMemoria:
+    """LRU com TTL no próprio processo (a versão não é vista por outros workers)"""
+
+    def __init__(self, max_itens=256):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._versao = 0
+        self._lock = threading.Lock()
+
+    def versao(self):
+        return self._versao
+
+    def incrementar_versao(self):
+        with self._lock:
+            self._versao += 1
+            self._itens.clear()
+
+    def obter(self, chave):
+        """Retorna (etag, corpo) ou None se ausente ou expirado"""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            expira_em, etag, corpo = item
+            if expira_em < time.time():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return etag, corpo
+
+    def guardar(self, chave, etag, corpo, ttl):
+        with self._lock:
+            self._itens[chave] = (time.time() + ttl, etag, corpo)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+
+class CacheSQLite:
+    """Cache em um arquivo SQLite local, compartilhado pelos workers da máquina"""
+
+    def __init__(self, caminho, max_itens=256):
+        self.caminho = caminho
+        self.max_itens = max_itens
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS versao (id INTEGER PRIMARY KEY, valor INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO versao (id, valor) VALUES (1, 0)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS respostas ("
+                "chave TEXT PRIMARY KEY, etag TEXT NOT NULL, corpo BLOB NOT NULL, "
+                "expira_em REAL NOT NULL, usado_em REAL NOT NULL)"
+            )
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho, timeout=5)
+
+    def versao(self):
+        with self._conectar() as conn:
+            return conn.execute("SELECT valor FROM versao WHERE id = 1").fetchone()[0]
+
+    def incrementar_versao(self):
+        with self._conectar() as conn:
+            conn.execute("UPDATE versao SET valor = valor + 1 WHERE id = 1")
+            conn.execute("DELETE FROM respostas")
+
+    def obter(self, chave):
+        agora = time.time()
+        with self._conectar() as conn:
+            linha = conn.execute(
+                "SELECT etag, corpo FROM respostas WHERE chave = ? AND expira_em >= ?", (chave, agora)
+            ).fetchone()
+            if linha is None:
+                return None
+            conn.execute("UPDATE respostas SET usado_em = ? WHERE chave = ?", (agora, chave))
+            return linha[0], linha[1]
+
+    def guardar(self, chave, etag, corpo, ttl):
+        agora = time.time()
+        with self._conectar() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO respostas (chave, etag, corpo, expira_em, usado_em) VALUES (?, ?, ?, ?, ?)",
+                (chave, etag, corpo, agora + ttl, agora)
+            )
+            # Remove expirados e os menos usados além do limite
+            conn.execute("DELETE FROM respostas WHERE expira_em < ?", (agora,))
+            conn.execute(
+                "DELETE FROM respostas WHERE chave NOT IN "
+                "(SELECT chave FROM respostas ORDER BY usado_em DESC LIMIT ?)", (self.max_itens,)
+            )
+
+
+def criar_cache_respostas(app):
+    """Cria o cache configurado em CACHE_BACKEND ('memoria', 'sqlite' ou 'desligado')"""
+    backend = app.config.get('CACHE_BACKEND', 'memoria')
+    max_itens = app.config.get('CACHE_MAX_ITENS', 256)
+    if backend == 'desligado':
+        cache = None
+    elif backend == 'memoria':
+        cache = CacheMemoria(max_itens)
+    elif backend == 'sqlite':
+        caminho = app.config.get('CACHE_ARQUIVO') or os.path.join(app.instance_path, 'cache_respostas.db')
+        cache = CacheSQLite(caminho, max_itens)
+    else:
+        raise ValueError(f"CACHE_BACKEND inválido: {backend}")
+    app.extensions['cache_respostas'] = cache
+    return cache
+
+
+class CacheRespostas:
+    """Classe para servir páginas do cache e invalidá-las após escritas"""
+
+    @staticmethod
+    def _cache():
+        return current_app.extensions.get('cache_respostas')
+
+    @staticmethod
+    def invalidar():
+        """Incrementa a versão dos dados, descartando todas as páginas guardadas"""
+        cache = CacheRespostas._cache()
+        if cache is None:
+            return
+        try:
+            cache.incrementar_versao()
+        except Exception as e:
+            logger.error(f"Erro ao invalidar cache de respostas: {str(e)}")
+
+    @staticmethod
+    def responder(chave, renderizar):
+        """Resposta da página `chave`, renderizando só se não estiver no cache
+
+        `renderizar` devolve o HTML. A resposta tem ETag e pede revalidação a
+        cada acesso, então navegadores recebem 304 enquanto nada mudar.
+        """
+        cache = CacheRespostas._cache()
+        item = None
+        chave_versao = None
+
+        if cache is not None:
+            try:
+                chave_versao = f"{cache.versao()}:{chave}"
+                item = cache.obter(chave_versao)
+            except Exception as e:
+                logger.error(f"Erro ao ler cache de respostas: {str(e)}")
+                chave_versao = None
+
+        if item is None:
+            corpo = renderizar().encode('utf-8')
+            etag = hashlib.sha1(corpo).hexdigest()
+            if chave_versao is not None:
+                ttl = current_app.config.get('CACHE_TTL', 60)
+                if g.get('leitura_na_replica'):
+                    # A réplica pode estar atrasada em relação à versão atual dos dados
+                    ttl = min(ttl, current_app.config.get('REPLICA_ATRASO_SEGUNDOS', 10))
+                try:
+                    cache.guardar(chave_versao, etag, corpo, ttl)
+                except Exception as e:
+                    logger.error(f"Erro ao gravar cache de respostas: {str(e)}")
+        else:
+            etag, corpo = item
+
+        resposta = make_response(corpo)
+        resposta.set_etag(etag)
+        resposta.cache_control.no_cache = True
+        return resposta.make_conditional(request)
+
+
+def invalida_cache(rota):
+    """Decorator para rotas de escrita: invalida o cache ao terminar
+
+    Só invalida se a requisição fez commit no banco principal (flag marcada
+    em database/replica.py); abrir um formulário ou uma escrita recusada não
+    apaga as páginas guardadas.
+    """
+    @functools.wraps(rota)
+    def envolvida(*args, **kwargs):
+        try:
+            return rota(*args, **kwargs)
+        finally:
+            if g.get('escreveu_no_principal'):
+                CacheRespostas.invalidar()
+    return envolvida
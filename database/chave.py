@@ -0,0 +1,292 @@
+"""Chave da fase eliminatória a partir de tabelas de cabeças de chave
+
+Cada modo (número de grupos) e formato ('separados' ou 'mistos') tem uma
+tabela declarativa com os jogos de cada rodada; as tabelas viram objetos
+ChaveEliminatoria uma única vez, na importação, e as rotas só consultam a
+chave e trocam cada vaga pelo jogador ou pela dupla que venceu o jogo anterior.
+
+Vagas de uma dupla:
+    'P0+P1'  melhor e segundo melhor primeiros colocados
+    'P4+S0'  quinto melhor primeiro com o melhor segundo colocado
+    'V3'     dupla vencedora do jogo 3
+    'D5'     dupla perdedora do jogo 5 (disputa de 3º lugar)
+
+Os jogos são numerados em sequência, rodada a rodada, na ordem das tabelas;
+a disputa de 3º lugar, quando existe, recebe o número seguinte ao da final
+para não mudar a numeração dos demais jogos.
+"""
+from collections import namedtuple
+
+# Grupos de 4 jogadores: '16j' (4 grupos) até '64j' (16 grupos)
+MODOS = [f'{grupos * 4}j' for grupos in range(4, 17)]
+FORMATOS = ['separados', 'mistos']
+
+# Nome das rodadas contadas a partir da final
+FASES_POR_RODADA = ['final', 'semi', 'quartas', 'oitavas']
+
+TITULOS_FASES = {
+    'oitavas': 'Oitavas de Final',
+    'quartas': 'Quartas de Final',
+    'semi': 'Semi-Finais',
+    'final': 'Final',
+    'terceiro': 'Disputa de 3º Lugar',
+}
+
+# Chaves dos modos originais, mantidas como eram jogadas (numeração e confrontos)
+TABELAS = {
+    ('16j', 'separados'): [
+        [('P0+P1', 'S2+S3'), ('P2+P3', 'S0+S1')],
+        [('V1', 'V2')],
+    ],
+    ('16j', 'mistos'): [
+        [('P0+S0', 'P3+S3'), ('P1+S1', 'P2+S2')],
+        [('V1', 'V2')],
+    ],
+    ('20j', 'separados'): [
+        [('S1+S2', 'S3+S4')],
+        [('P0+P1', 'V1'), ('P2+P3', 'P4+S0')],
+        [('V2', 'V3')],
+    ],
+    ('20j', 'mistos'): [
+        [('P3+S3', 'P4+S4')],
+        [('P0+S0', 'V1'), ('P1+S1', 'P2+S2')],
+        [('V2', 'V3')],
+    ],
+    ('24j', 'separados'): [
+        [('S0+S1', 'S2+S3'), ('P4+P5', 'S4+S5')],
+        [('P0+P1', 'V1'), ('P2+P3', 'V2')],
+        [('V3', 'V4')],
+    ],
+    ('24j', 'mistos'): [
+        [('P3+S3', 'P4+S4'), ('P2+S2', 'P5+S5')],
+        [('P0+S0', 'V1'), ('P1+S1', 'V2')],
+        [('V3', 'V4')],
+    ],
+    ('28j', 'separados'): [
+        [('P6+S0', 'S1+S2'), ('P2+P3', 'S5+S6'), ('P4+P5', 'S3+S4')],
+        [('P0+P1', 'V1'), ('V2', 'V3')],
+        [('V4', 'V5')],
+    ],
+    ('28j', 'mistos'): [
+        [('P1+S1', 'P6+S6'), ('P2+S2', 'P5+S5'), ('P3+S3', 'P4+S4')],
+        [('V1', 'V2'), ('P0+S0', 'V3')],
+        [('V4', 'V5')],
+    ],
+    ('32j', 'separados'): [
+        [('P0+P1', 'S6+S7'), ('P6+P7', 'S0+S1'), ('P4+P5', 'S2+S3'), ('P2+P3', 'S4+S5')],
+        [('V1', 'V2'), ('V3', 'V4')],
+        [('V5', 'V6')],
+    ],
+    ('32j', 'mistos'): [
+        [('P0+S0', 'P7+S7'), ('P1+S1', 'P6+S6'), ('P2+S2', 'P5+S5'), ('P3+S3', 'P4+S4')],
+        [('V1', 'V4'), ('V2', 'V3')],
+        [('V5', 'V6')],
+    ],
+}
+
+JogoChave = namedtuple('JogoChave', ['jogo', 'fase', 'timeA', 'timeB'])
+
+
+def grupos_do_modo(modo):
+    """Número de grupos de um modo ('36j' -> 9); None se o modo não existe"""
+    return int(modo[:-1]) // 4 if modo in MODOS else None
+
+
+def jogadores_do_modo(modo):
+    """Número de jogadores de um modo ('36j' -> 36); None se o modo não existe"""
+    return int(modo[:-1]) if modo in MODOS else None
+
+
+def modo_por_grupos(num_grupos, padrao='28j'):
+    """Modo de um torneio com num_grupos grupos"""
+    modo = f'{num_grupos * 4}j'
+    return modo if modo in MODOS else padrao
+
+
+def modo_por_jogadores(num_jogadores):
+    """Menor modo que comporta num_jogadores (o maior modo se nenhum comportar)"""
+    for modo in MODOS:
+        if num_jogadores <= jogadores_do_modo(modo):
+            return modo
+    return MODOS[-1]
+
+
+def descrever_modo(modo):
+    """Texto do modo para os formulários ('36 Jogadores (9 grupos de 4)')"""
+    return f'{jogadores_do_modo(modo)} Jogadores ({grupos_do_modo(modo)} grupos de 4)'
+
+
+def _duplas_semeadas(num_grupos, formato):
+    """Duplas da chave, da mais forte para a mais fraca
+
+    'mistos' junta o i-ésimo primeiro com o i-ésimo segundo; 'separados'
+    junta primeiros com primeiros e segundos com segundos (com número ímpar
+    de grupos, o último primeiro joga com o melhor segundo).
+    """
+    if formato == 'mistos':
+        return [f'P{i}+S{i}' for i in range(num_grupos)]
+
+    duplas = [f'P{i}+P{i + 1}' for i in range(0, num_grupos - 1, 2)]
+    inicio_segundos = 0
+    if num_grupos % 2:
+        duplas.append(f'P{num_grupos - 1}+S0')
+        inicio_segundos = 1
+    duplas += [f'S{i}+S{i + 1}' for i in range(inicio_segundos, num_grupos - 1, 2)]
+    return duplas
+
+
+def _ordem_cabecas(tamanho):
+    """Posição das cabeças de chave numa chave de 'tamanho' vagas (1x8, 4x5, 2x7, 3x6...)"""
+    ordem = [0]
+    while len(ordem) < tamanho:
+        vagas = len(ordem) * 2
+        ordem = [cabeca for anterior in ordem for cabeca in (anterior, vagas - 1 - anterior)]
+    return ordem
+
+
+def gerar_tabela(num_grupos, formato):
+    """Tabela de um modo sem chave definida: chave completa com folga (bye) para as melhores duplas"""
+    duplas = _duplas_semeadas(num_grupos, formato)
+    tamanho = 1
+    while tamanho < len(duplas):
+        tamanho *= 2
+
+    vagas = [duplas[cabeca] if cabeca < len(duplas) else None for cabeca in _ordem_cabecas(tamanho)]
+    rodadas = []
+    jogo = 0
+    while len(vagas) > 1:
+        rodada, proximas = [], []
+        for dupla_a, dupla_b in zip(vagas[::2], vagas[1::2]):
+            if dupla_b is None:
+                # Sem adversário: a dupla mais forte passa direto para a próxima rodada
+                proximas.append(dupla_a)
+                continue
+            jogo += 1
+            rodada.append((dupla_a, dupla_b))
+            proximas.append(f'V{jogo}')
+        rodadas.append(rodada)
+        vagas = proximas
+    return rodadas
+
+
+def _ler_dupla(texto):
+    """'P0+S1' -> (('P', 0), ('S', 1)); 'V3' -> ('V', 3)"""
+    if '+' in texto:
+        return tuple((vaga[0], int(vaga[1:])) for vaga in texto.split('+'))
+    return (texto[0], int(texto[1:]))
+
+
+class ChaveEliminatoria:
+    """Jogos de uma chave, por fase e por número"""
+
+    def __init__(self, rodadas, terceiro_lugar=False):
+        self.jogos = []
+        self.fases = []
+        numero = 0
+        for indice, rodada in enumerate(rodadas):
+            fase = FASES_POR_RODADA[len(rodadas) - 1 - indice]
+            self.fases.append(fase)
+            for dupla_a, dupla_b in rodada:
+                numero += 1
+                self.jogos.append(JogoChave(numero, fase, _ler_dupla(dupla_a), _ler_dupla(dupla_b)))
+        self.jogo_final = numero
+
+        self.jogo_terceiro = None
+        if terceiro_lugar and 'semi' in self.fases:
+            semis = [jogo.jogo for jogo in self.jogos if jogo.fase == 'semi']
+            self.jogo_terceiro = numero + 1
+            self.fases.append('terceiro')
+            self.jogos.append(JogoChave(self.jogo_terceiro, 'terceiro', ('D', semis[0]), ('D', semis[1])))
+
+        self.por_numero = {jogo.jogo: jogo for jogo in self.jogos}
+
+    def jogos_da_fase(self, fase):
+        """Jogos de uma fase, na ordem da tabela"""
+        return [jogo for jogo in self.jogos if jogo.fase == fase]
+
+    def numeros_da_fase(self, fase):
+        """Números dos jogos de uma fase"""
+        return [jogo.jogo for jogo in self.jogos if jogo.fase == fase]
+
+    def fase_do_jogo(self, numero):
+        """Fase de um jogo pelo número (None se não existe na chave)"""
+        jogo = self.por_numero.get(numero)
+        return jogo.fase if jogo else None
+
+    def fase_anterior(self, fase):
+        """Fase que precisa estar toda jogada antes desta (None para a primeira)"""
+        if fase == 'terceiro':
+            return 'semi'
+        indice = self.fases.index(fase)
+        return self.fases[indice - 1] if indice > 0 else None
+
+    def fases_posteriores(self, fase):
+        """Fases montadas a partir do resultado desta (refeitas quando ela é editada)"""
+        if fase in ('final', 'terceiro'):
+            return []
+        return self.fases[self.fases.index(fase) + 1:]
+
+    def fases_antes_da_semi(self):
+        """Rodadas anteriores às semi-finais ('oitavas', 'quartas')"""
+        return self.fases[:self.fases.index('semi')] if 'semi' in self.fases else []
+
+    def montar(self, primeiros, segundos, resultados, jogador):
+        """Confrontos de cada fase já definida
+
+        resultados: placares por número do jogo ({'timeA': 6, 'timeB': 3});
+        jogador(lista, indice): jogador de uma colocação (ex.: get_jogador_safe).
+        Uma fase só é montada quando todos os jogos da fase anterior têm placar.
+        Retorna {fase: [{'timeA': [...], 'timeB': [...], 'jogo': n}]}.
+        """
+        colocados = {'P': primeiros, 'S': segundos}
+        duplas = {}
+        montadas = {}
+
+        def dupla(vagas):
+            if isinstance(vagas[0], tuple):
+                return [jogador(colocados[lista], indice) for lista, indice in vagas]
+            tipo, numero = vagas
+            vencedor = vencedor_do_jogo(resultados[numero])
+            if tipo == 'D':
+                vencedor = 'timeB' if vencedor == 'timeA' else 'timeA'
+            return duplas[numero][vencedor]
+
+        for fase in self.fases:
+            anterior = self.fase_anterior(fase)
+            if anterior is not None and (
+                anterior not in montadas
+                or not all(numero in resultados for numero in self.numeros_da_fase(anterior))
+            ):
+                continue
+            montadas[fase] = []
+            for jogo in self.jogos_da_fase(fase):
+                confronto = {'timeA': dupla(jogo.timeA), 'timeB': dupla(jogo.timeB), 'jogo': jogo.jogo}
+                duplas[jogo.jogo] = confronto
+                montadas[fase].append(confronto)
+        return montadas
+
+
+def vencedor_do_jogo(resultado):
+    """'timeA' ou 'timeB' pelo placar salvo do jogo"""
+    return 'timeA' if resultado['timeA'] > resultado['timeB'] else 'timeB'
+
+
+def _montar_chaves():
+    """Todas as chaves (modo, formato, disputa de 3º lugar), montadas uma vez"""
+    chaves = {}
+    for modo in MODOS:
+        for formato in FORMATOS:
+            rodadas = TABELAS.get((modo, formato)) or gerar_tabela(grupos_do_modo(modo), formato)
+            for terceiro_lugar in (False, True):
+                chaves[(modo, formato, terceiro_lugar)] = ChaveEliminatoria(rodadas, terceiro_lugar)
+    return chaves
+
+
+CHAVES = _montar_chaves()
+
+
+def obter_chave(modo, formato='separados', terceiro_lugar=False):
+    """Chave pré-montada do modo e formato (None se o modo não existe)"""
+    if formato not in FORMATOS:
+        formato = 'separados'
+    return CHAVES.get((modo, formato, bool(terceiro_lugar)))
@@ -0,0 +1,88 @@
+"""Classificação dos grupos: placares aplicados como deltas e cadeia de desempate
+
+Cada placar gravado soma (e um placar corrigido desfaz e soma de novo) só nas
+estatísticas dos quatro jogadores do confronto. A ordem do grupo segue, nesta
+ordem: vitórias, saldo de pontos, pontos a favor, confronto direto entre os
+empatados e, por fim, a ordem do sorteio (a do primeiro confronto do grupo).
+Entre grupos (melhores primeiros e melhores segundos) não há confronto direto
+e o último critério é a ordem dos grupos.
+"""
+from itertools import groupby
+
+
+def estatisticas_zeradas():
+    """Campos de desempenho de um jogador sem jogos"""
+    return {'vitorias': 0, 'saldo_a_favor': 0, 'saldo_contra': 0, 'saldo_total': 0}
+
+
+def somar_placar(estatisticas, dupla_a, dupla_b, pontos_a, pontos_b, sinal=1):
+    """Soma (sinal=1) ou desfaz (sinal=-1) um placar nas estatísticas {chave: dict}"""
+    for dupla, favor, contra in ((dupla_a, pontos_a, pontos_b), (dupla_b, pontos_b, pontos_a)):
+        for chave in dupla:
+            jogador = estatisticas[chave]
+            jogador['saldo_a_favor'] += sinal * favor
+            jogador['saldo_contra'] += sinal * contra
+            jogador['saldo_total'] = jogador['saldo_a_favor'] - jogador['saldo_contra']
+            if favor > contra:
+                jogador['vitorias'] += sinal
+
+
+def trocar_placar(estatisticas, dupla_a, dupla_b, anterior, novo):
+    """Aplica a diferença entre dois placares (a, b) de um confronto; None é sem resultado
+
+    Retorna True se as estatísticas mudaram.
+    """
+    if anterior == novo:
+        return False
+    if anterior is not None:
+        somar_placar(estatisticas, dupla_a, dupla_b, *anterior, sinal=-1)
+    if novo is not None:
+        somar_placar(estatisticas, dupla_a, dupla_b, *novo)
+    return True
+
+
+def criterios(jogador):
+    """Vitórias, saldo e pontos a favor, do melhor para o pior"""
+    return (-jogador['vitorias'], -jogador['saldo_total'], -jogador['saldo_a_favor'])
+
+
+def vitorias_diretas(empatados, resultados):
+    """Vitórias de cada empatado sobre os outros empatados (jogos em lados opostos)"""
+    vitorias = dict.fromkeys(empatados, 0)
+    for dupla_a, dupla_b, pontos_a, pontos_b in resultados:
+        if pontos_a == pontos_b:
+            continue
+        vencedora, perdedora = (dupla_a, dupla_b) if pontos_a > pontos_b else (dupla_b, dupla_a)
+        derrotados = sum(1 for chave in perdedora if chave in vitorias)
+        for chave in vencedora:
+            if chave in vitorias:
+                vitorias[chave] += derrotados
+    return vitorias
+
+
+def ordenar_grupo(jogadores, resultados, ordem_sorteio, chave='nome'):
+    """Ordena no lugar os jogadores (dicts) de um grupo pela cadeia de desempate
+
+    resultados são os confrontos com placar completo, como
+    (dupla_a, dupla_b, pontos_a, pontos_b) com as chaves dos jogadores, e
+    ordem_sorteio as chaves na ordem em que o grupo foi sorteado.
+    """
+    posicao = {valor: i for i, valor in enumerate(ordem_sorteio)}
+    jogadores.sort(key=lambda j: (criterios(j), posicao.get(j[chave], len(posicao))))
+
+    # Confronto direto só dentro de cada bloco empatado nos critérios anteriores
+    ordenados = []
+    for _, bloco in groupby(jogadores, key=criterios):
+        bloco = list(bloco)
+        if len(bloco) > 1:
+            diretas = vitorias_diretas([j[chave] for j in bloco], resultados)
+            bloco.sort(key=lambda j: -diretas[j[chave]])
+        ordenados.extend(bloco)
+    jogadores[:] = ordenados
+    return jogadores
+
+
+def ordenar_entre_grupos(jogadores):
+    """Ordena no lugar colocados de grupos diferentes (mantém a ordem dos grupos no empate)"""
+    jogadores.sort(key=criterios)
+    return jogadores
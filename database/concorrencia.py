@@ -0,0 +1,64 @@
+"""Controle de concorrência otimista dos placares
+
+Confronto e ConfrontoEliminatoria têm a coluna versao (version_id_col do
+SQLAlchemy): todo UPDATE leva 'WHERE versao = <lida>' e incrementa a versão.
+Os formulários enviam a versão e o placar que exibiram; um placar editado
+sobre uma versão antiga vira conflito em vez de apagar, em silêncio, o que
+outro dispositivo lançou.
+"""
+from flask import jsonify, request
+
+
+class ConflitoPlacar(Exception):
+    """Confronto alterado por outro dispositivo desde que a página foi aberta"""
+
+    def __init__(self, confronto):
+        self.confronto = confronto
+        super().__init__(
+            f"alterado em outro dispositivo para {formatar_placar(confronto)}"
+        )
+
+
+def formatar_placar(confronto):
+    """Placar gravado no confronto, como exibido nas mensagens"""
+    if confronto.pontos_dupla_a is None or confronto.pontos_dupla_b is None:
+        return "sem placar"
+    return f"{confronto.pontos_dupla_a} x {confronto.pontos_dupla_b}"
+
+
+def ler_pontos(valor):
+    """Pontos de um campo do formulário (None se vazio ou inválido)"""
+    valor = (valor or '').strip()
+    return int(valor) if valor.isdigit() else None
+
+
+def ler_placar_original(valor):
+    """Placar 'A-B' exibido pelo formulário; None se o campo não veio"""
+    if valor is None:
+        return None
+    pontos_a, _, pontos_b = valor.partition('-')
+    return ler_pontos(pontos_a), ler_pontos(pontos_b)
+
+
+def placar_editado(confronto, placar, versao=None, original=None):
+    """Indica se o placar enviado deve ser gravado no confronto
+
+    Retorna False se o placar já é o gravado ou se o formulário só reenviou
+    o placar que exibiu (outro dispositivo pode tê-lo alterado depois).
+    Levanta ConflitoPlacar quando o placar foi editado sobre uma versão
+    antiga. Formulários sem versão (clientes antigos) gravam como antes.
+    """
+    if placar == (confronto.pontos_dupla_a, confronto.pontos_dupla_b):
+        return False
+    if original is not None and placar == original:
+        return False
+    if versao is not None and confronto.versao is not None and versao != confronto.versao:
+        raise ConflitoPlacar(confronto)
+    return True
+
+
+def responder_conflito(mensagem):
+    """409 para clientes que pedem JSON; None para a rota seguir com o redirect do formulário"""
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'success': False, 'conflito': True, 'error': mensagem}), 409
+    return None
@@ -1,3 +1,55 @@
+import sqlite3
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
 
-db = SQLAlchemy()
+
+class SessaoRoteada(Session):
+    """Sessão que envia as leituras das rotas somente leitura para a réplica
+
+    Só consultas vão para a réplica (ver database/replica.py); flush e
+    INSERT/UPDATE/DELETE explícitos continuam no banco principal.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and not getattr(clause, 'is_dml', False)
+                and has_app_context() and g.get('leitura_na_replica')):
+            replica = self._db.engines.get('replica')
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': SessaoRoteada})
+
+
+@event.listens_for(Engine, 'connect')
+def _configurar_sqlite(conexao, registro):
+    """Ajustes do SQLite local para vários leitores e um escritor ao mesmo tempo
+
+    WAL deixa as páginas serem lidas enquanto um placar é gravado; com ele,
+    synchronous=NORMAL só perde a última transação se a máquina desligar.
+    """
+    if isinstance(conexao, sqlite3.Connection):
+        cursor = conexao.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-16000")
+        cursor.close()
+
+
+@event.listens_for(Pool, 'checkout')
+def _ativar_chaves_estrangeiras(conexao, registro, proxy):
+    """O SQLite só aplica FOREIGN KEY (e ON DELETE CASCADE) com o pragma ligado
+
+    Ligado a cada checkout, e não só ao conectar, porque a migração que
+    reconstrói tabelas o desliga na conexão que usa.
+    """
+    if isinstance(conexao, sqlite3.Connection):
+        cursor = conexao.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
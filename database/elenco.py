@@ -0,0 +1,60 @@
+"""Elenco de um torneio: jogadores carregados uma vez por requisição"""
+from flask import g
+from database.models import Jogador
+
+
+class ElencoTorneio:
+    """Jogadores de um torneio indexados por id e por nome
+
+    Os ids e nomes são guardados na carga, então continuam válidos depois
+    de um commit (que expira os objetos da sessão do SQLAlchemy).
+    """
+
+    def __init__(self, torneio_id, jogadores):
+        self.torneio_id = torneio_id
+        self.por_id = {jogador.id: jogador for jogador in jogadores}
+        self.por_nome = {jogador.nome: jogador for jogador in jogadores}
+        self._ids_por_nome = {jogador.nome: jogador.id for jogador in jogadores}
+        self._nomes_por_id = {jogador.id: jogador.nome for jogador in jogadores}
+
+    def __len__(self):
+        return len(self.por_id)
+
+    def __iter__(self):
+        return iter(self.por_id.values())
+
+    def jogador(self, jogador_id):
+        """Jogador pelo id (None se não for do torneio)"""
+        try:
+            return self.por_id.get(int(jogador_id))
+        except (TypeError, ValueError):
+            return None
+
+    def pelo_nome(self, nome):
+        """Jogador pelo nome (None se não for do torneio)"""
+        return self.por_nome.get(nome)
+
+    def id_do_jogador(self, nome):
+        return self._ids_por_nome.get(nome)
+
+    def nome_do_jogador(self, jogador_id):
+        return self._nomes_por_id.get(jogador_id)
+
+    def ids_dos_jogadores(self, nomes):
+        """Ids dos nomes informados, ou None se algum não for do torneio"""
+        ids = [self._ids_por_nome.get(nome) for nome in nomes]
+        return None if None in ids else ids
+
+    @staticmethod
+    def carregar(torneio_id):
+        """Elenco do torneio, consultado no banco só na primeira chamada da requisição"""
+        elencos = g.setdefault('elencos_torneio', {})
+        if torneio_id not in elencos:
+            jogadores = Jogador.query.filter_by(torneio_id=torneio_id).all()
+            elencos[torneio_id] = ElencoTorneio(torneio_id, jogadores)
+        return elencos[torneio_id]
+
+    @staticmethod
+    def descartar(torneio_id):
+        """Esquece o elenco carregado (após inserir, remover ou renomear jogadores)"""
+        g.setdefault('elencos_torneio', {}).pop(torneio_id, None)
@@ -0,0 +1,381 @@
+"""Estado do torneio guardado no servidor em vez do cookie de sessão"""
+import logging
+import os
+import re
+import secrets
+import tempfile
+from datetime import datetime
+from flask import current_app, session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from database.db import db
+from database.models import EstadoSessao
+
+
+logger = logging.getLogger(__name__)
+
+# Chaves que pertencem ao torneio (e não ao navegador)
+CHAVES_TORNEIO = {
+    'jogadores', 'grupos', 'confrontos', 'valores_salvos',
+    'modo_torneio', 'formato_eliminatoria', 'disputa_terceiro_lugar', 'nome_torneio',
+    'campea', 'campeoes_finais'
+}
+PREFIXOS_TORNEIO = ('eliminatoria_jogo', 'final_dupla_')
+
+SID_VALIDO = re.compile(r'^[A-Za-z0-9_-]{32,64}$')
+
+
+def chave_do_torneio(chave):
+    """Indica se a chave fica no estado do torneio"""
+    return chave in CHAVES_TORNEIO or chave.startswith(PREFIXOS_TORNEIO)
+
+
+class EstadoBanco:
+    """Armazena o estado na tabela estado_sessao do banco principal"""
+
+    def carregar(self, namespace):
+        """Retorna {chave: valor serializado} de um namespace"""
+        tabela = EstadoSessao.__table__
+        with db.engine.connect() as conn:
+            linhas = conn.execute(
+                select(tabela.c.chave, tabela.c.valor).where(tabela.c.namespace == namespace)
+            ).all()
+        return {chave: valor for chave, valor in linhas}
+
+    def gravar(self, namespace, alteradas, removidas):
+        """Grava as chaves alteradas e remove as apagadas em uma transação"""
+        tabela = EstadoSessao.__table__
+        chaves = set(alteradas) | set(removidas)
+        
+        # Uma segunda tentativa cobre duas requisições gravando a mesma chave
+        for tentativa in range(2):
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(
+                        delete(tabela).where(
+                            tabela.c.namespace == namespace,
+                            tabela.c.chave.in_(chaves)
+                        )
+                    )
+                    if alteradas:
+                        agora = datetime.now()
+                        conn.execute(tabela.insert(), [
+                            {'namespace': namespace, 'chave': chave, 'valor': valor, 'atualizado_em': agora}
+                            for chave, valor in alteradas.items()
+                        ])
+                return
+            except IntegrityError:
+                if tentativa:
+                    raise
+                logger.warning(f"Conflito ao gravar estado de {namespace}, tentando novamente")
+
+    def descartar(self, namespace):
+        """Remove todas as chaves de um namespace"""
+        tabela = EstadoSessao.__table__
+        with db.engine.begin() as conn:
+            conn.execute(delete(tabela).where(tabela.c.namespace == namespace))
+
+    def limpar_expirados(self, limite):
+        """Remove sessões sem atividade desde o limite informado"""
+        tabela = EstadoSessao.__table__
+        inativas = select(tabela.c.namespace).where(
+            tabela.c.namespace.like('sessao:%')
+        ).group_by(tabela.c.namespace).having(func.max(tabela.c.atualizado_em) < limite)
+        with db.engine.begin() as conn:
+            conn.execute(delete(tabela).where(tabela.c.namespace.in_(inativas)))
+
+
+class EstadoArquivo:
+    """Armazena o estado em arquivos JSON locais (um por namespace)"""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _caminho(self, namespace):
+        return os.path.join(self.diretorio, namespace.replace(':', '_') + '.json')
+
+    def carregar(self, namespace):
+        """Retorna {chave: valor serializado} de um namespace"""
+        try:
+            with open(self._caminho(namespace), encoding='utf-8') as arquivo:
+                return TaggedJSONSerializer().loads(arquivo.read())
+        except FileNotFoundError:
+            return {}
+
+    def gravar(self, namespace, alteradas, removidas):
+        """Reescreve o arquivo do namespace de forma atômica"""
+        dados = self.carregar(namespace)
+        dados.update(alteradas)
+        for chave in removidas:
+            dados.pop(chave, None)
+
+        if not dados:
+            self.descartar(namespace)
+            return
+
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(TaggedJSONSerializer().dumps(dados))
+        os.replace(temporario, self._caminho(namespace))
+
+    def descartar(self, namespace):
+        """Remove o arquivo do namespace"""
+        try:
+            os.remove(self._caminho(namespace))
+        except FileNotFoundError:
+            pass
+
+    def limpar_expirados(self, limite):
+        """Remove sessões sem atividade desde o limite informado"""
+        limite_ts = limite.timestamp()
+        for nome in os.listdir(self.diretorio):
+            caminho = os.path.join(self.diretorio, nome)
+            if nome.startswith('sessao_') and os.path.getmtime(caminho) < limite_ts:
+                os.remove(caminho)
+
+
+class _Namespace:
+    """Chaves de um namespace, desserializadas somente quando acessadas"""
+
+    def __init__(self, store, nome, vazio=False):
+        self.store = store
+        self.nome = nome
+        self._brutos = {} if vazio else None
+        self._valores = {}
+        self._removidas = set()
+
+    def _garantir(self):
+        if self._brutos is None:
+            self._brutos = self.store.carregar(self.nome)
+
+    def __contains__(self, chave):
+        if chave in self._valores:
+            return True
+        self._garantir()
+        return chave in self._brutos and chave not in self._removidas
+
+    def __getitem__(self, chave):
+        if chave in self._valores:
+            return self._valores[chave]
+        self._garantir()
+        if chave in self._removidas or chave not in self._brutos:
+            raise KeyError(chave)
+        valor = EstadoSessionInterface.serializer.loads(self._brutos[chave])
+        self._valores[chave] = valor
+        return valor
+
+    def __setitem__(self, chave, valor):
+        self._valores[chave] = valor
+        self._removidas.discard(chave)
+
+    def __delitem__(self, chave):
+        if chave not in self:
+            raise KeyError(chave)
+        self._valores.pop(chave, None)
+        if chave in self._brutos:
+            self._removidas.add(chave)
+
+    def chaves(self):
+        self._garantir()
+        return (set(self._brutos) - self._removidas) | set(self._valores)
+
+    def alteracoes(self):
+        """Retorna (alteradas, removidas) comparando com o que foi carregado"""
+        brutos = self._brutos or {}
+        alteradas = {}
+        for chave, valor in self._valores.items():
+            serializado = EstadoSessionInterface.serializer.dumps(valor)
+            if brutos.get(chave) != serializado:
+                alteradas[chave] = serializado
+        removidas = {chave for chave in self._removidas if chave in brutos}
+        return alteradas, removidas
+
+
+class SessaoServidor(SessionMixin):
+    """Sessão cujo conteúdo fica no servidor; o cookie guarda apenas o id
+
+    As chaves do torneio (grupos, confrontos, eliminatórias...) ficam no
+    namespace 'torneio:<torneio_id>' e o restante em 'sessao:<sid>'.
+    """
+
+    def __init__(self, sid, store, novo=False):
+        self.sid = sid
+        self.store = store
+        self.new = novo
+        self.modified = False
+        self.accessed = False
+        self._sessao = _Namespace(store, f'sessao:{sid}', vazio=novo)
+        self._torneios = {}
+
+    def _ns_torneio(self):
+        torneio_id = self._sessao['torneio_id'] if 'torneio_id' in self._sessao else None
+        if not torneio_id:
+            return None
+        if torneio_id not in self._torneios:
+            self._torneios[torneio_id] = _Namespace(self.store, f'torneio:{torneio_id}')
+        return self._torneios[torneio_id]
+
+    def __contains__(self, chave):
+        self.accessed = True
+        if chave_do_torneio(chave):
+            ns = self._ns_torneio()
+            if ns is not None and chave in ns:
+                return True
+        return chave in self._sessao
+
+    def __getitem__(self, chave):
+        self.accessed = True
+        if chave_do_torneio(chave):
+            ns = self._ns_torneio()
+            if ns is not None and chave in ns:
+                return ns[chave]
+        return self._sessao[chave]
+
+    def __setitem__(self, chave, valor):
+        self.accessed = True
+        self.modified = True
+        ns = self._ns_torneio() if chave_do_torneio(chave) else None
+        if ns is not None:
+            ns[chave] = valor
+            if chave in self._sessao:
+                del self._sessao[chave]
+        else:
+            self._sessao[chave] = valor
+
+    def __delitem__(self, chave):
+        self.accessed = True
+        removida = False
+        if chave_do_torneio(chave):
+            ns = self._ns_torneio()
+            if ns is not None and chave in ns:
+                del ns[chave]
+                removida = True
+        if chave in self._sessao:
+            del self._sessao[chave]
+            removida = True
+        if not removida:
+            raise KeyError(chave)
+        self.modified = True
+
+    def __iter__(self):
+        self.accessed = True
+        chaves = self._sessao.chaves()
+        ns = self._ns_torneio()
+        if ns is not None:
+            chaves |= ns.chaves()
+        return iter(list(chaves))
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def update(self, *args, **kwargs):
+        """Define torneio_id primeiro para que as demais chaves caiam no torneio certo"""
+        dados = dict(*args, **kwargs)
+        if 'torneio_id' in dados:
+            self['torneio_id'] = dados.pop('torneio_id')
+        for chave, valor in dados.items():
+            self[chave] = valor
+
+    def clear(self):
+        """Limpa a sessão do navegador sem apagar o estado do torneio"""
+        for chave in list(self._sessao.chaves()):
+            del self._sessao[chave]
+        self.accessed = True
+        self.modified = True
+
+    def descartar_torneio(self, torneio_id):
+        """Esquece o estado de um torneio apagado"""
+        self._torneios.pop(torneio_id, None)
+        self.store.descartar(f'torneio:{torneio_id}')
+
+    def namespaces_alterados(self):
+        """Lista (namespace, alteradas, removidas) a gravar no fim da requisição"""
+        resultado = []
+        for ns in [self._sessao, *self._torneios.values()]:
+            alteradas, removidas = ns.alteracoes()
+            if alteradas or removidas:
+                resultado.append((ns.nome, alteradas, removidas))
+        return resultado
+
+    def vazia(self):
+        return not self._sessao.chaves()
+
+
+class EstadoSessionInterface(SessionInterface):
+    """Sessão do Flask com o conteúdo guardado em um store do servidor"""
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and SID_VALIDO.match(sid):
+            return SessaoServidor(sid, self.store)
+        return SessaoServidor(secrets.token_urlsafe(32), self.store, novo=True)
+
+    def save_session(self, app, sessao, response):
+        nome = self.get_cookie_name(app)
+        dominio = self.get_cookie_domain(app)
+        caminho = self.get_cookie_path(app)
+
+        if sessao.accessed:
+            response.vary.add('Cookie')
+
+        # Sessão esvaziada: apagar o estado do navegador e o cookie
+        if sessao.vazia():
+            if not sessao.new:
+                self.store.descartar(f'sessao:{sessao.sid}')
+                response.delete_cookie(nome, domain=dominio, path=caminho)
+            return
+
+        for namespace, alteradas, removidas in sessao.namespaces_alterados():
+            self.store.gravar(namespace, alteradas, removidas)
+
+        if sessao.new:
+            # Aproveita a criação de sessões para remover as abandonadas
+            limite = datetime.now() - app.permanent_session_lifetime
+            try:
+                self.store.limpar_expirados(limite)
+            except Exception as e:
+                logger.warning(f"Erro ao limpar sessões expiradas: {str(e)}")
+
+        if not self.should_set_cookie(app, sessao):
+            return
+
+        response.set_cookie(
+            nome,
+            sessao.sid,
+            expires=self.get_expiration_time(app, sessao),
+            httponly=self.get_cookie_httponly(app),
+            domain=dominio,
+            path=caminho,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+
+def criar_estado_store(app):
+    """Cria o store configurado em ESTADO_BACKEND ('banco' ou 'arquivo')"""
+    backend = app.config.get('ESTADO_BACKEND', 'banco')
+    if backend == 'arquivo':
+        diretorio = app.config.get('ESTADO_DIRETORIO') or os.path.join(app.instance_path, 'estado')
+        return EstadoArquivo(diretorio)
+    if backend != 'banco':
+        raise ValueError(f"ESTADO_BACKEND inválido: {backend}")
+    return EstadoBanco()
+
+
+def descartar_estado_torneio(torneio_id):
+    """Remove o estado guardado de um torneio apagado ou cancelado"""
+    try:
+        if isinstance(session, SessaoServidor):
+            session.descartar_torneio(torneio_id)
+        elif isinstance(current_app.session_interface, EstadoSessionInterface):
+            current_app.session_interface.store.descartar(f'torneio:{torneio_id}')
+    except Exception as e:
+        logger.warning(f"Erro ao descartar estado do torneio {torneio_id}: {str(e)}")
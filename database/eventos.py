@@ -0,0 +1,156 @@
+"""Eventos do placar ao vivo: publicação pelas rotas de escrita e entrega via SSE
+
+Os eventos ficam na tabela evento_torneio, então qualquer worker os enxerga.
+Em cada processo um único Transmissor consulta a tabela periodicamente e
+repassa os novos eventos às conexões abertas daquele processo, assim o custo
+no banco não cresce com o número de espectadores.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, select
+from database.db import db
+from database.models import EventoTorneio
+
+
+logger = logging.getLogger(__name__)
+
+
+def formatar_sse(evento_id, tipo, dados):
+    """Formata um evento no protocolo text/event-stream"""
+    return f"id: {evento_id}\nevent: {tipo}\ndata: {dados}\n\n"
+
+
+class EventosManager:
+    """Classe para gravar e consultar os eventos dos torneios"""
+
+    @staticmethod
+    def publicar(torneio_id, tipo, dados):
+        """Grava um evento para os espectadores do torneio (nunca interrompe a rota)"""
+        if not torneio_id:
+            return None
+        tabela = EventoTorneio.__table__
+        try:
+            with db.engine.begin() as conn:
+                resultado = conn.execute(tabela.insert().values(
+                    torneio_id=torneio_id,
+                    tipo=tipo,
+                    dados=json.dumps(dados, ensure_ascii=False, separators=(',', ':'))
+                ))
+                return resultado.inserted_primary_key[0]
+        except Exception as e:
+            logger.error(f"Erro ao publicar evento '{tipo}' do torneio {torneio_id}: {str(e)}")
+            return None
+
+    @staticmethod
+    def ultimo_id():
+        """Maior id de evento gravado (0 se não houver)"""
+        with db.engine.connect() as conn:
+            return conn.execute(select(func.max(EventoTorneio.id))).scalar() or 0
+
+    @staticmethod
+    def listar_desde(ultimo_id, torneio_ids=None):
+        """Eventos com id maior que ultimo_id, em ordem, como (id, torneio_id, tipo, dados)"""
+        tabela = EventoTorneio.__table__
+        consulta = select(tabela.c.id, tabela.c.torneio_id, tabela.c.tipo, tabela.c.dados).where(
+            tabela.c.id > ultimo_id
+        ).order_by(tabela.c.id)
+        if torneio_ids is not None:
+            consulta = consulta.where(tabela.c.torneio_id.in_(torneio_ids))
+        with db.engine.connect() as conn:
+            return conn.execute(consulta).all()
+
+    @staticmethod
+    def limpar_antigos(horas):
+        """Remove eventos com mais de `horas` horas"""
+        limite = datetime.now() - timedelta(hours=horas)
+        with db.engine.begin() as conn:
+            conn.execute(delete(EventoTorneio.__table__).where(EventoTorneio.criado_em < limite))
+
+
+class Transmissor:
+    """Repasse dos eventos novos às conexões SSE abertas neste processo"""
+
+    def __init__(self, app):
+        self.app = app
+        self.intervalo = app.config.get('EVENTOS_INTERVALO', 1.0)
+        self.retencao_horas = app.config.get('EVENTOS_RETENCAO_HORAS', 48)
+        self._assinantes = {}  # torneio_id -> set de filas
+        self._ultimo_id = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def assinar(self, torneio_id):
+        """Retorna uma fila que recebe (id, tipo, dados) dos eventos do torneio
+
+        A fila pode receber eventos que a conexão já enviou na reposição
+        inicial; quem consome descarta ids repetidos.
+        """
+        fila = queue.Queue(maxsize=200)
+        with self._lock:
+            # Sem espectadores o cursor fica parado; recomeça do fim
+            if not self._assinantes:
+                self._ultimo_id = EventosManager.ultimo_id()
+            self._assinantes.setdefault(torneio_id, set()).add(fila)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name='transmissor-eventos', daemon=True)
+                self._thread.start()
+        return fila
+
+    def cancelar(self, torneio_id, fila):
+        with self._lock:
+            filas = self._assinantes.get(torneio_id)
+            if filas:
+                filas.discard(fila)
+                if not filas:
+                    del self._assinantes[torneio_id]
+
+    def _entregar(self, eventos):
+        with self._lock:
+            for evento_id, torneio_id, tipo, dados in eventos:
+                for fila in list(self._assinantes.get(torneio_id, ())):
+                    try:
+                        fila.put_nowait((evento_id, tipo, dados))
+                    except queue.Full:
+                        # Cliente lento: encerra a conexão; ele reconecta com Last-Event-ID
+                        self._assinantes[torneio_id].discard(fila)
+                        fila.queue.clear()
+                        fila.put_nowait(None)
+
+    def _executar(self):
+        """Laço da thread: uma consulta por intervalo para todos os espectadores"""
+        with self.app.app_context():
+            proxima_limpeza = 0.0
+
+            while True:
+                time.sleep(self.intervalo)
+                try:
+                    with self._lock:
+                        if not self._assinantes:
+                            continue
+                        ultimo_id = self._ultimo_id
+
+                    eventos = EventosManager.listar_desde(ultimo_id)
+                    if eventos:
+                        with self._lock:
+                            self._ultimo_id = max(self._ultimo_id, eventos[-1][0])
+                        self._entregar(eventos)
+
+                    if time.monotonic() > proxima_limpeza:
+                        EventosManager.limpar_antigos(self.retencao_horas)
+                        proxima_limpeza = time.monotonic() + 3600
+
+                except Exception as e:
+                    logger.error(f"Erro no transmissor de eventos: {str(e)}")
+
+
+def obter_transmissor():
+    """Transmissor da aplicação atual, criado no primeiro uso"""
+    extensoes = current_app.extensions
+    if 'transmissor_eventos' not in extensoes:
+        extensoes['transmissor_eventos'] = Transmissor(current_app._get_current_object())
+    return extensoes['transmissor_eventos']
@@ -0,0 +1,122 @@
+"""Consultas agregadas para o histórico de torneios"""
+import logging
+import math
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+from database.db import db
+from database.models import Jogador, JogadorArquivado, Torneio, ConfrontoEliminatoria
+from database.snapshot import SnapshotManager
+from database.chave import MODOS, jogadores_do_modo
+
+
+logger = logging.getLogger(__name__)
+
+class HistoricoManager:
+    """Classe para montar o resumo dos torneios exibido na home"""
+
+    # Descrição do modo a partir do número máximo de jogadores
+    MODOS_DESCRICAO = [(jogadores_do_modo(modo), f'{jogadores_do_modo(modo)} Jogadores') for modo in MODOS]
+
+    @staticmethod
+    def descrever_modo(num_jogadores):
+        """Retorna a descrição do modo do torneio pelo número de jogadores"""
+        for limite, descricao in HistoricoManager.MODOS_DESCRICAO:
+            if num_jogadores <= limite:
+                return descricao
+        return HistoricoManager.MODOS_DESCRICAO[-1][1]
+
+    @staticmethod
+    def obter_historico(pagina=1, por_pagina=20):
+        """Obtém uma página do histórico com modo, campeões e vices
+
+        Usa duas consultas independentemente do tamanho do arquivo:
+        uma contagem para a paginação e uma consulta com os jogadores da
+        final resolvidos por JOIN e o número de jogadores em subconsulta.
+        Torneios arquivados da página leem a final dos snapshots (mais uma).
+        """
+        try:
+            total = db.session.query(func.count(Torneio.id)).scalar() or 0
+            total_paginas = max(1, math.ceil(total / por_pagina))
+            pagina = min(max(1, pagina), total_paginas)
+
+            num_jogadores = select(func.count(Jogador.id)).where(
+                Jogador.torneio_id == Torneio.id
+            ).correlate(Torneio).scalar_subquery()
+            num_arquivados = select(func.count(JogadorArquivado.jogador_id)).where(
+                JogadorArquivado.torneio_id == Torneio.id
+            ).correlate(Torneio).scalar_subquery()
+
+            a1, a2, b1, b2 = (aliased(Jogador) for _ in range(4))
+
+            linhas = db.session.query(
+                Torneio,
+                (num_jogadores + num_arquivados).label('num_jogadores'),
+                ConfrontoEliminatoria.pontos_dupla_a,
+                ConfrontoEliminatoria.pontos_dupla_b,
+                a1.nome, a2.nome, b1.nome, b2.nome
+            ).outerjoin(
+                ConfrontoEliminatoria,
+                (ConfrontoEliminatoria.torneio_id == Torneio.id) &
+                (ConfrontoEliminatoria.fase == 'final')
+            ).outerjoin(
+                a1, a1.id == ConfrontoEliminatoria.jogador_a1_id
+            ).outerjoin(
+                a2, a2.id == ConfrontoEliminatoria.jogador_a2_id
+            ).outerjoin(
+                b1, b1.id == ConfrontoEliminatoria.jogador_b1_id
+            ).outerjoin(
+                b2, b2.id == ConfrontoEliminatoria.jogador_b2_id
+            ).order_by(
+                Torneio.data_criacao.desc(), Torneio.id.desc()
+            ).offset((pagina - 1) * por_pagina).limit(por_pagina).all()
+
+            finais_arquivadas = SnapshotManager.finais_arquivadas(
+                [torneio.id for torneio, *_ in linhas if torneio.arquivado]
+            )
+
+            torneios = []
+            for torneio, jogadores, pontos_a, pontos_b, nome_a1, nome_a2, nome_b1, nome_b2 in linhas:
+                campeoes = None
+                vice_campeoes = None
+
+                # Campeões só aparecem para torneios finalizados com final registrada
+                if torneio.arquivado:
+                    final = finais_arquivadas.get(torneio.id, {})
+                    campeoes = final.get('campeoes')
+                    vice_campeoes = final.get('vice_campeoes')
+                elif torneio.finalizado and pontos_a is not None and pontos_b is not None:
+                    if pontos_a > pontos_b:
+                        campeoes = [nome_a1, nome_a2]
+                        vice_campeoes = [nome_b1, nome_b2]
+                    else:
+                        campeoes = [nome_b1, nome_b2]
+                        vice_campeoes = [nome_a1, nome_a2]
+
+                torneios.append({
+                    'id': torneio.id,
+                    'nome': torneio.nome,
+                    'data_criacao': torneio.data_criacao,
+                    'finalizado': torneio.finalizado,
+                    'num_jogadores': jogadores or 0,
+                    'modo': HistoricoManager.descrever_modo(jogadores or 0),
+                    'campeoes': campeoes,
+                    'vice_campeoes': vice_campeoes
+                })
+
+            return {
+                'torneios': torneios,
+                'pagina': pagina,
+                'por_pagina': por_pagina,
+                'total': total,
+                'total_paginas': total_paginas
+            }
+
+        except Exception as e:
+            logger.error(f"Erro ao obter histórico de torneios: {str(e)}")
+            return {
+                'torneios': [],
+                'pagina': 1,
+                'por_pagina': por_pagina,
+                'total': 0,
+                'total_paginas': 1
+            }
@@ -0,0 +1,149 @@
+"""Instrumentação das consultas SQL por requisição
+
+Conta comandos e tempo de banco de cada requisição, registra consultas e
+requisições lentas, aponta comandos repetidos (padrão N+1) e publica os
+números no cabeçalho Server-Timing e em /debug/metrics.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from database.db import db
+
+
+logger = logging.getLogger(__name__)
+
+
+class MetricasSQL:
+    """Agregado por endpoint das requisições atendidas por este processo"""
+
+    def __init__(self, max_lentas=50):
+        self._rotas = {}
+        self._lentas = deque(maxlen=max_lentas)
+        self._lock = threading.Lock()
+
+    def registrar(self, endpoint, duracao_ms, consultas, tempo_banco_ms, repetidas, lenta):
+        with self._lock:
+            rota = self._rotas.setdefault(endpoint, {
+                'requisicoes': 0, 'consultas': 0, 'tempo_ms': 0.0, 'tempo_banco_ms': 0.0,
+                'max_consultas': 0, 'max_tempo_ms': 0.0, 'lentas': 0, 'n_mais_1': 0
+            })
+            rota['requisicoes'] += 1
+            rota['consultas'] += consultas
+            rota['tempo_ms'] += duracao_ms
+            rota['tempo_banco_ms'] += tempo_banco_ms
+            rota['max_consultas'] = max(rota['max_consultas'], consultas)
+            rota['max_tempo_ms'] = max(rota['max_tempo_ms'], duracao_ms)
+            rota['lentas'] += int(lenta)
+            rota['n_mais_1'] += int(bool(repetidas))
+            if lenta:
+                self._lentas.append({
+                    'endpoint': endpoint,
+                    'caminho': request.path,
+                    'tempo_ms': round(duracao_ms, 1),
+                    'tempo_banco_ms': round(tempo_banco_ms, 1),
+                    'consultas': consultas,
+                    'em': time.strftime('%Y-%m-%d %H:%M:%S')
+                })
+
+    def resumo(self):
+        """Médias e máximos por endpoint, mais as últimas requisições lentas"""
+        with self._lock:
+            rotas = {}
+            for endpoint, rota in sorted(self._rotas.items()):
+                total = rota['requisicoes']
+                rotas[endpoint] = {
+                    'requisicoes': total,
+                    'media_consultas': round(rota['consultas'] / total, 2),
+                    'max_consultas': rota['max_consultas'],
+                    'media_tempo_ms': round(rota['tempo_ms'] / total, 2),
+                    'media_tempo_banco_ms': round(rota['tempo_banco_ms'] / total, 2),
+                    'max_tempo_ms': round(rota['max_tempo_ms'], 2),
+                    'lentas': rota['lentas'],
+                    'n_mais_1': rota['n_mais_1']
+                }
+            return {'rotas': rotas, 'requisicoes_lentas': list(self._lentas)}
+
+
+def _antes_do_comando(conn, cursor, statement, parameters, context, executemany):
+    # No contexto do comando, e não na conexão: um comando que falha não deixa sobras no pool
+    context._inicio_comando = time.perf_counter()
+
+
+def _depois_do_comando(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, '_inicio_comando', None)
+    if inicio is None:
+        return
+    # Fora de requisição (CLI, migrações, stream SSE) não há onde acumular
+    if not has_request_context():
+        return
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+
+    estatisticas = g.get('estatisticas_sql')
+    if estatisticas is None:
+        return
+    estatisticas['consultas'] += 1
+    estatisticas['tempo_ms'] += duracao_ms
+    # Mesmo texto com parâmetros diferentes: é assim que aparece um loop de Model.query.get.
+    # Só leituras: UPDATEs com versão (database/concorrencia.py) são um por confronto de propósito
+    if statement.lstrip()[:6].upper() == 'SELECT':
+        estatisticas['comandos'][statement] = estatisticas['comandos'].get(statement, 0) + 1
+
+    limite = current_app.config.get('SQL_CONSULTA_LENTA_MS', 100)
+    if duracao_ms >= limite:
+        logger.warning(f"Consulta lenta ({duracao_ms:.1f} ms) em {request.path}: {' '.join(statement.split())[:300]}")
+
+
+def configurar_instrumentacao(app):
+    """Liga a instrumentação se INSTRUMENTACAO_SQL estiver ativa"""
+    if not app.config.get('INSTRUMENTACAO_SQL', True):
+        app.extensions['metricas_sql'] = None
+        return None
+
+    metricas = MetricasSQL()
+    app.extensions['metricas_sql'] = metricas
+
+    with app.app_context():
+        # Banco principal e réplica (se houver)
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _antes_do_comando)
+            event.listen(engine, 'after_cursor_execute', _depois_do_comando)
+
+    @app.before_request
+    def iniciar_medicao():
+        g.estatisticas_sql = {'inicio': time.perf_counter(), 'consultas': 0, 'tempo_ms': 0.0, 'comandos': {}}
+
+    @app.after_request
+    def registrar_medicao(resposta):
+        estatisticas = g.pop('estatisticas_sql', None)
+        if estatisticas is None:
+            return resposta
+
+        duracao_ms = (time.perf_counter() - estatisticas['inicio']) * 1000
+        consultas = estatisticas['consultas']
+        tempo_banco_ms = estatisticas['tempo_ms']
+
+        limite_repeticoes = app.config.get('SQL_REPETICOES_N_MAIS_1', 5)
+        repetidas = {comando: vezes for comando, vezes in estatisticas['comandos'].items()
+                     if vezes >= limite_repeticoes}
+        for comando, vezes in repetidas.items():
+            logger.warning(f"Possível N+1 em {request.path}: {vezes}x {' '.join(comando.split())[:300]}")
+
+        lenta = duracao_ms >= app.config.get('SQL_REQUISICAO_LENTA_MS', 500)
+        if lenta:
+            logger.warning(
+                f"Requisição lenta: {request.method} {request.path} em {duracao_ms:.1f} ms "
+                f"({consultas} consultas, {tempo_banco_ms:.1f} ms no banco)"
+            )
+
+        metricas.registrar(request.endpoint or request.path, duracao_ms, consultas,
+                           tempo_banco_ms, repetidas, lenta)
+        resposta.headers.add(
+            'Server-Timing',
+            f'db;dur={tempo_banco_ms:.1f};desc="{consultas} consultas", app;dur={duracao_ms:.1f}'
+        )
+        return resposta
+
+    return metricas
@@ -0,0 +1,251 @@
+"""Migrações de esquema para bancos criados antes das mudanças nos models
+
+O db.create_all() só cria tabelas novas; índices e restrições adicionados a
+tabelas existentes precisam ser aplicados aqui. Cada migração roda uma única
+vez, em sua própria transação, e fica registrada em migracao_aplicada.
+
+As migrações são independentes entre si: uma que falha (por exemplo, índice
+único com dados duplicados) não impede as seguintes, que adicionam colunas
+usadas pelos models, e é tentada de novo na próxima inicialização.
+"""
+import logging
+from flask import current_app
+from sqlalchemy import inspect, select, text
+from sqlalchemy.schema import CreateTable
+from database.db import db
+from database.models import MigracaoAplicada
+
+
+logger = logging.getLogger(__name__)
+
+# Chave do advisory lock do Postgres (evita dois workers migrando ao mesmo tempo)
+LOCK_MIGRACOES = 7210345
+
+
+def _criar_indice_unico(conn, nome, tabela, colunas):
+    """Cria um índice único, recusando se já houver linhas duplicadas"""
+    lista = ', '.join(colunas)
+    duplicadas = conn.execute(text(
+        f"SELECT {lista}, COUNT(*) FROM {tabela} GROUP BY {lista} HAVING COUNT(*) > 1"
+    )).all()
+    if duplicadas:
+        exemplos = '; '.join(
+            ', '.join(f"{coluna}={valor!r}" for coluna, valor in zip(colunas, linha)) + f" ({linha[-1]} linhas)"
+            for linha in duplicadas[:5]
+        )
+        raise ValueError(
+            f"{len(duplicadas)} combinações repetidas de ({lista}) em {tabela}, por exemplo: {exemplos}; "
+            f"corrija os dados antes de criar {nome} e rode 'flask --app app migrar'"
+        )
+    conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {nome} ON {tabela} ({lista})"))
+
+
+def _indices_compostos(conn):
+    """Índices e restrições únicas dos caminhos de consulta mais usados"""
+    _criar_indice_unico(conn, 'uq_jogador_torneio_nome', 'jogador', ['torneio_id', 'nome'])
+    _criar_indice_unico(conn, 'uq_participacao_jogador_torneio', 'participacao_torneio',
+                        ['jogador_permanente_id', 'torneio_id'])
+    _criar_indice_unico(conn, 'uq_confronto_torneio_grupo_confronto', 'confronto',
+                        ['torneio_id', 'grupo_idx', 'confronto_idx'])
+    _criar_indice_unico(conn, 'uq_confronto_eliminatoria_torneio_fase_jogo', 'confronto_eliminatoria',
+                        ['torneio_id', 'fase', 'jogo_numero'])
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_jogador_permanente ON jogador (jogador_permanente_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_participacao_torneio ON participacao_torneio (torneio_id)"))
+
+
+def _indice_busca_nome(conn):
+    """Índice trigram para as buscas ilike('%termo%') por nome (só no Postgres)"""
+    if conn.dialect.name != 'postgresql':
+        # O SQLite não usa índice para LIKE com curinga no início
+        logger.info("Índice trigram ignorado: disponível apenas no Postgres")
+        return
+
+    # Sem permissão para a extensão a busca continua funcionando com seq scan
+    try:
+        with conn.begin_nested():
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception as e:
+        logger.warning(f"Extensão pg_trgm indisponível, índice de busca não criado: {str(e)}")
+        return
+
+    # O operador gin_trgm_ops atende LIKE e ILIKE sem precisar de lower()
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_jogador_permanente_nome_trgm "
+        "ON jogador_permanente USING gin (nome gin_trgm_ops)"
+    ))
+
+
+# Tabelas com torneio_id apagadas junto com o torneio
+TABELAS_DO_TORNEIO = ['jogador', 'participacao_torneio', 'confronto', 'confronto_eliminatoria',
+                      'snapshot_torneio', 'evento_torneio']
+
+
+def _reconstruir_tabela_sqlite(conn, tabela):
+    """Recria uma tabela do SQLite a partir do model, preservando as linhas
+
+    O SQLite não altera FOREIGN KEY de tabelas existentes; o procedimento é
+    criar a tabela nova, copiar os dados, apagar a antiga e renomear.
+    """
+    nome = tabela.name
+    temporaria = f"{nome}_novo"
+    colunas_antigas = {linha[1] for linha in conn.execute(text(f"PRAGMA table_info({nome})"))}
+    colunas = ', '.join(coluna.name for coluna in tabela.columns if coluna.name in colunas_antigas)
+    ddl = str(CreateTable(tabela).compile(dialect=conn.dialect)).replace(
+        f"CREATE TABLE {nome} (", f"CREATE TABLE {temporaria} (", 1
+    )
+
+    conn.execute(text(ddl))
+    conn.execute(text(f"INSERT INTO {temporaria} ({colunas}) SELECT {colunas} FROM {nome}"))
+    conn.execute(text(f"DROP TABLE {nome}"))
+    conn.execute(text(f"ALTER TABLE {temporaria} RENAME TO {nome}"))
+    for indice in tabela.indexes:
+        indice.create(conn)
+
+
+def _exclusao_em_cascata(conn):
+    """Chaves estrangeiras para torneio.id com ON DELETE CASCADE"""
+    if conn.dialect.name == 'postgresql':
+        for tabela in TABELAS_DO_TORNEIO:
+            restricoes = conn.execute(text(
+                "SELECT con.conname, con.confdeltype FROM pg_constraint con "
+                "JOIN pg_class rel ON rel.oid = con.conrelid "
+                "JOIN pg_class ref ON ref.oid = con.confrelid "
+                "WHERE con.contype = 'f' AND rel.relname = :tabela AND ref.relname = 'torneio'"
+            ), {'tabela': tabela}).all()
+            for nome, acao in restricoes:
+                if acao == 'c':
+                    continue
+                conn.execute(text(
+                    f'ALTER TABLE {tabela} DROP CONSTRAINT "{nome}", '
+                    f'ADD CONSTRAINT "{nome}" FOREIGN KEY (torneio_id) REFERENCES torneio (id) ON DELETE CASCADE'
+                ))
+        return
+
+    if conn.dialect.name == 'sqlite':
+        # Com as chaves ligadas o SQLite apagaria filhos e reescreveria as referências
+        # ao trocar as tabelas; o pragma só muda fora de transação e volta a ser
+        # ligado no próximo checkout da conexão (database/db.py)
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        # O pysqlite não abre transação para DDL; sem ela uma falha deixaria tabelas pela metade
+        if not conn.connection.dbapi_connection.in_transaction:
+            conn.exec_driver_sql("BEGIN")
+
+        for tabela in TABELAS_DO_TORNEIO:
+            chaves = conn.execute(text(f"PRAGMA foreign_key_list({tabela})")).mappings().all()
+            if all(chave['on_delete'] == 'CASCADE' for chave in chaves if chave['table'] == 'torneio'):
+                continue
+            _reconstruir_tabela_sqlite(conn, db.metadata.tables[tabela])
+            logger.info(f"Tabela {tabela} reconstruída com ON DELETE CASCADE")
+
+        violacoes = conn.exec_driver_sql("PRAGMA foreign_key_check").all()
+        if violacoes:
+            raise ValueError(f"{len(violacoes)} referências inválidas após reconstruir as tabelas")
+        return
+
+    logger.warning(f"Exclusão em cascata não migrada para o banco {conn.dialect.name}")
+
+
+def _torneio_arquivado(conn):
+    """Coluna torneio.arquivado (arquivo de torneios antigos)"""
+    colunas = {coluna['name'] for coluna in inspect(conn).get_columns('torneio')}
+    if 'arquivado' not in colunas:
+        conn.execute(text("ALTER TABLE torneio ADD COLUMN arquivado BOOLEAN NOT NULL DEFAULT FALSE"))
+
+
+def _torneio_sincronizacao(conn):
+    """Colunas torneio.origem e torneio.sincronizado_em (sincronização com o banco central)"""
+    colunas = {coluna['name'] for coluna in inspect(conn).get_columns('torneio')}
+    if 'origem' not in colunas:
+        conn.execute(text("ALTER TABLE torneio ADD COLUMN origem VARCHAR(120)"))
+    if 'sincronizado_em' not in colunas:
+        tipo = 'TIMESTAMP' if conn.dialect.name == 'postgresql' else 'DATETIME'
+        conn.execute(text(f"ALTER TABLE torneio ADD COLUMN sincronizado_em {tipo}"))
+    # Coluna nova, só com NULL: não há duplicadas a conferir
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_torneio_origem ON torneio (origem)"))
+
+
+def _versao_confrontos(conn):
+    """Coluna versao de confronto e confronto_eliminatoria (controle de concorrência otimista)"""
+    for tabela in ('confronto', 'confronto_eliminatoria'):
+        colunas = {coluna['name'] for coluna in inspect(conn).get_columns(tabela)}
+        if 'versao' not in colunas:
+            conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN versao INTEGER NOT NULL DEFAULT 1"))
+
+
+def _torneio_terceiro_lugar(conn):
+    """Coluna torneio.disputa_terceiro_lugar (chave do torneio fixada no sorteio)"""
+    colunas = {coluna['name'] for coluna in inspect(conn).get_columns('torneio')}
+    if 'disputa_terceiro_lugar' not in colunas:
+        conn.execute(text("ALTER TABLE torneio ADD COLUMN disputa_terceiro_lugar BOOLEAN NOT NULL DEFAULT FALSE"))
+    # Torneios que já jogaram a disputa de 3º lugar foram sorteados com ela; os em andamento
+    # ficam com a configuração atual (a que valia para eles até agora)
+    conn.execute(text(
+        "UPDATE torneio SET disputa_terceiro_lugar = TRUE WHERE id IN "
+        "(SELECT torneio_id FROM confronto_eliminatoria WHERE fase = 'terceiro')"
+    ))
+    if current_app.config.get('DISPUTA_TERCEIRO_LUGAR', False):
+        conn.execute(text(
+            "UPDATE torneio SET disputa_terceiro_lugar = TRUE WHERE finalizado IS NOT TRUE"
+        ))
+
+
+# Em ordem de aplicação; nunca renumere uma migração já publicada
+MIGRACOES = [
+    (1, 'indices_compostos', _indices_compostos),
+    (2, 'indice_busca_nome', _indice_busca_nome),
+    (3, 'exclusao_em_cascata', _exclusao_em_cascata),
+    (4, 'torneio_arquivado', _torneio_arquivado),
+    (5, 'torneio_sincronizacao', _torneio_sincronizacao),
+    (6, 'versao_confrontos', _versao_confrontos),
+    (7, 'torneio_terceiro_lugar', _torneio_terceiro_lugar),
+]
+
+
+class MigracaoManager:
+    """Classe para aplicar e consultar as migrações de esquema"""
+
+    @staticmethod
+    def versoes_aplicadas():
+        """Retorna o conjunto de versões já aplicadas"""
+        with db.engine.connect() as conn:
+            return set(conn.execute(select(MigracaoAplicada.versao)).scalars())
+
+    @staticmethod
+    def pendentes():
+        """Lista (versao, nome) das migrações ainda não aplicadas"""
+        aplicadas = MigracaoManager.versoes_aplicadas()
+        return [(versao, nome) for versao, nome, _ in MIGRACOES if versao not in aplicadas]
+
+    @staticmethod
+    def aplicar_pendentes():
+        """Aplica as migrações pendentes em ordem
+
+        Uma migração que falha é registrada no log e as seguintes continuam
+        sendo aplicadas. Retorna a lista de versões aplicadas nesta execução.
+        """
+        aplicadas_agora = []
+        tabela = MigracaoAplicada.__table__
+
+        for versao, nome, migracao in MIGRACOES:
+            try:
+                with db.engine.begin() as conn:
+                    if conn.dialect.name == 'postgresql':
+                        conn.execute(text("SELECT pg_advisory_xact_lock(:chave)"), {'chave': LOCK_MIGRACOES})
+
+                    # Conferir dentro da transação: outro processo pode ter aplicado antes
+                    ja_aplicada = conn.execute(
+                        select(tabela.c.versao).where(tabela.c.versao == versao)
+                    ).first()
+                    if ja_aplicada:
+                        continue
+
+                    migracao(conn)
+                    conn.execute(tabela.insert().values(versao=versao, nome=nome))
+
+                aplicadas_agora.append(versao)
+                logger.info(f"Migração {versao} ({nome}) aplicada")
+
+            except Exception as e:
+                logger.error(f"Erro ao aplicar migração {versao} ({nome}): {str(e)}")
+
+        return aplicadas_agora
@@ -19,7 +19,7 @@ class ParticipacaoTorneio(db.Model):
     """Modelo para participação em torneios (substitui funcionalidade do Jogador)"""
     id = db.Column(db.Integer, primary_key=True)
     jogador_permanente_id = db.Column(db.Integer, db.ForeignKey('jogador_permanente.id'), nullable=False)
-    torneio_id = db.Column(db.Integer, db.ForeignKey('torneio.id'), nullable=False)
+    torneio_id = db.Column(db.Integer, db.ForeignKey('torneio.id', ondelete='CASCADE'), nullable=False)
     
     # Dados de desempenho no torneio
     vitorias = db.Column(db.Integer, default=0)
@@ -30,6 +30,12 @@ class ParticipacaoTorneio(db.Model):
     grupo_idx = db.Column(db.Integer, default=0)
     pontuacao = db.Column(db.Integer, default=0)
     
+    # Um jogador participa uma única vez de cada torneio
+    __table_args__ = (
+        db.Index('uq_participacao_jogador_torneio', 'jogador_permanente_id', 'torneio_id', unique=True),
+        db.Index('ix_participacao_torneio', 'torneio_id'),
+    )
+    
     def __repr__(self):
         return f"<ParticipacaoTorneio {self.id}>"
 
@@ -45,7 +51,7 @@ class Jogador(db.Model):
     posicao_grupo = db.Column(db.Integer, default=0)
     grupo_idx = db.Column(db.Integer, default=0)
     pontuacao = db.Column(db.Integer, default=0)
-    torneio_id = db.Column(db.Integer, db.ForeignKey('torneio.id'), nullable=False)
+    torneio_id = db.Column(db.Integer, db.ForeignKey('torneio.id', ondelete='CASCADE'), nullable=False)
     
     # Novo campo para rastrear relação com jogador permanente
     jogador_permanente_id = db.Column(db.Integer, db.ForeignKey('jogador_permanente.id'), nullable=True)
@@ -54,6 +60,12 @@ class Jogador(db.Model):
     # NOVO: Campo para salvar a classificação geral (ordem do sorteio)
     classificacao_geral = db.Column(db.Integer, default=0)
 
+    # Nomes são únicos dentro do torneio; o índice também cobre buscas só por torneio_id
+    __table_args__ = (
+        db.Index('uq_jogador_torneio_nome', 'torneio_id', 'nome', unique=True),
+        db.Index('ix_jogador_permanente', 'jogador_permanente_id'),
+    )
+
 class Torneio(db.Model):
     """Modelo para torneios"""
     id = db.Column(db.Integer, primary_key=True)
@@ -61,16 +73,27 @@ class Torneio(db.Model):
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
     finalizado = db.Column(db.Boolean, default=False)
     formato_eliminatoria = db.Column(db.String(20), default='separados')  # 'separados' ou 'mistos'
-    jogadores = db.relationship('Jogador', backref='torneio', lazy=True)
-    participacoes = db.relationship('ParticipacaoTorneio', backref='torneio', lazy=True)
+    disputa_terceiro_lugar = db.Column(db.Boolean, nullable=False, default=False)  # Definida no sorteio
+    arquivado = db.Column(db.Boolean, nullable=False, default=False)  # Dados movidos para jogador_arquivado
+    # Sincronização de um nó local (quadra) com o banco central
+    origem = db.Column(db.String(120), nullable=True)  # '<nó>:<id local>' no banco central
+    sincronizado_em = db.Column(db.DateTime, nullable=True)  # No nó local: quando foi enviado ao central
+    
+    # Os filhos são removidos pelo banco (ON DELETE CASCADE) ao apagar o torneio
+    jogadores = db.relationship('Jogador', backref='torneio', lazy=True, passive_deletes=True)
+    participacoes = db.relationship('ParticipacaoTorneio', backref='torneio', lazy=True, passive_deletes=True)
+
+    __table_args__ = (
+        db.Index('uq_torneio_origem', 'origem', unique=True),
+    )
 
 class Confronto(db.Model):
     """Modelo para confrontos"""
     id = db.Column(db.Integer, primary_key=True)
 
     # Relacionamentos
-    torneio_id = db.Column(db.Integer, db.ForeignKey('torneio.id'), nullable=False)
-    torneio = db.relationship('Torneio', backref=db.backref('confrontos', lazy=True))
+    torneio_id = db.Column(db.Integer, db.ForeignKey('torneio.id', ondelete='CASCADE'), nullable=False)
+    torneio = db.relationship('Torneio', backref=db.backref('confrontos', lazy=True, passive_deletes=True))
 
     # Dados do confronto
     grupo_idx = db.Column(db.Integer, nullable=False)  # Índice do grupo
@@ -97,6 +120,13 @@ class Confronto(db.Model):
     # Metadados
     criado_em = db.Column(db.DateTime, default=datetime.now)
     atualizado_em = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    versao = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Incrementada a cada UPDATE (ver database/concorrencia.py)
+    
+    __mapper_args__ = {'version_id_col': versao}
+    
+    __table_args__ = (
+        db.Index('uq_confronto_torneio_grupo_confronto', 'torneio_id', 'grupo_idx', 'confronto_idx', unique=True),
+    )
     
     def __repr__(self):
         return f"<Confronto {self.id}: G{self.grupo_idx+1}-C{self.confronto_idx+1}>"
@@ -106,8 +136,8 @@ class ConfrontoEliminatoria(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     
     # Relacionamentos
-    torneio_id = db.Column(db.Integer, db.ForeignKey('torneio.id'), nullable=False)
-    torneio = db.relationship('Torneio', backref=db.backref('confrontos_eliminatorias', lazy=True))
+    torneio_id = db.Column(db.Integer, db.ForeignKey('torneio.id', ondelete='CASCADE'), nullable=False)
+    torneio = db.relationship('Torneio', backref=db.backref('confrontos_eliminatorias', lazy=True, passive_deletes=True))
     
     # Tipo de fase
     fase = db.Column(db.String(20), nullable=False)  # 'quartas', 'semi', 'final'
@@ -134,6 +164,142 @@ class ConfrontoEliminatoria(db.Model):
     # Metadados
     criado_em = db.Column(db.DateTime, default=datetime.now)
     atualizado_em = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    versao = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Incrementada a cada UPDATE (ver database/concorrencia.py)
+    
+    __mapper_args__ = {'version_id_col': versao}
+    
+    __table_args__ = (
+        db.Index('uq_confronto_eliminatoria_torneio_fase_jogo', 'torneio_id', 'fase', 'jogo_numero', unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<ConfrontoEliminatoria {self.id}: {self.fase.capitalize()} - Jogo {self.jogo_numero}>" 
+
+
+class RankingJogador(db.Model):
+    """Ranking global materializado, atualizado ao pontuar ou apagar torneios"""
+    jogador_permanente_id = db.Column(db.Integer, db.ForeignKey('jogador_permanente.id'), primary_key=True)
+    nome = db.Column(db.String(80), nullable=False)
+    pontos = db.Column(db.Integer, nullable=False, default=0)
+    torneios = db.Column(db.Integer, nullable=False, default=0)
+    posicao = db.Column(db.Integer, nullable=False, default=0)  # Empates dividem a posição
+
+    # Metadados
+    atualizado_em = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    # Leitura do ranking é um ORDER BY posicao, nome com LIMIT
+    __table_args__ = (
+        db.Index('ix_ranking_jogador_posicao_nome', 'posicao', 'nome'),
+    )
+
+    def __repr__(self):
+        return f"<RankingJogador {self.posicao}º {self.nome}: {self.pontos}>"
+
+
+class RatingJogador(db.Model):
+    """Rating atual do jogador, calculado jogo a jogo (ver database/rating.py)"""
+    jogador_permanente_id = db.Column(db.Integer, db.ForeignKey('jogador_permanente.id'), primary_key=True)
+    rating = db.Column(db.Float, nullable=False)
+    desvio = db.Column(db.Float, nullable=False)  # Incerteza do rating; cai a cada jogo
+    jogos = db.Column(db.Integer, nullable=False, default=0)
+
+    # Metadados
+    atualizado_em = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f"<RatingJogador {self.jogador_permanente_id}: {self.rating:.0f}>"
+
+
+class HistoricoRating(db.Model):
+    """Rating do jogador antes e depois de cada torneio"""
+    id = db.Column(db.Integer, primary_key=True)
+    jogador_permanente_id = db.Column(db.Integer, db.ForeignKey('jogador_permanente.id'), nullable=False)
+    torneio_id = db.Column(db.Integer, db.ForeignKey('torneio.id', ondelete='CASCADE'), nullable=False)
+    rating_antes = db.Column(db.Float, nullable=False)
+    desvio_antes = db.Column(db.Float, nullable=False)
+    rating = db.Column(db.Float, nullable=False)
+    desvio = db.Column(db.Float, nullable=False)
+    jogos = db.Column(db.Integer, nullable=False, default=0)  # Jogos no torneio
+
+    __table_args__ = (
+        db.Index('uq_historico_rating_jogador_torneio', 'jogador_permanente_id', 'torneio_id', unique=True),
+        db.Index('ix_historico_rating_torneio', 'torneio_id'),
+    )
+
+    def __repr__(self):
+        return f"<HistoricoRating {self.jogador_permanente_id} no torneio {self.torneio_id}: {self.rating:.0f}>"
+
+
+class SnapshotTorneio(db.Model):
+    """Dados da página de detalhes de um torneio finalizado, já montados"""
+    torneio_id = db.Column(db.Integer, db.ForeignKey('torneio.id', ondelete='CASCADE'), primary_key=True)
+    versao = db.Column(db.Integer, nullable=False)  # Formato dos dados (ver database/snapshot.py)
+    dados = db.Column(db.LargeBinary, nullable=False)  # JSON compactado com zlib
+    
+    # Metadados
+    gerado_em = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f"<SnapshotTorneio {self.torneio_id} v{self.versao}>"
+
+
+class JogadorArquivado(db.Model):
+    """Resumo de um jogador em um torneio arquivado (substitui Jogador e confrontos)"""
+    torneio_id = db.Column(db.Integer, db.ForeignKey('torneio.id', ondelete='CASCADE'), primary_key=True)
+    jogador_id = db.Column(db.Integer, primary_key=True)  # Id que o jogador tinha na tabela jogador
+    jogador_permanente_id = db.Column(db.Integer, db.ForeignKey('jogador_permanente.id'), nullable=True)
+    nome = db.Column(db.String(80), nullable=False)
+    
+    # Dados usados pelo ranking e pelo perfil
+    pontuacao = db.Column(db.Integer, nullable=False, default=0)
+    vitorias_grupo = db.Column(db.Integer, nullable=False, default=0)
+    jogos_eliminatorias = db.Column(db.Integer, nullable=False, default=0)
+    vitorias_eliminatorias = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.Index('ix_jogador_arquivado_permanente', 'jogador_permanente_id'),
+    )
+
+    def __repr__(self):
+        return f"<JogadorArquivado {self.nome} (torneio {self.torneio_id})>"
+
+
+class EventoTorneio(db.Model):
+    """Eventos do torneio em andamento transmitidos ao placar ao vivo (SSE)"""
+    id = db.Column(db.Integer, primary_key=True)  # Também é o id do evento no stream
+    torneio_id = db.Column(db.Integer, db.ForeignKey('torneio.id', ondelete='CASCADE'), nullable=False)
+    tipo = db.Column(db.String(40), nullable=False)  # 'grupo', 'eliminatoria', 'chave', 'campeao', 'recarregar'
+    dados = db.Column(db.Text, nullable=False)  # JSON
+    
+    # Metadados
+    criado_em = db.Column(db.DateTime, default=datetime.now)
+    
+    __table_args__ = (
+        db.Index('ix_evento_torneio_torneio_id', 'torneio_id', 'id'),
+    )
+
+    def __repr__(self):
+        return f"<EventoTorneio {self.id}: {self.tipo}>"
+
+
+class EstadoSessao(db.Model):
+    """Estado da sessão e dos torneios em andamento guardado no servidor (uma linha por chave)"""
+    namespace = db.Column(db.String(80), primary_key=True)  # 'sessao:<id>' ou 'torneio:<id>'
+    chave = db.Column(db.String(80), primary_key=True)
+    valor = db.Column(db.Text, nullable=False)  # JSON no formato da sessão do Flask
     
+    # Metadados
+    atualizado_em = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f"<EstadoSessao {self.namespace}/{self.chave}>"
+
+
+class MigracaoAplicada(db.Model):
+    """Migrações de esquema já aplicadas ao banco (ver database/migracoes.py)"""
+    versao = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(100), nullable=False)
+    aplicada_em = db.Column(db.DateTime, default=datetime.now)
+
     def __repr__(self):
-        return f"<ConfrontoEliminatoria {self.id}: {self.fase.capitalize()} - Jogo {self.jogo_numero}>" 
\ No newline at end of file
+        return f"<MigracaoAplicada {self.versao}: {self.nome}>"
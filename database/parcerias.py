@@ -0,0 +1,245 @@
+"""Histórico de parcerias e sorteio que evita repetir duplas
+
+Dentro de um grupo de 4 todos fazem dupla com todos (gerar_confrontos faz o
+rodízio), então repetir parceria é cair no mesmo grupo de quem já jogou
+junto. A matriz jogador x jogador (NumPy) conta as duplas de todos os
+Confronto e ConfrontoEliminatoria ainda no banco (torneios arquivados não
+entram) e é atualizada só com as linhas novas desde a última leitura.
+"""
+import logging
+import math
+import random
+import threading
+import time
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+from database.db import db
+from database.models import Confronto, ConfrontoEliminatoria, Jogador, JogadorPermanente
+from database.sorteio import distribuir_em_serpentina, ordenar_por_ranking, ranking_dos_jogadores
+
+
+logger = logging.getLogger(__name__)
+
+# Peso do desequilíbrio de força (em desvios padrão ao quadrado) frente a uma parceria repetida
+PESO_EQUILIBRIO = 1.0
+
+
+class MatrizParcerias:
+    """Quantas vezes cada par de jogadores permanentes jogou na mesma dupla"""
+
+    def __init__(self):
+        self.indice = {}  # jogador_permanente_id -> linha da matriz
+        self.contagem = np.zeros((0, 0), dtype=np.int32)
+        self.lidos = {}  # tabela -> (maior id lido, linhas lidas)
+
+    def _linhas(self, jogador_ids):
+        """Linhas dos jogadores, abrindo espaço na matriz para os novos"""
+        for jogador_id in jogador_ids:
+            if jogador_id not in self.indice:
+                self.indice[jogador_id] = len(self.indice)
+        if len(self.indice) > len(self.contagem):
+            tamanho = max(len(self.indice), 2 * len(self.contagem), 64)
+            ampliada = np.zeros((tamanho, tamanho), dtype=np.int32)
+            ampliada[:len(self.contagem), :len(self.contagem)] = self.contagem
+            self.contagem = ampliada
+        return np.fromiter((self.indice[j] for j in jogador_ids), dtype=np.intp, count=len(jogador_ids))
+
+    def somar(self, duplas):
+        """Soma as duplas [(jogador_permanente_id, jogador_permanente_id)]"""
+        if not duplas:
+            return
+        linhas = self._linhas([j for dupla in duplas for j in dupla]).reshape(-1, 2)
+        np.add.at(self.contagem, (linhas[:, 0], linhas[:, 1]), 1)
+        np.add.at(self.contagem, (linhas[:, 1], linhas[:, 0]), 1)
+
+    def submatriz(self, jogador_ids):
+        """Matriz n x n das parcerias entre os jogadores informados (na ordem dada)"""
+        linhas = np.array([self.indice.get(j, -1) for j in jogador_ids], dtype=np.intp)
+        conhecidos = linhas >= 0
+        resultado = np.zeros((len(jogador_ids), len(jogador_ids)), dtype=np.float64)
+        resultado[np.ix_(conhecidos, conhecidos)] = self.contagem[np.ix_(linhas[conhecidos], linhas[conhecidos])]
+        return resultado
+
+
+def _duplas_da_tabela(modelo, depois_de, ate):
+    """Duplas (ids permanentes) dos confrontos com id em (depois_de, ate]"""
+    a1, a2, b1, b2 = (aliased(Jogador) for _ in range(4))
+    consulta = (
+        select(a1.jogador_permanente_id, a2.jogador_permanente_id,
+               b1.jogador_permanente_id, b2.jogador_permanente_id)
+        .select_from(modelo)
+        .join(a1, a1.id == modelo.jogador_a1_id)
+        .join(a2, a2.id == modelo.jogador_a2_id)
+        .join(b1, b1.id == modelo.jogador_b1_id)
+        .join(b2, b2.id == modelo.jogador_b2_id)
+        .where(modelo.id > depois_de, modelo.id <= ate)
+    )
+    duplas = []
+    linhas = 0
+    for ja1, ja2, jb1, jb2 in db.session.execute(consulta):
+        linhas += 1
+        for dupla in ((ja1, ja2), (jb1, jb2)):
+            if None not in dupla and dupla[0] != dupla[1]:
+                duplas.append(dupla)
+    return duplas, linhas
+
+
+class HistoricoParcerias:
+    """Classe para manter a matriz de parcerias da aplicação atual"""
+
+    _lock = threading.Lock()
+    TABELAS = (Confronto, ConfrontoEliminatoria)
+
+    @staticmethod
+    def _estado():
+        """Matriz guardada nas extensões da aplicação"""
+        return current_app.extensions.setdefault('historico_parcerias', {'matriz': None})
+
+    @staticmethod
+    def obter_matriz():
+        """Retorna a matriz, lendo só os confrontos gravados desde a última consulta
+
+        Se o número de linhas de uma tabela não bate com o que já foi lido mais
+        o que é novo (torneio apagado, arquivado ou fase refeita), a matriz é
+        reconstruída do zero.
+        """
+        estado = HistoricoParcerias._estado()
+        with HistoricoParcerias._lock:
+            matriz = estado['matriz'] or MatrizParcerias()
+            situacao = {
+                modelo: db.session.query(func.count(modelo.id), func.max(modelo.id)).one()
+                for modelo in HistoricoParcerias.TABELAS
+            }
+
+            novas = {}
+            for modelo, (total, maior_id) in situacao.items():
+                ultimo_id, lidas = matriz.lidos.get(modelo.__tablename__, (0, 0))
+                duplas, linhas = _duplas_da_tabela(modelo, ultimo_id, maior_id or 0)
+                if lidas + linhas != total:
+                    break
+                novas[modelo] = duplas
+            else:
+                for modelo, duplas in novas.items():
+                    matriz.somar(duplas)
+                    total, maior_id = situacao[modelo]
+                    matriz.lidos[modelo.__tablename__] = (maior_id or 0, total)
+                estado['matriz'] = matriz
+                return matriz
+
+            matriz = MatrizParcerias()
+            for modelo, (total, maior_id) in situacao.items():
+                duplas, linhas = _duplas_da_tabela(modelo, 0, maior_id or 0)
+                matriz.somar(duplas)
+                matriz.lidos[modelo.__tablename__] = (maior_id or 0, linhas)
+            logger.info(f"Matriz de parcerias reconstruída com {len(matriz.indice)} jogadores")
+            estado['matriz'] = matriz
+            return matriz
+
+
+def otimizar_grupos(parcerias, forca, grupo, fixos, tempo_ms, rng):
+    """Recozimento simulado por trocas de jogadores entre grupos
+
+    parcerias é a matriz n x n de parcerias, forca o vetor de força, grupo o
+    grupo inicial de cada jogador e fixos a máscara dos que não podem ser
+    trocados (cabeças de chave). O custo é o total de parcerias repetidas
+    dentro dos grupos mais PESO_EQUILIBRIO vezes o desvio da força de cada
+    grupo em relação à média. Cada passo sorteia um jogador e avalia de uma
+    vez, com NumPy, a troca com todos os jogadores dos outros grupos.
+    """
+    n = len(grupo)
+    num_grupos = int(grupo.max()) + 1
+    grupo = grupo.copy()
+    todos = np.arange(n)
+    membros = np.zeros((n, num_grupos))
+    membros[todos, grupo] = 1.0
+    soma_no_grupo = parcerias @ membros  # [i, g]: parcerias de i com o grupo g
+    forca_grupo = np.bincount(grupo, weights=forca, minlength=num_grupos)
+    escala = forca.std() ** 2
+    peso = PESO_EQUILIBRIO / escala if escala > 0 else 0.0
+    media = forca_grupo.mean()
+
+    moveis = np.flatnonzero(~fixos)
+    atual = soma_no_grupo[todos, grupo].sum() / 2 + peso * ((forca_grupo - media) ** 2).sum()
+    melhor, melhor_grupo = atual, grupo.copy()
+    if len(moveis) < 2 or num_grupos < 2:
+        return melhor_grupo, melhor
+
+    inicio = time.perf_counter()
+    limite = tempo_ms / 1000.0
+    temperatura_inicial = max(1.0, atual / n)
+    sem_melhora = 0
+    while sem_melhora < 20 * n:
+        decorrido = time.perf_counter() - inicio
+        if decorrido >= limite:
+            break
+        temperatura = temperatura_inicial * (1 - decorrido / limite) + 1e-9
+
+        a = moveis[rng.integers(len(moveis))]
+        g = grupo[a]
+        diferenca = forca - forca[a]
+        delta = (soma_no_grupo[:, g] - parcerias[a] - soma_no_grupo[a, g]
+                 + soma_no_grupo[a, grupo] - parcerias[a] - soma_no_grupo[todos, grupo])
+        delta += peso * (2 * diferenca * (forca_grupo[g] - forca_grupo[grupo]) + 2 * diferenca ** 2)
+        delta[fixos | (grupo == g)] = np.inf
+
+        b = int(np.argmin(delta))
+        variacao = delta[b]
+        if not np.isfinite(variacao):
+            break
+        if variacao > 0 and rng.random() >= math.exp(-variacao / temperatura):
+            sem_melhora += 1
+            continue
+
+        h = grupo[b]
+        grupo[a], grupo[b] = h, g
+        soma_no_grupo[:, g] += parcerias[:, b] - parcerias[:, a]
+        soma_no_grupo[:, h] += parcerias[:, a] - parcerias[:, b]
+        forca_grupo[g] += diferenca[b]
+        forca_grupo[h] -= diferenca[b]
+        atual += variacao
+
+        if atual < melhor - 1e-9:
+            melhor, melhor_grupo = atual, grupo.copy()
+            sem_melhora = 0
+        else:
+            sem_melhora += 1
+
+    return melhor_grupo, melhor
+
+
+def sortear_evitando_repeticoes(jogadores, num_grupos, cabecas_de_chave=None, tempo_ms=300):
+    """Grupos que minimizam parcerias repetidas e equilibram a força pelo ranking
+
+    Parte da distribuição em serpentina pelo ranking e melhora a atribuição
+    dentro do tempo informado; cabeças de chave continuam um por grupo.
+    Retorna (grupos, parcerias repetidas na atribuição escolhida).
+    """
+    ranking = ranking_dos_jogadores(jogadores)
+    ordenados = ordenar_por_ranking(jogadores, ranking, cabecas_de_chave)
+    iniciais = distribuir_em_serpentina(ordenados, num_grupos)
+
+    ids = dict(db.session.query(JogadorPermanente.nome, JogadorPermanente.id).filter(
+        JogadorPermanente.nome.in_(ordenados)
+    ).all())
+    parcerias = HistoricoParcerias.obter_matriz().submatriz([ids.get(nome) for nome in ordenados])
+    forca = np.array([float(ranking.get(nome, (0, 0))[1]) for nome in ordenados])
+
+    posicao = {nome: i for i, nome in enumerate(ordenados)}
+    grupo = np.empty(len(ordenados), dtype=np.intp)
+    for grupo_idx, nomes in enumerate(iniciais):
+        for nome in nomes:
+            grupo[posicao[nome]] = grupo_idx
+    fixos = np.isin(ordenados, list(cabecas_de_chave or []))
+
+    rng = np.random.default_rng(random.getrandbits(64))
+    grupo, _ = otimizar_grupos(parcerias, forca, grupo, fixos, tempo_ms, rng)
+
+    # Dentro de cada grupo mantém a ordem de semeadura (cabeça de chave primeiro)
+    grupos = [[] for _ in range(num_grupos)]
+    for i, nome in enumerate(ordenados):
+        grupos[grupo[i]].append(nome)
+    repetidas = int(sum(parcerias[np.ix_(idx, idx)].sum() for idx in (
+        [posicao[nome] for nome in nomes] for nomes in grupos)) // 2)
+    return grupos, repetidas
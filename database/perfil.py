@@ -0,0 +1,127 @@
+"""Consultas agregadas para o perfil do jogador"""
+import logging
+from sqlalchemy import and_, case, func, not_, or_
+from database.db import db
+from database.models import (Jogador, JogadorArquivado, Torneio, ConfrontoEliminatoria, ParticipacaoTorneio, RankingJogador,
+                             HistoricoRating, RatingJogador)
+
+
+logger = logging.getLogger(__name__)
+
+class PerfilManager:
+    """Classe para montar as estatísticas exibidas no perfil do jogador"""
+
+    # Jogos da fase de grupos (3 jogos por grupo)
+    JOGOS_GRUPO = 3
+
+    @staticmethod
+    def obter_estatisticas(jogador_permanente_id):
+        """Obtém participações, totais e posição no ranking de um jogador
+
+        Usa cinco consultas independentemente do número de torneios: a
+        posição vem do ranking materializado, os jogos/vitórias das
+        eliminatórias são agregados por torneio em uma única consulta,
+        os torneios arquivados vêm prontos de jogador_arquivado e o rating
+        (atual e por torneio) vem de rating_jogador e historico_rating.
+        """
+        ranking = db.session.query(RankingJogador.posicao, RankingJogador.pontos).filter(
+            RankingJogador.jogador_permanente_id == jogador_permanente_id
+        ).first()
+        rating = db.session.get(RatingJogador, jogador_permanente_id)
+        rating_por_torneio = {
+            torneio_id: (depois, depois - antes)
+            for torneio_id, antes, depois in db.session.query(
+                HistoricoRating.torneio_id, HistoricoRating.rating_antes, HistoricoRating.rating
+            ).filter(HistoricoRating.jogador_permanente_id == jogador_permanente_id)
+        }
+
+        # Vitória do jogador: estar no time que venceu (empate conta para a dupla B)
+        no_time_a = or_(
+            ConfrontoEliminatoria.jogador_a1_id == Jogador.id,
+            ConfrontoEliminatoria.jogador_a2_id == Jogador.id
+        )
+        time_a_venceu = ConfrontoEliminatoria.pontos_dupla_a > ConfrontoEliminatoria.pontos_dupla_b
+        vitoria = case(
+            (and_(no_time_a, time_a_venceu), 1),
+            (and_(not_(no_time_a), not_(time_a_venceu)), 1),
+            else_=0
+        )
+
+        linhas = db.session.query(
+            ParticipacaoTorneio.vitorias,
+            Torneio,
+            Jogador.id,
+            Jogador.pontuacao,
+            func.count(ConfrontoEliminatoria.id),
+            func.coalesce(func.sum(vitoria), 0)
+        ).join(
+            Torneio, ParticipacaoTorneio.torneio_id == Torneio.id
+        ).join(
+            Jogador, (Jogador.torneio_id == Torneio.id) & (Jogador.jogador_permanente_id == jogador_permanente_id)
+        ).outerjoin(
+            ConfrontoEliminatoria,
+            (ConfrontoEliminatoria.torneio_id == Torneio.id) & or_(
+                ConfrontoEliminatoria.jogador_a1_id == Jogador.id,
+                ConfrontoEliminatoria.jogador_a2_id == Jogador.id,
+                ConfrontoEliminatoria.jogador_b1_id == Jogador.id,
+                ConfrontoEliminatoria.jogador_b2_id == Jogador.id
+            )
+        ).filter(
+            ParticipacaoTorneio.jogador_permanente_id == jogador_permanente_id
+        ).group_by(
+            ParticipacaoTorneio.id, Torneio.id, Jogador.id
+        ).all()
+
+        linhas += db.session.query(
+            JogadorArquivado.vitorias_grupo,
+            Torneio,
+            JogadorArquivado.jogador_id,
+            JogadorArquivado.pontuacao,
+            JogadorArquivado.jogos_eliminatorias,
+            JogadorArquivado.vitorias_eliminatorias
+        ).join(
+            Torneio, JogadorArquivado.torneio_id == Torneio.id
+        ).filter(
+            JogadorArquivado.jogador_permanente_id == jogador_permanente_id
+        ).all()
+
+        total_jogos = 0
+        total_vitorias = 0
+        participacoes = []
+
+        for vitorias_grupo, torneio, jogador_id, pontuacao, jogos_eliminatorias, vitorias_eliminatorias in linhas:
+            vitorias_grupo = vitorias_grupo or 0
+            vitorias_total = vitorias_grupo + vitorias_eliminatorias
+            jogos_torneio = PerfilManager.JOGOS_GRUPO + jogos_eliminatorias
+
+            total_jogos += jogos_torneio
+            total_vitorias += vitorias_total
+            rating_torneio, variacao = rating_por_torneio.get(torneio.id, (None, None))
+
+            participacoes.append({
+                'torneio_id': torneio.id,
+                'jogador_id': jogador_id,
+                'torneio': torneio.nome,
+                'data': torneio.data_criacao.strftime('%d/%m/%Y'),
+                'jogos': jogos_torneio,
+                'vitorias': vitorias_total,
+                'vitorias_grupo': vitorias_grupo,
+                'vitorias_eliminatorias': vitorias_eliminatorias,
+                'pontuacao': pontuacao,
+                'rating': round(rating_torneio) if rating_torneio is not None else None,
+                'variacao_rating': round(variacao) if variacao is not None else None,
+                'finalizado': torneio.finalizado
+            })
+
+        # Ordenar as participações por data (mais recentes primeiro)
+        participacoes.sort(key=lambda x: x['data'], reverse=True)
+
+        return {
+            'participacoes': participacoes,
+            'total_jogos': total_jogos,
+            'total_vitorias': total_vitorias,
+            'total_pontos': ranking.pontos if ranking else 0,
+            'posicao_ranking': ranking.posicao if ranking else None,
+            'rating': round(rating.rating) if rating else None,
+            'desvio_rating': round(rating.desvio) if rating else None
+        }
@@ -1,8 +1,8 @@
 """Classes e funções para o Ranking dos jogadores"""
 import logging
-from sqlalchemy import text
+from sqlalchemy import func, distinct, select, union_all
 from database.db import db
-from database.models import Jogador, Torneio, ConfrontoEliminatoria
+from database.models import Jogador, JogadorArquivado, Torneio, ConfrontoEliminatoria, JogadorPermanente, RankingJogador, RatingJogador
 
 
 logger = logging.getLogger(__name__)
@@ -44,11 +44,13 @@ class RankingManager:
                 logger.warning(f"Torneio {torneio_id} não está finalizado ou não existe")
                 return False
             
-            # Buscar todos os jogadores do torneio e resetar suas pontuações
+            # Buscar todos os jogadores do torneio e resetar suas pontuações (gravado no mesmo commit
+            # das novas pontuações, para os objetos não expirarem e serem relidos um a um)
             jogadores = Jogador.query.filter_by(torneio_id=torneio_id).all()
+            jogadores_por_id = {jogador.id: jogador for jogador in jogadores}
+            jogadores_permanentes_ids = [jogador.jogador_permanente_id for jogador in jogadores]
             for jogador in jogadores:
                 jogador.pontuacao = 0
-            db.session.commit()
             
             # Criar um mapeamento de jogadores para suas pontuações máximas
             pontuacoes_jogadores = {}
@@ -56,28 +58,15 @@ class RankingManager:
             # Buscar confrontos da fase eliminatória
             confrontos = ConfrontoEliminatoria.query.filter_by(torneio_id=torneio_id).all()
             
-            # Organizar por fase
-            por_fase = {'quartas': [], 'semi': [], 'final': None}
+            # Pontuação de cada fase (a final é processada depois)
+            final = None
             for confronto in confrontos:
                 if confronto.fase == 'final':
-                    por_fase['final'] = confronto
-                else:
-                    por_fase[confronto.fase].append(confronto)
-            
-            # Processar quartas de final (30 pontos)
-            for confronto in por_fase['quartas']:
-                jogadores_ids = [
-                    confronto.jogador_a1_id, confronto.jogador_a2_id,
-                    confronto.jogador_b1_id, confronto.jogador_b2_id
-                ]
-                for jogador_id in jogadores_ids:
-                    pontuacoes_jogadores[jogador_id] = max(
-                        pontuacoes_jogadores.get(jogador_id, 0),
-                        RankingManager.PONTOS['quartas']
-                    )
-            
-            # Processar semi-finais (50 pontos)
-            for confronto in por_fase['semi']:
+                    final = confronto
+                    continue
+                
+                # Quartas (30) e semi-finais (50): todos os jogadores do confronto; fases sem
+                # pontuação própria (oitavas, disputa de 3º lugar) não alteram a pontuação
                 jogadores_ids = [
                     confronto.jogador_a1_id, confronto.jogador_a2_id,
                     confronto.jogador_b1_id, confronto.jogador_b2_id
@@ -85,11 +74,10 @@ class RankingManager:
                 for jogador_id in jogadores_ids:
                     pontuacoes_jogadores[jogador_id] = max(
                         pontuacoes_jogadores.get(jogador_id, 0),
-                        RankingManager.PONTOS['semi']
+                        RankingManager.PONTOS.get(confronto.fase, 0)
                     )
             
             # Processar final
-            final = por_fase['final']
             if final:
                 if final.pontos_dupla_a > final.pontos_dupla_b:
                     # Time A ganhou
@@ -116,12 +104,15 @@ class RankingManager:
             
             # Atualizar pontuações no banco de dados
             for jogador_id, pontuacao in pontuacoes_jogadores.items():
-                jogador = Jogador.query.get(jogador_id)
+                jogador = jogadores_por_id.get(jogador_id)
                 if jogador:
                     jogador.pontuacao = pontuacao
             
             db.session.commit()
             logger.info(f"Pontuação calculada com sucesso para o torneio {torneio_id}")
+            
+            # Atualizar o ranking materializado apenas para os jogadores do torneio
+            RankingManager.atualizar_ranking_jogadores(jogadores_permanentes_ids)
             return True
         
         except Exception as e:
@@ -130,49 +121,160 @@ class RankingManager:
             return False
     
     @staticmethod
-    def obter_ranking():
-        """Obtém o ranking completo dos jogadores por pontuação"""
-        try:
-            # Consulta SQL para agrupar jogadores pelo nome, somar pontuações e contar torneios
-            sql = text("""
-                SELECT 
-                    jp.nome, 
-                    SUM(COALESCE(j.pontuacao, 0)) as pontos_totais,
-                    COUNT(DISTINCT j.torneio_id) as torneios_jogados
-                FROM 
-                    jogador_permanente jp
-                LEFT JOIN
-                    jogador j ON jp.id = j.jogador_permanente_id
-                GROUP BY 
-                    jp.nome 
-                ORDER BY 
-                    pontos_totais DESC, 
-                    jp.nome ASC
-            """)
-            
-            resultado = db.session.execute(sql).fetchall()
-            
-            # Formatar o resultado com posições corretas
-            ranking = []
-            posicao_atual = 1
-            pontuacao_anterior = None
-            
-            for i, (nome, pontos, torneios) in enumerate(resultado):
-                # Se a pontuação for diferente da anterior, atualizar a posição
-                if pontos != pontuacao_anterior and i > 0:
-                    posicao_atual = i + 1
-                
-                ranking.append({
-                    'posicao': posicao_atual,
-                    'nome': nome,
-                    'pontos': pontos or 0,
-                    'torneios': torneios or 0  # Adicionando o número de torneios
+    def _agregar_pontuacao(jogadores_permanentes_ids=None):
+        """Soma pontos e conta torneios por jogador permanente
+
+        Inclui os torneios arquivados, cujos jogadores ficam em jogador_arquivado.
+        """
+        ativos = select(Jogador.jogador_permanente_id, Jogador.torneio_id, Jogador.pontuacao)
+        arquivados = select(
+            JogadorArquivado.jogador_permanente_id, JogadorArquivado.torneio_id, JogadorArquivado.pontuacao
+        )
+        if jogadores_permanentes_ids is not None:
+            ativos = ativos.where(Jogador.jogador_permanente_id.in_(jogadores_permanentes_ids))
+            arquivados = arquivados.where(JogadorArquivado.jogador_permanente_id.in_(jogadores_permanentes_ids))
+        participacoes = union_all(ativos, arquivados).subquery()
+        
+        query = db.session.query(
+            JogadorPermanente.id,
+            JogadorPermanente.nome,
+            func.sum(func.coalesce(participacoes.c.pontuacao, 0)),
+            func.count(distinct(participacoes.c.torneio_id))
+        ).outerjoin(
+            participacoes, JogadorPermanente.id == participacoes.c.jogador_permanente_id
+        ).group_by(
+            JogadorPermanente.id, JogadorPermanente.nome
+        )
+        
+        if jogadores_permanentes_ids is not None:
+            query = query.filter(JogadorPermanente.id.in_(jogadores_permanentes_ids))
+        
+        return query.all()
+    
+    @staticmethod
+    def _reposicionar_ranking():
+        """Recalcula as posições do ranking materializado (empates dividem a posição)"""
+        linhas = db.session.query(
+            RankingJogador.jogador_permanente_id,
+            RankingJogador.pontos,
+            RankingJogador.posicao
+        ).order_by(
+            RankingJogador.pontos.desc(),
+            RankingJogador.nome.asc()
+        ).all()
+        
+        alteracoes = []
+        posicao_atual = 1
+        pontuacao_anterior = None
+        
+        for i, (jogador_permanente_id, pontos, posicao) in enumerate(linhas):
+            # Se a pontuação for diferente da anterior, atualizar a posição
+            if pontos != pontuacao_anterior and i > 0:
+                posicao_atual = i + 1
+            
+            # Só grava as linhas cuja posição mudou
+            if posicao != posicao_atual:
+                alteracoes.append({
+                    'jogador_permanente_id': jogador_permanente_id,
+                    'posicao': posicao_atual
                 })
-                
-                pontuacao_anterior = pontos
             
-            return ranking
+            pontuacao_anterior = pontos
+        
+        if alteracoes:
+            db.session.bulk_update_mappings(RankingJogador, alteracoes)
+        
+        return len(alteracoes)
+    
+    @staticmethod
+    def atualizar_ranking_jogadores(jogadores_permanentes_ids):
+        """Atualiza o ranking materializado para os jogadores informados"""
+        ids = {jogador_id for jogador_id in jogadores_permanentes_ids if jogador_id}
+        if not ids:
+            return True
+        
+        try:
+            existentes = {
+                linha.jogador_permanente_id: linha
+                for linha in RankingJogador.query.filter(
+                    RankingJogador.jogador_permanente_id.in_(ids)
+                ).all()
+            }
+            
+            for jogador_id, nome, pontos, torneios in RankingManager._agregar_pontuacao(ids):
+                linha = existentes.get(jogador_id)
+                if linha is None:
+                    linha = RankingJogador(jogador_permanente_id=jogador_id, posicao=0)
+                    db.session.add(linha)
+                linha.nome = nome
+                linha.pontos = pontos or 0
+                linha.torneios = torneios or 0
+            
+            db.session.flush()
+            reposicionados = RankingManager._reposicionar_ranking()
+            db.session.commit()
+            
+            logger.info(
+                f"Ranking atualizado para {len(ids)} jogadores "
+                f"({reposicionados} posições alteradas)"
+            )
+            return True
+        
+        except Exception as e:
+            logger.error(f"Erro ao atualizar ranking dos jogadores {sorted(ids)}: {str(e)}")
+            db.session.rollback()
+            return False
+    
+    @staticmethod
+    def reconstruir_ranking():
+        """Reconstrói o ranking materializado a partir de todos os torneios"""
+        try:
+            RankingJogador.query.delete()
+            
+            for jogador_id, nome, pontos, torneios in RankingManager._agregar_pontuacao():
+                db.session.add(RankingJogador(
+                    jogador_permanente_id=jogador_id,
+                    nome=nome,
+                    pontos=pontos or 0,
+                    torneios=torneios or 0,
+                    posicao=0
+                ))
+            
+            db.session.flush()
+            RankingManager._reposicionar_ranking()
+            db.session.commit()
+            
+            total = RankingJogador.query.count()
+            logger.info(f"Ranking reconstruído com {total} jogadores")
+            return total
+        
+        except Exception as e:
+            logger.error(f"Erro ao reconstruir ranking: {str(e)}")
+            db.session.rollback()
+            return None
+    
+    @staticmethod
+    def obter_ranking(limite=None):
+        """Obtém o ranking dos jogadores por pontuação a partir da tabela materializada"""
+        try:
+            query = db.session.query(RankingJogador, RatingJogador.rating).outerjoin(
+                RatingJogador, RatingJogador.jogador_permanente_id == RankingJogador.jogador_permanente_id
+            ).order_by(
+                RankingJogador.posicao.asc(),
+                RankingJogador.nome.asc()
+            )
+            
+            if limite:
+                query = query.limit(limite)
+            
+            return [{
+                'posicao': linha.posicao,
+                'nome': linha.nome,
+                'pontos': linha.pontos,
+                'torneios': linha.torneios,
+                'rating': round(rating) if rating is not None else None
+            } for linha, rating in query.all()]
     
         except Exception as e:
             logger.error(f"Erro ao obter ranking: {str(e)}")
-            return []
\ No newline at end of file
+            return []
@@ -0,0 +1,294 @@
+"""Rating dos jogadores (Elo de duplas com incerteza, no estilo Glicko)
+
+Todos os jogos de grupo e das eliminatórias são reprocessados em ordem:
+torneios por data de criação e, dentro de cada um, por rodada (os três
+confrontos de grupo e depois cada fase). Cada jogador joga no máximo uma vez
+por rodada, então a rodada inteira é atualizada de uma vez com NumPy.
+
+A força de uma dupla é a média dos ratings dos dois jogadores. A variação
+de cada jogador é K * (resultado - esperado), com K proporcional ao seu
+desvio: jogadores novos (desvio alto) mudam rápido e o desvio cai a cada
+jogo até DESVIO_MINIMO.
+
+Ao salvar ou editar um placar, só o torneio alterado e os criados depois
+dele são reprocessados, partindo do rating que cada jogador tinha antes
+(guardado em historico_rating). Torneios arquivados não têm mais os jogos;
+entram com a variação registrada no histórico.
+"""
+import logging
+import numpy as np
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.orm import aliased
+from database.db import db
+from database.models import (Confronto, ConfrontoEliminatoria, HistoricoRating, Jogador,
+                             RatingJogador, Torneio)
+
+
+logger = logging.getLogger(__name__)
+
+RATING_INICIAL = 1500.0
+DESVIO_INICIAL = 350.0
+DESVIO_MINIMO = 60.0
+DESVIO_POR_JOGO = 700.0  # Cada jogo soma 1/700² à precisão (1/desvio²)
+K_MAXIMO = 64.0  # K de um jogador com DESVIO_INICIAL
+
+# Rodada de cada fase, depois dos três confrontos de grupo (rodadas 0 a 2)
+RODADAS_FASES = {'oitavas': 3, 'quartas': 4, 'semi': 5, 'final': 6, 'terceiro': 6}
+
+
+def desvio_apos_jogos(desvios, jogos):
+    """Desvio depois de `jogos` jogos"""
+    return np.maximum(DESVIO_MINIMO, 1 / np.sqrt(1 / desvios ** 2 + jogos / DESVIO_POR_JOGO ** 2))
+
+
+def atualizar_rodada(ratings, desvios, jogadores, resultados):
+    """Aplica uma rodada, alterando ratings e desvios no lugar
+
+    jogadores é a matriz n x 4 (dupla A, dupla B) de índices e resultados o
+    vetor com 1 (vitória da dupla A), 0 (da dupla B) ou 0.5 (empate).
+    """
+    forca_a = ratings[jogadores[:, :2]].mean(axis=1)
+    forca_b = ratings[jogadores[:, 2:]].mean(axis=1)
+    esperado = 1 / (1 + 10 ** ((forca_b - forca_a) / 400))
+
+    k = K_MAXIMO * desvios[jogadores] / DESVIO_INICIAL
+    variacao = k * (resultados - esperado)[:, None] * np.array([1, 1, -1, -1])
+    np.add.at(ratings, jogadores.ravel(), variacao.ravel())
+
+    tocados, jogos = np.unique(jogadores, return_counts=True)
+    desvios[tocados] = desvio_apos_jogos(desvios[tocados], jogos)
+
+
+def reprocessar(torneios, partidas, arquivados, ratings, desvios):
+    """Reprocessa os torneios em ordem; ratings e desvios são alterados no lugar
+
+    partidas é {torneio_id: (rodadas, jogadores n x 4, resultados)} e
+    arquivados {torneio_id: (jogadores, variações, jogos)}. Retorna
+    {torneio_id: (jogadores, rating_antes, desvio_antes, rating, desvio, jogos)}.
+    """
+    historico = {}
+    for torneio_id in torneios:
+        if torneio_id in arquivados:
+            jogadores, variacoes, jogos = arquivados[torneio_id]
+            antes = (ratings[jogadores].copy(), desvios[jogadores].copy())
+            ratings[jogadores] += variacoes
+            desvios[jogadores] = desvio_apos_jogos(desvios[jogadores], jogos)
+        elif torneio_id in partidas:
+            rodadas, matriz, resultados = partidas[torneio_id]
+            jogadores, jogos = np.unique(matriz, return_counts=True)
+            antes = (ratings[jogadores].copy(), desvios[jogadores].copy())
+            inicios = np.flatnonzero(np.r_[True, rodadas[1:] != rodadas[:-1]])
+            for inicio, fim in zip(inicios, np.r_[inicios[1:], len(rodadas)]):
+                atualizar_rodada(ratings, desvios, matriz[inicio:fim], resultados[inicio:fim])
+        else:
+            continue
+        historico[torneio_id] = (jogadores, *antes, ratings[jogadores].copy(), desvios[jogadores].copy(), jogos)
+    return historico
+
+
+class RatingManager:
+    """Classe para calcular, gravar e consultar o rating dos jogadores"""
+
+    @staticmethod
+    def _torneios_a_partir(torneio=None):
+        """(id, arquivado) dos torneios em ordem cronológica, a partir de `torneio` (inclusive)"""
+        consulta = select(Torneio.id, Torneio.arquivado).order_by(Torneio.data_criacao, Torneio.id)
+        if torneio is not None:
+            consulta = consulta.where(or_(
+                Torneio.data_criacao > torneio.data_criacao,
+                and_(Torneio.data_criacao == torneio.data_criacao, Torneio.id >= torneio.id)
+            ))
+        return db.session.execute(consulta).all()
+
+    @staticmethod
+    def _partidas(torneio_ids):
+        """{torneio_id: [(rodada, a1, a2, b1, b2, pontos_a, pontos_b)]} dos jogos com placar"""
+        partidas = {}
+        for modelo in (Confronto, ConfrontoEliminatoria):
+            a1, a2, b1, b2 = (aliased(Jogador) for _ in range(4))
+            rodada = modelo.confronto_idx if modelo is Confronto else modelo.fase
+            consulta = (
+                select(modelo.torneio_id, rodada,
+                       a1.jogador_permanente_id, a2.jogador_permanente_id,
+                       b1.jogador_permanente_id, b2.jogador_permanente_id,
+                       modelo.pontos_dupla_a, modelo.pontos_dupla_b)
+                .select_from(modelo)
+                .join(a1, a1.id == modelo.jogador_a1_id)
+                .join(a2, a2.id == modelo.jogador_a2_id)
+                .join(b1, b1.id == modelo.jogador_b1_id)
+                .join(b2, b2.id == modelo.jogador_b2_id)
+                .where(modelo.pontos_dupla_a.isnot(None), modelo.pontos_dupla_b.isnot(None))
+            )
+            if torneio_ids is not None:
+                consulta = consulta.where(modelo.torneio_id.in_(torneio_ids))
+            for torneio_id, rodada_jogo, *resto in db.session.execute(consulta):
+                if None in resto[:4]:
+                    continue
+                if modelo is ConfrontoEliminatoria:
+                    rodada_jogo = RODADAS_FASES.get(rodada_jogo, max(RODADAS_FASES.values()))
+                partidas.setdefault(torneio_id, []).append((rodada_jogo, *resto))
+        return partidas
+
+    @staticmethod
+    def _reprocessar_a_partir(torneio=None, excluir=None):
+        """Reprocessa os torneios a partir de `torneio` (todos se None) e grava (sem commit)
+
+        excluir é o id de um torneio que está sendo apagado e não deve contar.
+        Retorna o número de jogos reprocessados.
+        """
+        intervalo = RatingManager._torneios_a_partir(torneio)
+        torneios = [(torneio_id, arquivado) for torneio_id, arquivado in intervalo if torneio_id != excluir]
+        ids_torneios = [torneio_id for torneio_id, _ in torneios]
+        # O torneio excluído ainda entra nas consultas: o histórico dele tem o rating de partida
+        ids_consulta = None if torneio is None else [torneio_id for torneio_id, _ in intervalo]
+
+        # Histórico já gravado no intervalo: rating de partida e torneios arquivados
+        consulta_historico = select(HistoricoRating)
+        if ids_consulta is not None:
+            consulta_historico = consulta_historico.where(HistoricoRating.torneio_id.in_(ids_consulta))
+        historico_antigo = db.session.execute(consulta_historico).scalars().all()
+        partidas = RatingManager._partidas([t for t, arquivado in torneios if not arquivado]
+                                           if ids_consulta is not None else None)
+
+        # Índice de cada jogador nos vetores
+        jogadores = {linha.jogador_permanente_id for linha in historico_antigo}
+        for jogos in partidas.values():
+            for jogo in jogos:
+                jogadores.update(jogo[1:5])
+        indice = {jogador_id: i for i, jogador_id in enumerate(sorted(jogadores))}
+        ids = np.array(sorted(jogadores), dtype=np.int64)
+
+        # Ponto de partida: rating antes do primeiro torneio do intervalo (ou o atual, se não jogou nele)
+        ratings = np.full(len(ids), RATING_INICIAL)
+        desvios = np.full(len(ids), DESVIO_INICIAL)
+        if torneio is not None and len(ids):
+            atuais = db.session.execute(select(
+                RatingJogador.jogador_permanente_id, RatingJogador.rating, RatingJogador.desvio
+            ).where(RatingJogador.jogador_permanente_id.in_(indice))).all()
+            for jogador_id, rating, desvio in atuais:
+                ratings[indice[jogador_id]], desvios[indice[jogador_id]] = rating, desvio
+            ordem = {torneio_id: i for i, torneio_id in enumerate(ids_consulta)}
+            primeiro = {}
+            for linha in sorted(historico_antigo, key=lambda h: ordem.get(h.torneio_id, len(ordem))):
+                if linha.jogador_permanente_id not in primeiro:
+                    primeiro[linha.jogador_permanente_id] = linha
+                    i = indice[linha.jogador_permanente_id]
+                    ratings[i], desvios[i] = linha.rating_antes, linha.desvio_antes
+
+        arquivados = {}
+        ids_arquivados = {torneio_id for torneio_id, arquivado in torneios if arquivado}
+        for linha in historico_antigo:
+            if linha.torneio_id in ids_arquivados:
+                arquivados.setdefault(linha.torneio_id, []).append(
+                    (indice[linha.jogador_permanente_id], linha.rating - linha.rating_antes, linha.jogos)
+                )
+        arquivados = {
+            torneio_id: (np.array([l[0] for l in linhas]), np.array([l[1] for l in linhas]),
+                         np.array([l[2] for l in linhas]))
+            for torneio_id, linhas in arquivados.items()
+        }
+
+        vetores = {}
+        total_jogos = 0
+        for torneio_id, jogos in partidas.items():
+            jogos.sort(key=lambda jogo: jogo[0])
+            dados = np.array(jogos, dtype=np.int64)
+            matriz = np.vectorize(indice.__getitem__, otypes=[np.intp])(dados[:, 1:5])
+            resultados = np.where(dados[:, 5] > dados[:, 6], 1.0, np.where(dados[:, 5] < dados[:, 6], 0.0, 0.5))
+            vetores[torneio_id] = (dados[:, 0], matriz, resultados)
+            total_jogos += len(jogos)
+
+        historico = reprocessar(ids_torneios, vetores, arquivados, ratings, desvios)
+
+        # Histórico do intervalo regravado; ratings atuais de todos os jogadores envolvidos
+        apagar = delete(HistoricoRating)
+        if ids_consulta is not None:
+            apagar = apagar.where(HistoricoRating.torneio_id.in_(ids_consulta))
+        db.session.execute(apagar)
+        linhas = [{
+            'jogador_permanente_id': int(ids[i]),
+            'torneio_id': torneio_id,
+            'rating_antes': float(antes),
+            'desvio_antes': float(desvio_antes),
+            'rating': float(depois),
+            'desvio': float(desvio_depois),
+            'jogos': int(jogos)
+        } for torneio_id, colunas in historico.items() for i, antes, desvio_antes, depois, desvio_depois, jogos
+            in zip(*colunas)]
+        if linhas:
+            db.session.execute(insert(HistoricoRating), linhas)
+
+        if torneio is None:
+            db.session.execute(delete(RatingJogador))
+        elif len(ids):
+            db.session.execute(delete(RatingJogador).where(RatingJogador.jogador_permanente_id.in_(indice)))
+        consulta_jogos = select(HistoricoRating.jogador_permanente_id, func.sum(HistoricoRating.jogos)).group_by(
+            HistoricoRating.jogador_permanente_id
+        )
+        if torneio is not None:
+            consulta_jogos = consulta_jogos.where(HistoricoRating.jogador_permanente_id.in_(indice))
+        jogos_por_jogador = dict(db.session.execute(consulta_jogos).all()) if len(ids) else {}
+        atuais = [{
+            'jogador_permanente_id': int(jogador_id),
+            'rating': float(ratings[i]),
+            'desvio': float(desvios[i]),
+            'jogos': int(jogos_por_jogador[int(jogador_id)])
+        } for i, jogador_id in enumerate(ids) if int(jogador_id) in jogos_por_jogador]
+        if atuais:
+            db.session.execute(insert(RatingJogador), atuais)
+        return total_jogos
+
+    @staticmethod
+    def atualizar_torneio(torneio_id):
+        """Reprocessa o torneio com placar salvo ou editado e os torneios criados depois dele"""
+        try:
+            torneio = db.session.get(Torneio, torneio_id)
+            if not torneio:
+                return False
+            jogos = RatingManager._reprocessar_a_partir(torneio)
+            db.session.commit()
+            logger.info(f"Rating atualizado a partir do torneio {torneio_id} ({jogos} jogos reprocessados)")
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao atualizar o rating a partir do torneio {torneio_id}: {str(e)}")
+            db.session.rollback()
+            return False
+
+    @staticmethod
+    def retirar_torneio(torneio_id):
+        """Reprocessa como se o torneio não existisse (chamar antes de apagá-lo; sem commit)"""
+        try:
+            torneio = db.session.get(Torneio, torneio_id)
+            if not torneio:
+                return False
+            RatingManager._reprocessar_a_partir(torneio, excluir=torneio_id)
+            db.session.flush()
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao retirar o torneio {torneio_id} do rating: {str(e)}")
+            db.session.rollback()
+            return False
+
+    @staticmethod
+    def reconstruir():
+        """Reprocessa todos os jogos do banco; retorna o número de jogos ou None em caso de erro"""
+        try:
+            jogos = RatingManager._reprocessar_a_partir()
+            db.session.commit()
+            logger.info(f"Rating reconstruído com {jogos} jogos")
+            return jogos
+        except Exception as e:
+            logger.error(f"Erro ao reconstruir o rating: {str(e)}")
+            db.session.rollback()
+            return None
+
+    @staticmethod
+    def obter_ratings(jogadores_permanentes_ids):
+        """{jogador_permanente_id: {'rating', 'desvio', 'jogos'}} com o rating arredondado"""
+        if not jogadores_permanentes_ids:
+            return {}
+        linhas = db.session.execute(select(
+            RatingJogador.jogador_permanente_id, RatingJogador.rating, RatingJogador.desvio, RatingJogador.jogos
+        ).where(RatingJogador.jogador_permanente_id.in_(jogadores_permanentes_ids))).all()
+        return {jogador_id: {'rating': round(rating), 'desvio': round(desvio), 'jogos': jogos}
+                for jogador_id, rating, desvio, jogos in linhas}
@@ -0,0 +1,49 @@
+"""Leituras das páginas públicas em uma réplica do banco
+
+Com REPLICA_DATABASE_URL definida, as rotas marcadas com @somente_leitura
+consultam a réplica e o resto continua no banco principal. Quem acabou de
+gravar um resultado lê do principal por REPLICA_ATRASO_SEGUNDOS, para ver
+a própria alteração mesmo que a réplica ainda não a tenha recebido.
+"""
+import functools
+import math
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from database.db import SessaoRoteada, db
+
+
+# Cookie próprio (e não a sessão, que é limpa ao voltar para a home) com o fim do período no principal
+COOKIE_LEITURA_PRINCIPAL = 'leitura_principal_ate'
+
+
+def replica_configurada():
+    return 'replica' in db.engines
+
+
+def somente_leitura(rota):
+    """Decorator para rotas que só consultam: usa a réplica, se houver"""
+    @functools.wraps(rota)
+    def envolvida(*args, **kwargs):
+        if replica_configurada():
+            principal_ate = request.cookies.get(COOKIE_LEITURA_PRINCIPAL, 0, type=float)
+            g.leitura_na_replica = time.time() >= principal_ate
+        return rota(*args, **kwargs)
+    return envolvida
+
+
+@event.listens_for(SessaoRoteada, 'after_commit')
+def _registrar_escrita(sessao):
+    if has_request_context():
+        g.escreveu_no_principal = True
+
+
+def configurar_replica(app):
+    """Após uma escrita, marca o navegador para ler do principal durante o atraso da réplica"""
+    @app.after_request
+    def marcar_escrita(resposta):
+        if g.get('escreveu_no_principal') and replica_configurada():
+            atraso = app.config.get('REPLICA_ATRASO_SEGUNDOS', 10)
+            resposta.set_cookie(COOKIE_LEITURA_PRINCIPAL, f"{time.time() + atraso:.3f}",
+                                max_age=math.ceil(atraso), httponly=True, samesite='Lax')
+        return resposta
@@ -0,0 +1,282 @@
+"""Chances de classificação na fase de grupos (simulação de Monte Carlo)
+
+Os confrontos de grupo ainda sem placar são sorteados milhares de vezes,
+todas as simulações de uma vez em matrizes NumPy (simulação x grupo x
+jogador). A dupla A vence com a probabilidade do Elo das duplas (média dos
+ratings de database/rating.py) e o placar vem dos placares já jogados no
+torneio. Cada simulação aplica a mesma cadeia de desempate de
+database/classificacao.py (vitórias, saldo, pontos a favor, confronto direto
+e ordem do sorteio) e ordena primeiros e segundos entre os grupos, como em
+fase_eliminatoria.
+
+Para cada jogador sai a chance de terminar em 1º ou 2º do grupo (ambos vão
+para a eliminatória) e a de ocupar cada vaga da chave: 'P0' é o melhor
+primeiro colocado, 'S0' o melhor segundo (mesma notação de database/chave.py).
+
+As simulações rodam em lotes até SIMULACAO_ORCAMENTO_MS ou
+SIMULACAO_MAX_EXECUCOES; com SIMULACAO_PROCESSOS > 0 os lotes são divididos
+entre processos. O resultado fica guardado até algum placar do torneio mudar
+(a versão dos confrontos faz parte da chave), para os SIMULACAO_MAX_TORNEIOS
+torneios consultados mais recentemente.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+from flask import current_app
+from database.models import Confronto, Jogador
+from database.rating import RATING_INICIAL, RatingManager
+
+
+logger = logging.getLogger(__name__)
+
+# Placares (vencedor, perdedor) usados enquanto o torneio tem poucos jogos com placar
+PLACARES_PADRAO = [(6, 0), (6, 1), (6, 2), (6, 3), (6, 4), (7, 5), (7, 6)]
+MINIMO_PLACARES_DO_TORNEIO = 6
+LOTE = 2000  # Simulações por lote
+MAX_TORNEIOS_GUARDADOS = 32
+
+
+def simular(jogos, pontos, prob_a, placares, execucoes, semente):
+    """Simula o restante da fase de grupos; retorna a contagem de vagas
+
+    jogos é a matriz grupos x 3 x 4 com a posição no sorteio (0 a 3) dos
+    jogadores de cada confronto (dupla A, dupla B), pontos a matriz
+    grupos x 3 x 2 com -1 nos confrontos sem placar, prob_a a chance de a
+    dupla A vencer cada confronto e placares os placares (vencedor, perdedor)
+    possíveis. A contagem é grupos x 4 x (2 * grupos): quantas vezes cada
+    jogador ficou com cada vaga, primeiro as 'P' e depois as 'S'.
+    """
+    rng = np.random.default_rng(semente)
+    num_grupos = len(jogos)
+    forma = (execucoes, num_grupos, 3)
+
+    vence_a = rng.random(forma) < prob_a
+    sorteados = placares[rng.integers(len(placares), size=forma)]
+    vencedor, perdedor = sorteados[..., 0], sorteados[..., 1]
+    falta = pontos[..., 0] < 0
+    pontos_a = np.where(falta, np.where(vence_a, vencedor, perdedor), pontos[..., 0])
+    pontos_b = np.where(falta, np.where(vence_a, perdedor, vencedor), pontos[..., 1])
+
+    # Posição de cada jogador nos confrontos (0 e 1 na dupla A, 2 e 3 na dupla B)
+    lugar = np.argsort(jogos, axis=2)
+    na_dupla_a = lugar < 2
+    vitorias = np.zeros((execucoes, num_grupos, 4), dtype=np.int64)
+    a_favor = np.zeros_like(vitorias)
+    contra = np.zeros_like(vitorias)
+    for confronto in range(3):
+        dupla_a = na_dupla_a[None, :, confronto, :]
+        favor = np.where(dupla_a, pontos_a[..., confronto, None], pontos_b[..., confronto, None])
+        sofrido = np.where(dupla_a, pontos_b[..., confronto, None], pontos_a[..., confronto, None])
+        a_favor += favor
+        contra += sofrido
+        vitorias += favor > sofrido
+
+    # Vitórias, saldo e pontos a favor numa chave inteira só
+    maximo = int(max(placares.max(), pontos.max(), 1))
+    base = 6 * maximo + 1
+    criterios = (vitorias * base + (a_favor - contra + 3 * maximo)) * base + a_favor
+
+    # Confronto direto: vitórias sobre os adversários empatados nos critérios anteriores
+    empatados = criterios[..., :, None] == criterios[..., None, :]
+    diretas = np.zeros_like(vitorias)
+    for confronto in range(3):
+        dupla_a = na_dupla_a[:, confronto, :]
+        adversarios = dupla_a[:, :, None] != dupla_a[:, None, :]
+        venceu = np.where(dupla_a[None], pontos_a[..., confronto, None] > pontos_b[..., confronto, None],
+                          pontos_b[..., confronto, None] > pontos_a[..., confronto, None])
+        diretas += venceu * (empatados & adversarios[None]).sum(axis=3)
+
+    # Até 6 vitórias diretas (3 jogos x 2 adversários) e, por fim, a ordem do sorteio
+    ordem_final = (criterios * 8 + diretas) * 4 + (3 - np.arange(4))
+    classificados = np.argsort(-ordem_final, axis=2, kind='stable')[..., :2]
+
+    # Primeiros e segundos ordenados entre os grupos (empate: ordem dos grupos)
+    grupos = np.arange(num_grupos)
+    contagem = np.zeros((num_grupos, 4, 2 * num_grupos), dtype=np.int64)
+    for colocacao in range(2):
+        jogador = classificados[..., colocacao]
+        chave = np.take_along_axis(criterios, jogador[..., None], axis=2)[..., 0] * num_grupos + (num_grupos - 1 - grupos)
+        vaga = np.argsort(np.argsort(-chave, axis=1, kind='stable'), axis=1) + colocacao * num_grupos
+        np.add.at(contagem, (np.broadcast_to(grupos, jogador.shape), jogador, vaga), 1)
+    return contagem
+
+
+class SimuladorClassificacao:
+    """Classe para calcular e guardar as chances de classificação de um torneio"""
+
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _estado():
+        """Resultados guardados e pool de processos nas extensões da aplicação"""
+        return current_app.extensions.setdefault('simulador_classificacao', {
+            'resultados': OrderedDict(),  # LRU por torneio
+            'pool': None
+        })
+
+    @staticmethod
+    def _pool(processos):
+        """Pool de processos da aplicação, criado no primeiro uso"""
+        estado = SimuladorClassificacao._estado()
+        with SimuladorClassificacao._lock:
+            if estado['pool'] is None:
+                estado['pool'] = ProcessPoolExecutor(max_workers=processos)
+            return estado['pool']
+
+    @staticmethod
+    def _dados_do_torneio(torneio_id):
+        """Entradas da simulação e assinatura dos confrontos; None se os grupos não estão completos"""
+        confrontos = Confronto.query.filter_by(torneio_id=torneio_id).order_by(
+            Confronto.grupo_idx, Confronto.confronto_idx
+        ).all()
+        if not confrontos:
+            return None
+
+        por_grupo = {}
+        for confronto in confrontos:
+            por_grupo.setdefault(confronto.grupo_idx, []).append(confronto)
+        num_grupos = len(por_grupo)
+        if sorted(por_grupo) != list(range(num_grupos)) or any(
+            [c.confronto_idx for c in grupo] != [0, 1, 2] for grupo in por_grupo.values()
+        ):
+            return None
+
+        jogadores = {
+            jogador.id: jogador for jogador in Jogador.query.filter_by(torneio_id=torneio_id).all()
+        }
+        ratings = RatingManager.obter_ratings(
+            [j.jogador_permanente_id for j in jogadores.values() if j.jogador_permanente_id]
+        )
+
+        def rating(jogador_id):
+            jogador = jogadores.get(jogador_id)
+            dados = ratings.get(jogador.jogador_permanente_id) if jogador else None
+            return dados['rating'] if dados else RATING_INICIAL
+
+        # Ordem do sorteio de cada grupo: a do primeiro confronto
+        ordem = []
+        jogos = np.zeros((num_grupos, 3, 4), dtype=np.int64)
+        pontos = np.full((num_grupos, 3, 2), -1, dtype=np.int64)
+        prob_a = np.zeros((num_grupos, 3))
+        placares = []
+        for grupo_idx in range(num_grupos):
+            grupo = por_grupo[grupo_idx]
+            ids = [grupo[0].jogador_a1_id, grupo[0].jogador_a2_id, grupo[0].jogador_b1_id, grupo[0].jogador_b2_id]
+            posicao = {jogador_id: i for i, jogador_id in enumerate(ids)}
+            ordem.append(ids)
+            for confronto in grupo:
+                duplas = [confronto.jogador_a1_id, confronto.jogador_a2_id, confronto.jogador_b1_id, confronto.jogador_b2_id]
+                if set(duplas) != set(posicao):
+                    return None
+                jogos[grupo_idx, confronto.confronto_idx] = [posicao[j] for j in duplas]
+                forca_a = (rating(duplas[0]) + rating(duplas[1])) / 2
+                forca_b = (rating(duplas[2]) + rating(duplas[3])) / 2
+                prob_a[grupo_idx, confronto.confronto_idx] = 1 / (1 + 10 ** ((forca_b - forca_a) / 400))
+                if confronto.pontos_dupla_a is not None and confronto.pontos_dupla_b is not None:
+                    pontos[grupo_idx, confronto.confronto_idx] = [confronto.pontos_dupla_a, confronto.pontos_dupla_b]
+                    if confronto.pontos_dupla_a != confronto.pontos_dupla_b:
+                        placares.append((max(pontos[grupo_idx, confronto.confronto_idx]),
+                                         min(pontos[grupo_idx, confronto.confronto_idx])))
+
+        if len(placares) < MINIMO_PLACARES_DO_TORNEIO:
+            placares = PLACARES_PADRAO
+        nomes = [[jogadores[j].nome if j in jogadores else '' for j in ids] for ids in ordem]
+        assinatura = tuple((c.id, c.versao, c.pontos_dupla_a, c.pontos_dupla_b) for c in confrontos)
+        return {
+            'entradas': (jogos, pontos, prob_a, np.array(placares, dtype=np.int64)),
+            'nomes': nomes,
+            'restantes': int((pontos[..., 0] < 0).sum()),
+            'assinatura': assinatura
+        }
+
+    @staticmethod
+    def _executar(entradas, restantes):
+        """Roda os lotes dentro do orçamento de tempo; retorna (contagem, execuções)"""
+        orcamento = current_app.config.get('SIMULACAO_ORCAMENTO_MS', 200) / 1000
+        maximo = current_app.config.get('SIMULACAO_MAX_EXECUCOES', 20000)
+        processos = current_app.config.get('SIMULACAO_PROCESSOS', 0)
+
+        # Sem jogos pela frente o resultado já está decidido
+        if not restantes:
+            return simular(*entradas, 1, 0), 1
+
+        lotes = max(1, math.ceil(maximo / LOTE))
+        inicio = time.perf_counter()
+        contagem, execucoes = None, 0
+
+        if processos > 0:
+            pool = SimuladorClassificacao._pool(processos)
+            pendentes = {pool.submit(simular, *entradas, LOTE, semente) for semente in range(lotes)}
+            prontos, pendentes = wait(pendentes, timeout=orcamento)
+            if not prontos:
+                prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in pendentes:
+                futuro.cancel()
+            for futuro in prontos:
+                contagem = futuro.result() if contagem is None else contagem + futuro.result()
+                execucoes += LOTE
+            return contagem, execucoes
+
+        for semente in range(lotes):
+            parcial = simular(*entradas, LOTE, semente)
+            contagem = parcial if contagem is None else contagem + parcial
+            execucoes += LOTE
+            if time.perf_counter() - inicio >= orcamento:
+                break
+        return contagem, execucoes
+
+    @staticmethod
+    def obter(torneio_id):
+        """Chances de classificação por jogador; None se o torneio não tem os grupos completos
+
+        Retorna {'execucoes', 'jogos_restantes', 'jogadores': {nome: {...}}},
+        com 'classificacao', 'primeiro', 'segundo' e 'vagas' ({'P0': chance, ...},
+        só as vagas possíveis) de cada jogador.
+        """
+        dados = SimuladorClassificacao._dados_do_torneio(torneio_id)
+        if dados is None:
+            return None
+
+        guardados = SimuladorClassificacao._estado()['resultados']
+        with SimuladorClassificacao._lock:
+            guardado = guardados.get(torneio_id)
+            if guardado and guardado[0] == dados['assinatura']:
+                guardados.move_to_end(torneio_id)
+                return guardado[1]
+
+        inicio = time.perf_counter()
+        contagem, execucoes = SimuladorClassificacao._executar(dados['entradas'], dados['restantes'])
+        chances = contagem / execucoes
+        num_grupos = len(dados['nomes'])
+        rotulos = [f'P{i}' for i in range(num_grupos)] + [f'S{i}' for i in range(num_grupos)]
+
+        jogadores = {}
+        for grupo_idx, nomes in enumerate(dados['nomes']):
+            for posicao, nome in enumerate(nomes):
+                vagas = chances[grupo_idx, posicao]
+                jogadores[nome] = {
+                    'grupo': grupo_idx,
+                    'classificacao': round(float(vagas.sum()), 4),
+                    'primeiro': round(float(vagas[:num_grupos].sum()), 4),
+                    'segundo': round(float(vagas[num_grupos:].sum()), 4),
+                    'vagas': {rotulos[i]: round(float(vagas[i]), 4) for i in np.flatnonzero(vagas)}
+                }
+
+        resultado = {
+            'execucoes': execucoes,
+            'jogos_restantes': dados['restantes'],
+            'jogadores': jogadores
+        }
+        with SimuladorClassificacao._lock:
+            guardados[torneio_id] = (dados['assinatura'], resultado)
+            guardados.move_to_end(torneio_id)
+            limite = current_app.config.get('SIMULACAO_MAX_TORNEIOS', MAX_TORNEIOS_GUARDADOS)
+            while len(guardados) > limite:
+                guardados.popitem(last=False)
+        logger.info(f"Chances de classificação do torneio {torneio_id}: {execucoes} simulações "
+                    f"em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        return resultado
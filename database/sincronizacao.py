@@ -0,0 +1,171 @@
+"""Envio dos torneios finalizados de um nó local (SQLite na quadra) para o banco central
+
+O nó local grava os placares com latência de disco; depois, com conexão,
+`flask --app app sincronizar-torneios` copia cada torneio finalizado para o
+Postgres central. No central o torneio ganha novos ids e a coluna origem
+('<nó>:<id local>'), que torna o envio idempotente: se a marcação local
+falhar depois do commit no central, o próximo envio reconhece a cópia.
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import insert, select
+from database.db import db
+from database.models import (Jogador, JogadorPermanente, Torneio, Confronto, ConfrontoEliminatoria,
+                             ParticipacaoTorneio)
+from database.ranking import RankingManager
+from database.rating import RatingManager
+
+
+logger = logging.getLogger(__name__)
+
+# Colunas que apontam para jogador.id e precisam ser remapeadas no central
+COLUNAS_JOGADOR = ('jogador_a1_id', 'jogador_a2_id', 'jogador_b1_id', 'jogador_b2_id')
+
+
+def _linha(objeto, excluir=('id',)):
+    """Colunas do objeto como dicionário, sem as que serão geradas ou remapeadas"""
+    return {coluna.name: getattr(objeto, coluna.name)
+            for coluna in objeto.__table__.columns if coluna.name not in excluir}
+
+
+class SincronizacaoManager:
+    """Classe para exportar torneios do nó local e importá-los no banco central"""
+
+    @staticmethod
+    def pendentes():
+        """Ids dos torneios finalizados deste nó ainda não enviados ao central"""
+        return [torneio_id for (torneio_id,) in db.session.query(Torneio.id).filter(
+            Torneio.finalizado.is_(True),
+            Torneio.arquivado.is_(False),
+            Torneio.sincronizado_em.is_(None),
+            Torneio.origem.is_(None)
+        ).order_by(Torneio.id)]
+
+    @staticmethod
+    def exportar_torneio(torneio_id):
+        """Dados do torneio em dicionários simples (independentes da sessão local)"""
+        torneio = db.session.get(Torneio, torneio_id)
+        nomes_permanentes = dict(db.session.query(JogadorPermanente.id, JogadorPermanente.nome).join(
+            ParticipacaoTorneio, ParticipacaoTorneio.jogador_permanente_id == JogadorPermanente.id
+        ).filter(ParticipacaoTorneio.torneio_id == torneio_id).all())
+
+        jogadores = []
+        for jogador in Jogador.query.filter_by(torneio_id=torneio_id).all():
+            linha = _linha(jogador, excluir=('torneio_id', 'jogador_permanente_id'))
+            linha['permanente'] = nomes_permanentes.get(jogador.jogador_permanente_id)
+            jogadores.append(linha)
+
+        participacoes = []
+        for participacao in ParticipacaoTorneio.query.filter_by(torneio_id=torneio_id).all():
+            linha = _linha(participacao, excluir=('id', 'torneio_id', 'jogador_permanente_id'))
+            linha['permanente'] = nomes_permanentes[participacao.jogador_permanente_id]
+            participacoes.append(linha)
+
+        return {
+            'torneio': _linha(torneio, excluir=('id', 'origem', 'sincronizado_em', 'arquivado')),
+            'jogadores': jogadores,
+            'participacoes': participacoes,
+            'confrontos': [_linha(confronto, excluir=('id', 'torneio_id'))
+                           for confronto in Confronto.query.filter_by(torneio_id=torneio_id).all()],
+            'eliminatorias': [_linha(confronto, excluir=('id', 'torneio_id'))
+                              for confronto in ConfrontoEliminatoria.query.filter_by(torneio_id=torneio_id).all()]
+        }
+
+    @staticmethod
+    def _ids_permanentes(nomes):
+        """{nome: id} no banco atual, cadastrando os jogadores permanentes que faltam"""
+        tabela = JogadorPermanente.__table__
+        ids = dict(db.session.execute(select(tabela.c.nome, tabela.c.id).where(tabela.c.nome.in_(nomes))).all())
+        novos = [nome for nome in nomes if nome not in ids]
+        if novos:
+            db.session.execute(insert(tabela), [{'nome': nome, 'data_cadastro': datetime.utcnow()} for nome in novos])
+            ids.update(db.session.execute(
+                select(tabela.c.nome, tabela.c.id).where(tabela.c.nome.in_(novos))
+            ).all())
+        return ids
+
+    @staticmethod
+    def importar_torneio(dados, origem):
+        """Grava o torneio exportado no banco atual (o central); retorna o novo id
+
+        Se um torneio com a mesma origem já existir, nada é gravado.
+        """
+        existente = db.session.query(Torneio.id).filter_by(origem=origem).scalar()
+        if existente is not None:
+            logger.info(f"Torneio {origem} já estava no banco central (id {existente})")
+            return existente
+
+        try:
+            torneio = Torneio(**dados['torneio'], origem=origem)
+            db.session.add(torneio)
+            db.session.flush()
+
+            nomes = {linha['permanente'] for linha in dados['jogadores'] + dados['participacoes']
+                     if linha['permanente']}
+            permanentes = SincronizacaoManager._ids_permanentes(sorted(nomes))
+
+            # Jogadores um a um para saber o id novo de cada id local
+            ids_jogadores = {}
+            for linha in dados['jogadores']:
+                linha = dict(linha)
+                id_local = linha.pop('id')
+                permanente = linha.pop('permanente')
+                jogador = Jogador(**linha, torneio_id=torneio.id,
+                                  jogador_permanente_id=permanentes.get(permanente))
+                db.session.add(jogador)
+                db.session.flush()
+                ids_jogadores[id_local] = jogador.id
+
+            participacoes = []
+            for linha in dados['participacoes']:
+                linha = dict(linha)
+                linha['jogador_permanente_id'] = permanentes[linha.pop('permanente')]
+                participacoes.append({**linha, 'torneio_id': torneio.id})
+            if participacoes:
+                db.session.execute(insert(ParticipacaoTorneio), participacoes)
+
+            for modelo, chave in ((Confronto, 'confrontos'), (ConfrontoEliminatoria, 'eliminatorias')):
+                linhas = [{**linha, 'torneio_id': torneio.id,
+                           **{coluna: ids_jogadores[linha[coluna]] for coluna in COLUNAS_JOGADOR}}
+                          for linha in dados[chave]]
+                if linhas:
+                    db.session.execute(insert(modelo), linhas)
+
+            db.session.commit()
+            novo_id = torneio.id
+
+        except Exception:
+            db.session.rollback()
+            raise
+
+        RankingManager.atualizar_ranking_jogadores(permanentes.values())
+        RatingManager.atualizar_torneio(novo_id)
+        logger.info(f"Torneio {origem} gravado no banco central com id {novo_id}")
+        return novo_id
+
+    @staticmethod
+    def sincronizar(app_central, no_local):
+        """Envia os torneios pendentes deste nó; retorna quantos foram enviados
+
+        Deve ser chamado no contexto da aplicação local; `app_central` é uma
+        aplicação criada com o banco central.
+        """
+        enviados = 0
+        for torneio_id in SincronizacaoManager.pendentes():
+            origem = f"{no_local}:{torneio_id}"
+            try:
+                dados = SincronizacaoManager.exportar_torneio(torneio_id)
+                with app_central.app_context():
+                    SincronizacaoManager.importar_torneio(dados, origem)
+
+                torneio = db.session.get(Torneio, torneio_id)
+                torneio.sincronizado_em = datetime.utcnow()
+                db.session.commit()
+                enviados += 1
+
+            except Exception as e:
+                logger.error(f"Erro ao sincronizar torneio {torneio_id}: {str(e)}")
+                db.session.rollback()
+                break
+
+        return enviados
@@ -0,0 +1,277 @@
+"""Snapshots da página de detalhes dos torneios finalizados"""
+import json
+import logging
+import zlib
+from types import SimpleNamespace
+from database.db import db
+from database.models import Jogador, Confronto, ConfrontoEliminatoria, SnapshotTorneio
+from database.chave import modo_por_grupos
+from database.classificacao import ordenar_grupo, somar_placar
+
+
+logger = logging.getLogger(__name__)
+
+# Incrementar quando o formato de montar_detalhes mudar (snapshots antigos são refeitos)
+VERSAO_SNAPSHOT = 2
+
+CAMPOS_JOGADORES = ('jogador_a1_id', 'jogador_a2_id', 'jogador_b1_id', 'jogador_b2_id')
+
+
+def _confronto_dict(confronto, *campos):
+    """Converte um confronto em dict com jogadores, placar e os campos pedidos"""
+    dados = {campo: getattr(confronto, campo) for campo in ('id',) + campos + CAMPOS_JOGADORES}
+    dados['pontos_dupla_a'] = confronto.pontos_dupla_a
+    dados['pontos_dupla_b'] = confronto.pontos_dupla_b
+    return dados
+
+
+class SnapshotManager:
+    """Classe para montar, guardar e ler os dados de detalhes de um torneio"""
+
+    @staticmethod
+    def montar_detalhes(torneio_id):
+        """Monta grupos, classificação, chave eliminatória e campeões do torneio
+
+        Retorna só tipos simples (dicts, listas, números e textos), para que
+        o mesmo resultado possa ser renderizado ou guardado como snapshot.
+        """
+        # Buscar todos os jogadores do torneio
+        jogadores_map = {
+            jogador.id: jogador for jogador in Jogador.query.filter_by(torneio_id=torneio_id).all()
+        }
+
+        # Precisamos recuperar os confrontos para identificar os grupos
+        confrontos = Confronto.query.filter_by(torneio_id=torneio_id).all()
+
+        grupos = {}
+        jogadores_por_grupo = {}
+
+        # Primeiro, identificar quais jogadores pertencem a cada grupo
+        for confronto in confrontos:
+            grupo_idx = confronto.grupo_idx
+
+            if grupo_idx not in jogadores_por_grupo:
+                jogadores_por_grupo[grupo_idx] = set()
+                grupos[grupo_idx] = {
+                    'confrontos': [],
+                    'jogadores_ordenados': []
+                }
+
+            for campo in CAMPOS_JOGADORES:
+                jogadores_por_grupo[grupo_idx].add(getattr(confronto, campo))
+
+            grupos[grupo_idx]['confrontos'].append(_confronto_dict(confronto, 'grupo_idx', 'confronto_idx'))
+
+        # Para cada grupo, calcular as estatísticas dos jogadores a partir dos placares
+        for grupo_idx, jogadores_ids in jogadores_por_grupo.items():
+            estatisticas = {jogador_id: {
+                'id': jogador_id,
+                'nome': jogadores_map[jogador_id].nome,
+                'vitorias': 0,
+                'saldo_a_favor': 0,
+                'saldo_contra': 0,
+                'saldo_total': 0,
+                'posicao_grupo': jogadores_map[jogador_id].posicao_grupo
+            } for jogador_id in jogadores_ids}
+
+            resultados = []
+            ordem_sorteio = []
+            for confronto in grupos[grupo_idx]['confrontos']:
+                duplas = ((confronto['jogador_a1_id'], confronto['jogador_a2_id']),
+                          (confronto['jogador_b1_id'], confronto['jogador_b2_id']))
+                if confronto['confronto_idx'] == 0:
+                    ordem_sorteio = [*duplas[0], *duplas[1]]
+
+                # Só processa se o confronto tiver resultados
+                pontos_a, pontos_b = confronto['pontos_dupla_a'], confronto['pontos_dupla_b']
+                if pontos_a is None or pontos_b is None:
+                    continue
+                somar_placar(estatisticas, *duplas, pontos_a, pontos_b)
+                resultados.append((*duplas, pontos_a, pontos_b))
+
+            jogadores_stats = list(estatisticas.values())
+
+            # Usar a posição salva se todos tiverem, senão a cadeia de desempate
+            if all(j['posicao_grupo'] > 0 for j in jogadores_stats):
+                jogadores_stats.sort(key=lambda x: x['posicao_grupo'])
+            else:
+                ordenar_grupo(jogadores_stats, resultados, ordem_sorteio, chave='id')
+
+            grupos[grupo_idx]['jogadores_ordenados'] = jogadores_stats
+
+        # Organizar os confrontos da fase eliminatória por fase
+        oitavas = []
+        quartas = []
+        semis = []
+        final = None
+        terceiro = None
+        for confronto in ConfrontoEliminatoria.query.filter_by(torneio_id=torneio_id).all():
+            dados = _confronto_dict(confronto, 'fase', 'jogo_numero')
+            if confronto.fase == 'final':
+                final = dados
+            elif confronto.fase == 'terceiro':
+                terceiro = dados
+            elif confronto.fase == 'semi':
+                semis.append(dados)
+            elif confronto.fase == 'oitavas':
+                oitavas.append(dados)
+            else:
+                quartas.append(dados)
+
+        # Determinar campeões e vice-campeões
+        campeoes = None
+        vice_campeoes = None
+        placar_final = None
+
+        if final and final['pontos_dupla_a'] is not None and final['pontos_dupla_b'] is not None:
+            dupla_a = [SnapshotManager._jogador_resumo(jogadores_map, final['jogador_a1_id']),
+                       SnapshotManager._jogador_resumo(jogadores_map, final['jogador_a2_id'])]
+            dupla_b = [SnapshotManager._jogador_resumo(jogadores_map, final['jogador_b1_id']),
+                       SnapshotManager._jogador_resumo(jogadores_map, final['jogador_b2_id'])]
+
+            if final['pontos_dupla_a'] > final['pontos_dupla_b']:
+                campeoes, vice_campeoes = dupla_a, dupla_b
+            else:
+                campeoes, vice_campeoes = dupla_b, dupla_a
+
+            placar_final = f"{final['pontos_dupla_a']}x{final['pontos_dupla_b']}"
+
+        # Calcular o modo do torneio baseado no número de grupos
+        modo_torneio = modo_por_grupos(len(grupos))
+
+        return {
+            'grupos': grupos,
+            'jogadores': {
+                jogador_id: {'id': jogador_id, 'nome': jogador.nome}
+                for jogador_id, jogador in jogadores_map.items()
+            },
+            'oitavas': oitavas,
+            'quartas': quartas,
+            'semis': semis,
+            'final': final,
+            'terceiro': terceiro,
+            'campeoes': campeoes,
+            'vice_campeoes': vice_campeoes,
+            'placar_final': placar_final,
+            'modo_torneio': modo_torneio
+        }
+
+    @staticmethod
+    def _jogador_resumo(jogadores_map, jogador_id):
+        """Id e nome de um jogador do torneio"""
+        jogador = jogadores_map.get(jogador_id)
+        return {'id': jogador_id, 'nome': jogador.nome if jogador else 'N/A'}
+
+    @staticmethod
+    def _compactar(detalhes):
+        """Serializa os detalhes em JSON compactado"""
+        dados = dict(detalhes)
+        # JSON só aceita chaves texto; a ordem dos grupos vai como lista de pares
+        dados['grupos'] = list(detalhes['grupos'].items())
+        dados['jogadores'] = list(detalhes['jogadores'].values())
+        texto = json.dumps(dados, ensure_ascii=False, separators=(',', ':'))
+        return zlib.compress(texto.encode('utf-8'), 9)
+
+    @staticmethod
+    def _descompactar(blob):
+        """Reverte _compactar"""
+        dados = json.loads(zlib.decompress(blob).decode('utf-8'))
+        dados['grupos'] = {grupo_idx: grupo for grupo_idx, grupo in dados['grupos']}
+        dados['jogadores'] = {jogador['id']: jogador for jogador in dados['jogadores']}
+        return dados
+
+    @staticmethod
+    def gerar(torneio_id):
+        """Monta e grava o snapshot de um torneio; retorna os detalhes ou None"""
+        try:
+            detalhes = SnapshotManager.montar_detalhes(torneio_id)
+            snapshot = db.session.get(SnapshotTorneio, torneio_id)
+            if not snapshot:
+                snapshot = SnapshotTorneio(torneio_id=torneio_id)
+                db.session.add(snapshot)
+            snapshot.versao = VERSAO_SNAPSHOT
+            snapshot.dados = SnapshotManager._compactar(detalhes)
+            db.session.commit()
+            logger.info(f"Snapshot do torneio {torneio_id} gerado ({len(snapshot.dados)} bytes)")
+            return detalhes
+        except Exception as e:
+            logger.error(f"Erro ao gerar snapshot do torneio {torneio_id}: {str(e)}")
+            db.session.rollback()
+            return None
+
+    @staticmethod
+    def obter_detalhes(torneio):
+        """Detalhes para a página do torneio
+
+        Torneios finalizados são lidos do snapshot (gerado na primeira visita
+        se ainda não existir); os demais são montados a partir dos confrontos.
+        Arquivados não têm mais confrontos, então o snapshot é usado em
+        qualquer versão.
+        """
+        if not torneio.finalizado:
+            return SnapshotManager.montar_detalhes(torneio.id)
+
+        snapshot = db.session.get(SnapshotTorneio, torneio.id)
+        if snapshot and (snapshot.versao == VERSAO_SNAPSHOT or torneio.arquivado):
+            try:
+                return SnapshotManager._descompactar(snapshot.dados)
+            except Exception as e:
+                logger.error(f"Snapshot do torneio {torneio.id} ilegível, refazendo: {str(e)}")
+
+        if torneio.arquivado:
+            # Sem confrontos no banco não há como refazer; não gravar um snapshot vazio
+            logger.error(f"Torneio arquivado {torneio.id} sem snapshot válido")
+            return SnapshotManager.montar_detalhes(torneio.id)
+
+        return SnapshotManager.gerar(torneio.id) or SnapshotManager.montar_detalhes(torneio.id)
+
+    @staticmethod
+    def confrontos_do_jogador(torneio, jogador_id):
+        """Confrontos de um jogador lidos do snapshot, no formato dos models
+
+        Retorna (confrontos de grupo, confrontos eliminatórios, jogadores por id)
+        com acesso por atributo, como Confronto, ConfrontoEliminatoria e Jogador.
+        """
+        detalhes = SnapshotManager.obter_detalhes(torneio)
+
+        def do_jogador(confronto):
+            return jogador_id in (confronto[campo] for campo in CAMPOS_JOGADORES)
+
+        confrontos_grupo = [
+            SimpleNamespace(**confronto)
+            for grupo in detalhes['grupos'].values()
+            for confronto in grupo['confrontos'] if do_jogador(confronto)
+        ]
+        confrontos_grupo.sort(key=lambda c: (c.grupo_idx, c.confronto_idx))
+
+        # Snapshots da versão 1 (arquivados) não têm oitavas nem disputa de 3º lugar
+        eliminatorias = (
+            detalhes.get('oitavas', []) + detalhes['quartas'] + detalhes['semis']
+            + [confronto for confronto in (detalhes['final'], detalhes.get('terceiro')) if confronto]
+        )
+        confrontos_eliminatorias = [SimpleNamespace(**confronto) for confronto in eliminatorias if do_jogador(confronto)]
+
+        jogadores_map = {
+            jogador_id: SimpleNamespace(**jogador) for jogador_id, jogador in detalhes['jogadores'].items()
+        }
+        return confrontos_grupo, confrontos_eliminatorias, jogadores_map
+
+    @staticmethod
+    def finais_arquivadas(torneio_ids):
+        """Campeões, vices e placar da final de torneios arquivados, por torneio_id"""
+        if not torneio_ids:
+            return {}
+
+        finais = {}
+        for snapshot in SnapshotTorneio.query.filter(SnapshotTorneio.torneio_id.in_(torneio_ids)).all():
+            try:
+                detalhes = SnapshotManager._descompactar(snapshot.dados)
+            except Exception as e:
+                logger.error(f"Snapshot do torneio {snapshot.torneio_id} ilegível: {str(e)}")
+                continue
+            finais[snapshot.torneio_id] = {
+                'campeoes': [j['nome'] for j in detalhes['campeoes']] if detalhes['campeoes'] else None,
+                'vice_campeoes': [j['nome'] for j in detalhes['vice_campeoes']] if detalhes['vice_campeoes'] else None,
+                'placar_final': detalhes['placar_final']
+            }
+        return finais
@@ -0,0 +1,53 @@
+"""Sorteio dos grupos pelo ranking global (potes em serpentina)
+
+Os jogadores são ordenados uma única vez: cabeças de chave digitados
+primeiro (na ordem informada), depois os ranqueados pela posição no
+RankingJogador e por último os sem ranking. Empates de posição e os sem
+ranking são embaralhados entre si. A lista ordenada é cortada em potes do
+tamanho do número de grupos e distribuída em serpentina: o pote 1 vai do
+Grupo 1 ao último, o pote 2 volta do último ao Grupo 1, e assim por diante,
+equilibrando a soma das posições de cada grupo.
+"""
+import random
+from sqlalchemy import select
+from database.db import db
+from database.models import RankingJogador
+
+
+def ranking_dos_jogadores(nomes):
+    """{nome: (posição, pontos) no ranking global} em uma única consulta IN"""
+    if not nomes:
+        return {}
+    tabela = RankingJogador.__table__
+    consulta = select(tabela.c.nome, tabela.c.posicao, tabela.c.pontos).where(tabela.c.nome.in_(nomes))
+    return {nome: (posicao, pontos) for nome, posicao, pontos in db.session.execute(consulta)}
+
+
+def ordenar_por_ranking(jogadores, ranking, cabecas_de_chave=None):
+    """Ordem de semeadura: cabeças de chave, ranqueados e sem ranking"""
+    cabecas = list(dict.fromkeys(nome for nome in (cabecas_de_chave or []) if nome in jogadores))
+    semeados = set(cabecas)
+    restantes = [nome for nome in jogadores if nome not in semeados]
+
+    # O desempate aleatório vem de uma chave sorteada por jogador
+    desempate = {nome: random.random() for nome in restantes}
+    sem_ranking = (float('inf'), 0)
+    restantes.sort(key=lambda nome: (ranking.get(nome, sem_ranking)[0], desempate[nome]))
+    return cabecas + restantes
+
+
+def distribuir_em_serpentina(ordenados, num_grupos):
+    """Distribui a lista já ordenada em grupos, pote a pote, em serpentina"""
+    grupos = [[] for _ in range(num_grupos)]
+    for indice, nome in enumerate(ordenados):
+        pote, posicao_no_pote = divmod(indice, num_grupos)
+        grupo_idx = posicao_no_pote if pote % 2 == 0 else num_grupos - 1 - posicao_no_pote
+        grupos[grupo_idx].append(nome)
+    return grupos
+
+
+def sortear_por_ranking(jogadores, num_grupos, cabecas_de_chave=None):
+    """Grupos equilibrados pelo ranking global para qualquer múltiplo de 4 jogadores"""
+    ranking = ranking_dos_jogadores(jogadores)
+    ordenados = ordenar_por_ranking(jogadores, ranking, cabecas_de_chave)
+    return distribuir_em_serpentina(ordenados, num_grupos), ranking
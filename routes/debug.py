@@ -0,0 +1,21 @@
+"""Métricas de SQL por rota (ver database/instrumentacao.py)"""
+import hmac
+from flask import Blueprint, abort, current_app, jsonify, request
+
+
+bp = Blueprint('debug', __name__)
+
+@bp.route('/debug/metrics')
+def metricas():
+    """Resumo das requisições deste processo; exige METRICAS_TOKEN fora do modo debug"""
+    metricas_sql = current_app.extensions.get('metricas_sql')
+    if metricas_sql is None:
+        abort(404)
+
+    token = current_app.config.get('METRICAS_TOKEN')
+    if not current_app.debug:
+        informado = request.args.get('token') or request.headers.get('X-Metricas-Token') or ''
+        if not token or not hmac.compare_digest(informado, token):
+            abort(404)
+
+    return jsonify(metricas_sql.resumo())
@@ -0,0 +1,104 @@
+"""Rotas com escopo de torneio: vários torneios em andamento ao mesmo tempo
+
+O estado de cada torneio fica no namespace 'torneio:<id>' (database/estado.py),
+compartilhado por todos os dispositivos; o navegador guarda só qual torneio
+está aberto (session['torneio_id']). As rotas de grupos e eliminatórias também
+respondem em /torneio/<id>/..., que abre aquele torneio antes de executar a
+rota, então cada quadra pode lançar resultados em paralelo no seu dispositivo.
+"""
+import functools
+from flask import current_app, g, has_request_context, redirect, session, url_for
+from database.models import Torneio
+from database.estado import CHAVES_TORNEIO
+from database.db import db
+
+
+# Endpoints registrados com rota_do_torneio (recebem /torneio/<id>/ no url_for)
+ENDPOINTS_COM_ESCOPO = set()
+
+
+def torneios_em_andamento():
+    """Torneios não finalizados, do mais antigo para o mais novo"""
+    return Torneio.query.filter_by(finalizado=False).order_by(Torneio.id).all()
+
+
+def sair_do_torneio():
+    """Fecha o torneio aberto neste navegador, sem alterar o estado do torneio"""
+    session.pop('torneio_id', None)
+    # Sem torneio_id as chaves do torneio ficam no namespace do navegador: limpar sobras
+    for chave in CHAVES_TORNEIO:
+        session.pop(chave, None)
+
+
+def torneio_da_sessao():
+    """Torneio em andamento aberto neste navegador (None se não houver)"""
+    torneio_id = session.get('torneio_id')
+    if not torneio_id:
+        return None
+    torneio = db.session.get(Torneio, torneio_id)
+    if torneio is None or torneio.finalizado:
+        current_app.logger.warning(
+            f"Torneio ID {torneio_id} não encontrado ou já finalizado. Limpando sessão."
+        )
+        sair_do_torneio()
+        return None
+    return torneio
+
+
+def focar_torneio(torneio_id):
+    """Abre o torneio neste navegador; retorna False se ele não puder ser aberto
+
+    O torneio que já está aberto continua valendo mesmo finalizado (tela de
+    campeões); outro torneio só é aberto se estiver em andamento.
+    """
+    if session.get('torneio_id') == torneio_id:
+        return True
+
+    torneio = db.session.get(Torneio, torneio_id)
+    if torneio is None or torneio.finalizado:
+        return False
+
+    sair_do_torneio()
+    session['torneio_id'] = torneio_id
+    # Estado descartado ou expirado: montar de novo a partir do banco
+    if not session.get('grupos'):
+        # Importado aqui porque routes.main também usa este módulo
+        from routes.main import carregar_torneio_na_sessao
+        carregar_torneio_na_sessao(torneio_id)
+    current_app.logger.info(f"Torneio {torneio_id} aberto neste navegador")
+    return True
+
+
+def rota_do_torneio(bp, caminho, **opcoes):
+    """Como bp.route, registrando também /torneio/<torneio_id><caminho>
+
+    Na forma com id o torneio é aberto antes da view, que continua lendo
+    session['torneio_id']; a forma sem id usa o torneio já aberto.
+    """
+    def decorador(view):
+        @functools.wraps(view)
+        def envolvida(*args, torneio_id=None, **kwargs):
+            if torneio_id is not None:
+                if not focar_torneio(torneio_id):
+                    session['erro_validacao'] = f"O torneio {torneio_id} não existe ou já foi finalizado."
+                    return redirect(url_for('main.home'))
+                g.torneio_escopo = torneio_id
+            return view(*args, **kwargs)
+
+        bp.add_url_rule(caminho, view_func=envolvida, **opcoes)
+        bp.add_url_rule(f'/torneio/<int:torneio_id>{caminho}', view_func=envolvida, **opcoes)
+        ENDPOINTS_COM_ESCOPO.add(f'{bp.name}.{view.__name__}')
+        return envolvida
+    return decorador
+
+
+def configurar_escopo(app):
+    """Links gerados numa página com escopo continuam no mesmo torneio"""
+    @app.url_defaults
+    def incluir_torneio(endpoint, values):
+        # Só a partir de rotas com escopo: páginas em cache não podem levar o torneio de alguém
+        if 'torneio_id' in values or not has_request_context() or endpoint not in ENDPOINTS_COM_ESCOPO:
+            return
+        torneio_id = g.get('torneio_escopo')
+        if torneio_id is not None:
+            values['torneio_id'] = torneio_id
@@ -0,0 +1,60 @@
+"""Stream do placar ao vivo (Server-Sent Events)"""
+import queue
+import time
+from flask import Blueprint, Response, current_app, request
+from database.eventos import EventosManager, formatar_sse, obter_transmissor
+
+
+bp = Blueprint('eventos', __name__)
+
+@bp.route('/eventos/<int:torneio_id>')
+def transmitir(torneio_id):
+    """Mantém a conexão aberta enviando os eventos do torneio à medida que são salvos"""
+    transmissor = obter_transmissor()
+    fila = transmissor.assinar(torneio_id)
+
+    try:
+        # Reconexão do navegador: repor o que foi perdido desde o último evento recebido
+        ultimo_recebido = request.headers.get('Last-Event-ID', type=int)
+        if ultimo_recebido is None:
+            ultimo_recebido = EventosManager.ultimo_id()
+        pendentes = EventosManager.listar_desde(ultimo_recebido, [torneio_id])
+    except Exception:
+        transmissor.cancelar(torneio_id, fila)
+        raise
+
+    duracao = current_app.config.get('EVENTOS_DURACAO_CONEXAO', 300)
+    keepalive = current_app.config.get('EVENTOS_KEEPALIVE', 15)
+
+    def gerar():
+        ultimo_enviado = ultimo_recebido
+        encerrar_em = time.monotonic() + duracao
+        try:
+            yield "retry: 3000\n\n"
+            for evento_id, _, tipo, dados in pendentes:
+                ultimo_enviado = evento_id
+                yield formatar_sse(evento_id, tipo, dados)
+
+            # Conexões são renovadas periodicamente para liberar o worker;
+            # o navegador reconecta sozinho enviando Last-Event-ID
+            while time.monotonic() < encerrar_em:
+                try:
+                    evento = fila.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+
+                if evento is None:
+                    break
+                evento_id, tipo, dados = evento
+                if evento_id <= ultimo_enviado:
+                    continue
+                ultimo_enviado = evento_id
+                yield formatar_sse(evento_id, tipo, dados)
+        finally:
+            transmissor.cancelar(torneio_id, fila)
+
+    return Response(gerar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
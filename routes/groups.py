@@ -3,8 +3,24 @@ import random
 import re
 from datetime import datetime
 from flask import Blueprint, request, redirect, url_for, session, current_app, jsonify
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm.exc import StaleDataError
 from database.models import Jogador, Torneio, Confronto, JogadorPermanente, ParticipacaoTorneio
+from database.ranking import RankingManager
+from database.rating import RatingManager
+from database.busca import BuscaJogadores, responder_busca
+from database.elenco import ElencoTorneio
+from database.eventos import EventosManager
+from database.cache import invalida_cache
+from database.chave import jogadores_do_modo
+from database.sorteio import sortear_por_ranking
+from database.parcerias import sortear_evitando_repeticoes
+from database.classificacao import ordenar_grupo, trocar_placar
+from database.simulacao import SimuladorClassificacao
+from database.concorrencia import ConflitoPlacar, ler_placar_original, ler_pontos, placar_editado, responder_conflito
 from database.db import db
+from routes.escopo import rota_do_torneio
 
 
 bp = Blueprint('groups', __name__)
@@ -28,17 +44,26 @@ def criar_jogador(nome):
     log_action("player_created", f"Jogador: {nome}")
     return jogador
 
-def criar_grupos(jogadores, modo, cabecas_de_chave=None):
+def criar_grupos(jogadores, modo, cabecas_de_chave=None, distribuicao='aleatorio'):
     """Divide os jogadores em grupos de 4 com logging, considerando cabeças de chave"""
-    num_groups = {
-        '16j': (16, 4),
-        '20j': (20, 5),
-        '24j': (24, 6),
-        '28j': (28, 7),
-        '32j': (32, 8)
-    }.get(modo, (28, 7))
+    num_grupos = len(jogadores) // 4
+    
+    # Busca a atribuição com menos parcerias repetidas, equilibrando pelo ranking
+    if distribuicao == 'parcerias':
+        grupos, repetidas = sortear_evitando_repeticoes(
+            jogadores, num_grupos, cabecas_de_chave, current_app.config.get('SORTEIO_OTIMIZACAO_MS', 300)
+        )
+        log_action("groups_created", f"Modo: {modo} - {num_grupos} grupos evitando parcerias "
+                   f"({repetidas} parcerias repetidas)")
+        return grupos
+    
+    # Potes em serpentina pelo ranking global (cabeças de chave vêm primeiro)
+    if distribuicao == 'ranking':
+        grupos, posicoes = sortear_por_ranking(jogadores, num_grupos, cabecas_de_chave)
+        log_action("groups_created", f"Modo: {modo} - {num_grupos} grupos pelo ranking "
+                   f"({len(posicoes)} de {len(jogadores)} jogadores ranqueados)")
+        return grupos
     
-    num_jogadores, num_grupos = num_groups
     grupos = [[] for _ in range(num_grupos)]
     
     # Se houver cabeças de chave, distribuir um por grupo primeiro
@@ -75,27 +100,47 @@ def gerar_confrontos(grupo):
     log_action("matches_generated", f"Grupo com jogadores: {[j['nome'] for j in grupo]}")
     return confrontos
 
+def garantir_jogadores_permanentes(nomes):
+    """Retorna {nome: id} dos jogadores permanentes, cadastrando os que faltam
+
+    Uma consulta IN resolve os existentes e um único INSERT ... ON CONFLICT
+    cria os novos (sem erro se outro sorteio cadastrar o mesmo nome ao mesmo tempo).
+    """
+    tabela = JogadorPermanente.__table__
+    consulta = select(tabela.c.nome, tabela.c.id).where(tabela.c.nome.in_(nomes))
+    ids = dict(db.session.execute(consulta).all())
+    
+    novos = [nome for nome in nomes if nome not in ids]
+    if novos:
+        linhas = [{'nome': nome, 'data_cadastro': datetime.utcnow()} for nome in novos]
+        dialeto = db.session.get_bind().dialect.name
+        if dialeto in ('postgresql', 'sqlite'):
+            insercao = {'postgresql': postgresql, 'sqlite': sqlite}[dialeto].insert(tabela)
+            db.session.execute(insercao.on_conflict_do_nothing(index_elements=['nome']), linhas)
+        else:
+            db.session.execute(tabela.insert(), linhas)
+        
+        ids.update(db.session.execute(
+            select(tabela.c.nome, tabela.c.id).where(tabela.c.nome.in_(novos))
+        ).all())
+        log_action("player_created_permanent", f"Novos jogadores permanentes: {', '.join(novos)}")
+    
+    log_action("player_reused", f"{len(nomes) - len(novos)} jogadores permanentes reaproveitados")
+    return ids
+
 @bp.route('/sorteio', methods=['POST'])
+@invalida_cache
 def sorteio():
     """Função para fazer o sorteio do grupo"""
     try:
 
-        # Verificar se já existe um torneio não finalizado no banco
-        torneio_em_andamento = Torneio.query.filter_by(finalizado=False).first()
-
-        if torneio_em_andamento:
-            log_action("tournament_start_prevented", 
-                      f"Tentativa de novo sorteio com torneio {torneio_em_andamento.id} em andamento")
-            session['erro_validacao'] = (
-                f"Já existe um torneio em andamento: '{torneio_em_andamento.nome}'. "
-                f"Para realizar um novo sorteio, finalize ou cancele o torneio atual primeiro."
-            )
-            return redirect(url_for('main.novo_torneio'))
-
         # Verificar se já existem grupos sorteados
         if 'grupos' in session and session['grupos']:
             log_action("tournament_start_prevented", "Tentativa de novo sorteio com grupos existentes")
-            session['erro_validacao'] = "Um sorteio já foi realizado. Para realizar um novo sorteio, cancele o torneio atual."
+            session['erro_validacao'] = (
+                "Um sorteio já foi realizado neste torneio. Para iniciar outro torneio em paralelo, "
+                "use 'Novo Torneio' na página inicial."
+            )
             return redirect(url_for('main.novo_torneio'))
             
         modo = request.form.get('modo_torneio', '28j')
@@ -117,10 +162,7 @@ def sorteio():
         nomes = [nome.strip() for nome in request.form['jogadores'].split(',') 
                 if nome.strip() and re.match(r'^[a-zA-ZÀ-ú0-9\s,]+$', nome.strip())]
         
-        expected_players = {
-            '16j': 16,'20j': 20, '24j': 24, 
-            '28j': 28, '32j': 32
-        }.get(modo, 28)
+        expected_players = jogadores_do_modo(modo) or 28
         
         if len(nomes) != expected_players:
             error_msg = f"Jogadores incorretos! Esperado: {expected_players}, Recebido: {len(nomes)}"
@@ -128,80 +170,12 @@ def sorteio():
             session['erro_validacao'] = error_msg
             return redirect(url_for('main.novo_torneio'))
         
-        # Cria novo torneio
-        novo_torneio = Torneio(nome=nome_torneio, formato_eliminatoria=formato_eliminatoria)
-        db.session.add(novo_torneio)
-        db.session.flush()  # Para obter o ID sem fazer commit completo
-        
-        # Primeiro, garantir que todos os jogadores permanentes existam
-        jogadores_permanentes = {}
-        
-        for nome in nomes:
-            # Verificar se jogador já existe
-            jogador = JogadorPermanente.query.filter_by(nome=nome).first()
-            
-            # Se não existe, criar
-            if not jogador:
-                jogador = JogadorPermanente(nome=nome)
-                db.session.add(jogador)
-                db.session.flush()  # Obter ID sem commit
-                log_action("player_created_permanent", f"Novo jogador permanente: {nome} (ID: {jogador.id})")
-            else:
-                log_action("player_reused", f"Jogador existente: {nome} (ID: {jogador.id})")
-                
-            jogadores_permanentes[nome] = jogador
-        
-        # Agora criar participações e jogadores (para compatibilidade)
-        participacoes = {}
-        jogadores_dict = {}
-        
-        for nome in nomes:
-            jogador_permanente = jogadores_permanentes[nome]
-            
-            # Criar participação
-            participacao = ParticipacaoTorneio(
-                jogador_permanente_id=jogador_permanente.id,
-                torneio_id=novo_torneio.id
-            )
-            db.session.add(participacao)
-            db.session.flush()  # Obter ID sem commit
-            participacoes[nome] = participacao
-            
-            # Criar jogador para compatibilidade
-            jogador = Jogador(
-                nome=nome,
-                torneio_id=novo_torneio.id,
-                jogador_permanente_id=jogador_permanente.id
-            )
-            db.session.add(jogador)
-            db.session.flush()  # Obter ID sem commit
-            jogadores_dict[nome] = jogador
-            
-            log_action("player_participation_created", 
-                      f"Participação criada: {nome} - Jogador ID: {jogador.id}, Participação ID: {participacao.id}")
-        
-        # Commit intermediário para garantir que todos os jogadores estejam salvos
-        db.session.commit()
-        
-        # Estrutura de dados na sessão
-        session.update({
-            'torneio_id': novo_torneio.id,
-            'modo_torneio': modo,
-            'formato_eliminatoria': formato_eliminatoria,
-            'jogadores': {
-                nome: {
-                    'nome': jogador.nome,
-                    'id': jogador.id,
-                    'vitorias': jogador.vitorias,
-                    'saldo_a_favor': jogador.saldo_a_favor,
-                    'saldo_contra': jogador.saldo_contra,
-                    'saldo_total': jogador.saldo_total
-                } for nome, jogador in jogadores_dict.items()
-            },
-            'grupos': [],
-            'confrontos': [],
-            'valores_salvos': {}
-        })
+        repetidos = sorted({nome for nome in nomes if nomes.count(nome) > 1})
+        if repetidos:
+            error_msg = f"Jogadores repetidos: {', '.join(repetidos)}"
+            current_app.logger.error(error_msg)
+            session['erro_validacao'] = error_msg
+            return redirect(url_for('main.novo_torneio'))
         
         # Processar cabeças de chave se fornecidas
         cabecas_de_chave_nomes = []
@@ -211,9 +185,7 @@ def sorteio():
                                       if nome.strip() and nome.strip() in nomes]
             
             # Validar número de cabeças de chave
-            num_grupos = {
-                '16j': 4, '20j': 5, '24j': 6, '28j': 7, '32j': 8
-            }.get(modo, 7)
+            num_grupos = len(nomes) // 4
             
             if len(cabecas_de_chave_nomes) > num_grupos:
                 error_msg = f"Número de cabeças de chave ({len(cabecas_de_chave_nomes)}) excede o número de grupos ({num_grupos})"
@@ -223,58 +195,100 @@ def sorteio():
             
             log_action("seeds_selected", f"Cabeças de chave: {', '.join(cabecas_de_chave_nomes)}")
 
-        # Criar grupos e mapeamento nome -> grupo_idx
-        grupos_nomes = criar_grupos(list(nomes), modo, cabecas_de_chave_nomes)
+        # Sortear os grupos antes de gravar, para inserir tudo já com o grupo_idx
+        distribuicao = request.form.get('distribuicao_grupos', 'aleatorio')
+        grupos_nomes = criar_grupos(list(nomes), modo, cabecas_de_chave_nomes, distribuicao)
         
-        # NOVO: Criar mapeamento de nome para grupo_idx
         nome_para_grupo = {}
         for grupo_idx, grupo_nomes in enumerate(grupos_nomes):
             for nome in grupo_nomes:
                 nome_para_grupo[nome] = grupo_idx
         
+        # Cria novo torneio
+        # A disputa de 3º lugar fica gravada no torneio: mudar a configuração não altera chaves em andamento
+        disputa_terceiro_lugar = current_app.config.get('DISPUTA_TERCEIRO_LUGAR', False)
+        novo_torneio = Torneio(nome=nome_torneio, formato_eliminatoria=formato_eliminatoria,
+                               disputa_terceiro_lugar=disputa_terceiro_lugar)
+        db.session.add(novo_torneio)
+        db.session.flush()  # Para obter o ID sem fazer commit completo
+        
+        # Garantir que todos os jogadores permanentes existam
+        jogadores_permanentes_ids = garantir_jogadores_permanentes(nomes)
+        
+        # Participações e jogadores (para compatibilidade) em um INSERT cada
+        db.session.execute(insert(ParticipacaoTorneio), [{
+            'jogador_permanente_id': jogadores_permanentes_ids[nome],
+            'torneio_id': novo_torneio.id,
+            'grupo_idx': nome_para_grupo[nome],
+            'posicao_grupo': 0  # Posição ainda não definida (será definida ao salvar resultados)
+        } for nome in nomes])
+        db.session.execute(insert(Jogador), [{
+            'nome': nome,
+            'torneio_id': novo_torneio.id,
+            'jogador_permanente_id': jogadores_permanentes_ids[nome],
+            'grupo_idx': nome_para_grupo[nome],
+            'posicao_grupo': 0
+        } for nome in nomes])
+        
+        elenco = ElencoTorneio.carregar(novo_torneio.id)
+        log_action("player_participation_created", 
+                  f"{len(elenco)} jogadores e participações criados no torneio {novo_torneio.id}")
+        
+        # Estrutura de dados na sessão
+        session.update({
+            'torneio_id': novo_torneio.id,
+            'modo_torneio': modo,
+            'formato_eliminatoria': formato_eliminatoria,
+            'disputa_terceiro_lugar': disputa_terceiro_lugar,
+            'jogadores': {
+                nome: {
+                    'nome': nome,
+                    'id': elenco.id_do_jogador(nome),
+                    'vitorias': 0,
+                    'saldo_a_favor': 0,
+                    'saldo_contra': 0,
+                    'saldo_total': 0
+                } for nome in nomes
+            },
+            'grupos': [],
+            'confrontos': [],
+            'valores_salvos': {}
+        })
+        
         # Processar grupos e confrontos
+        novos_confrontos = []
         for grupo_idx, grupo_nomes in enumerate(grupos_nomes):
             grupo = [session['jogadores'][nome] for nome in grupo_nomes]
             session['grupos'].append(grupo)
             confrontos_grupo = gerar_confrontos(grupo)
             session['confrontos'].append(confrontos_grupo)
             
-            # Salvar confrontos no banco
             for confronto_idx, confronto in enumerate(confrontos_grupo):
-                # Criando o confronto no banco
-                novo_confronto = Confronto(
-                    torneio_id=novo_torneio.id,
-                    grupo_idx=grupo_idx,
-                    confronto_idx=confronto_idx,
-                    jogador_a1_id=session['jogadores'][confronto[0]['nome']]['id'],
-                    jogador_a2_id=session['jogadores'][confronto[1]['nome']]['id'],
-                    jogador_b1_id=session['jogadores'][confronto[2]['nome']]['id'],
-                    jogador_b2_id=session['jogadores'][confronto[3]['nome']]['id']
-                )
-                db.session.add(novo_confronto)
-                log_action("confronto_created", 
-                          f"Confronto DB: G{grupo_idx+1}-C{confronto_idx+1} - "
-                          f"{confronto[0]['nome']}&{confronto[1]['nome']} x "
-                          f"{confronto[2]['nome']}&{confronto[3]['nome']}")
-        
-        # NOVO: Atualizar jogadores e participações com o grupo_idx correto ANTES do commit final
-        for nome, jogador in jogadores_dict.items():
-            grupo_idx = nome_para_grupo.get(nome, 0)
-            jogador.grupo_idx = grupo_idx
-            jogador.posicao_grupo = 0  # Posição ainda não definida (será definida ao salvar resultados)
-            
-            # Atualizar também na participação
-            participacao = participacoes.get(nome)
-            if participacao:
-                participacao.grupo_idx = grupo_idx
-                participacao.posicao_grupo = 0
-            
-            log_action("jogador_grupo_assigned", 
-                      f"Jogador {nome} (ID: {jogador.id}) atribuído ao Grupo {grupo_idx + 1}")
-        
-        # Commit final com todos os dados
+                novos_confrontos.append({
+                    'torneio_id': novo_torneio.id,
+                    'grupo_idx': grupo_idx,
+                    'confronto_idx': confronto_idx,
+                    'jogador_a1_id': confronto[0]['id'],
+                    'jogador_a2_id': confronto[1]['id'],
+                    'jogador_b1_id': confronto[2]['id'],
+                    'jogador_b2_id': confronto[3]['id']
+                })
+        
+        # Salvar confrontos no banco
+        db.session.execute(insert(Confronto), novos_confrontos)
+        log_action("confronto_created", f"{len(novos_confrontos)} confrontos criados")
+        
+        # Commit único com todos os dados
         db.session.commit()
         
+        # Novos jogadores e contagem de torneios no ranking materializado
+        RankingManager.atualizar_ranking_jogadores(
+            list(jogadores_permanentes_ids.values())
+        )
+        
+        # Jogadores recém-cadastrados passam a aparecer na busca
+        BuscaJogadores.invalidar()
+        
         log_action("tournament_created", 
                   f"Torneio criado com sucesso - {len(grupos_nomes)} grupos")
         session.pop('erro_validacao', None)
@@ -288,6 +302,7 @@ def sorteio():
         return redirect(url_for('main.novo_torneio'))
     
 @bp.route('/corrigir_grupos_torneio/<int:torneio_id>', methods=['GET'])
+@invalida_cache
 def corrigir_grupos_torneio(torneio_id):
     """Função para corrigir o grupo_idx dos jogadores de um torneio existente"""
     try:
@@ -322,19 +337,17 @@ def corrigir_grupos_torneio(torneio_id):
                     jogador_para_grupo[jogador_id] = grupo_idx
         
         # Atualizar os jogadores no banco
+        jogadores_db, participacoes_db = carregar_jogadores_torneio(torneio_id)
         jogadores_atualizados = 0
         for jogador_id, grupo_idx in jogador_para_grupo.items():
-            jogador = Jogador.query.get(jogador_id)
+            jogador = jogadores_db.get(jogador_id)
             if jogador:
                 jogador.grupo_idx = grupo_idx
                 jogadores_atualizados += 1
                 
                 # Atualizar também a participação
                 if jogador.jogador_permanente_id:
-                    participacao = ParticipacaoTorneio.query.filter_by(
-                        jogador_permanente_id=jogador.jogador_permanente_id,
-                        torneio_id=torneio_id
-                    ).first()
+                    participacao = participacoes_db.get(jogador.jogador_permanente_id)
                     
                     if participacao:
                         participacao.grupo_idx = grupo_idx
@@ -343,6 +356,7 @@ def corrigir_grupos_torneio(torneio_id):
                           f"Jogador {jogador.nome} (ID: {jogador_id}) atribuído ao Grupo {grupo_idx + 1}")
         
         db.session.commit()
+        EventosManager.publicar(torneio_id, 'recarregar', {'motivo': 'correcao_grupos'})
         
         log_action("correcao_grupos_success", 
                   f"{jogadores_atualizados} jogadores corrigidos para o torneio {torneio_id}")
@@ -357,198 +371,337 @@ def corrigir_grupos_torneio(torneio_id):
         db.session.rollback()
         return redirect(url_for('main.novo_torneio'))
     
-@bp.route('/salvar_grupo/<int:grupo_idx>', methods=['POST'])
-def salvar_grupo(grupo_idx):
-    """Função para salvar os resultados de apenas um grupo especifico"""
-    try:
-        log_action("group_save_start", 
-                  f"Salvando Grupo {grupo_idx + 1} - Dados: {dict(request.form)}") 
-        
-        # Inicializa valores salvos se necessário
-        session.setdefault('valores_salvos', {})
+def carregar_jogadores_torneio(torneio_id):
+    """Carrega jogadores e participações do torneio em duas consultas"""
+    participacoes = ParticipacaoTorneio.query.filter_by(torneio_id=torneio_id).all()
+    
+    jogadores_db = dict(ElencoTorneio.carregar(torneio_id).por_id)
+    participacoes_db = {p.jogador_permanente_id: p for p in participacoes}
+    return jogadores_db, participacoes_db
 
-        # Processa campos do formulário
-        for key, value in request.form.items():
-            if key.startswith(f'grupo_{grupo_idx}_'):
-                session['valores_salvos'][key] = value
-                if not value.isdigit() and value:
-                    current_app.logger.warning(f"Valor inválido no campo {key}: {value}")
+def verificar_jogadores_sessao(torneio_id, nomes, jogadores_db):
+    """Garante que os jogadores da sessão existem no banco, corrigindo IDs se necessário"""
+    jogadores_por_nome = ElencoTorneio.carregar(torneio_id).por_nome
+    
+    for nome in nomes:
+        jogador_sessao = session['jogadores'][nome]
+        if jogador_sessao['id'] in jogadores_db:
+            continue
+        
+        log_action("jogador_not_found", f"Jogador não encontrado no banco: {nome} (ID: {jogador_sessao['id']})")
+        # Tente recuperar por nome e torneio
+        db_jogador = jogadores_por_nome.get(nome)
+        
+        if db_jogador:
+            # Atualizar ID na sessão
+            jogador_sessao['id'] = db_jogador.id
+            log_action("jogador_id_fixed", f"ID do jogador {nome} atualizado para {db_jogador.id}")
+        else:
+            # Se ainda não encontrar, criar um novo
+            # Primeiro encontrar ou criar o jogador permanente
+            jogador_permanente = JogadorPermanente.query.filter_by(nome=nome).first()
+            if not jogador_permanente:
+                jogador_permanente = JogadorPermanente(nome=nome)
+                db.session.add(jogador_permanente)
+                db.session.flush()
+            
+            # Criar novo jogador
+            novo_jogador = Jogador(
+                nome=nome, 
+                torneio_id=torneio_id,
+                jogador_permanente_id=jogador_permanente.id
+            )
+            db.session.add(novo_jogador)
+            db.session.flush()
+            jogadores_db[novo_jogador.id] = novo_jogador
+            jogador_sessao['id'] = novo_jogador.id
+            ElencoTorneio.descartar(torneio_id)
+            log_action("jogador_created", f"Novo jogador criado: {nome} (ID: {novo_jogador.id})")
 
-        # Reset estatísticas
-        grupo_nomes = [j['nome'] for j in session['grupos'][grupo_idx]]
-        for nome in grupo_nomes:
-            session['jogadores'][nome].update({
-                'vitorias': 0,
-                'saldo_a_favor': 0,
-                'saldo_contra': 0,
-                'saldo_total': 0
-            })
-        
-        # Verificar IDs dos jogadores no banco
-        torneio_id = session.get('torneio_id')
-        if not torneio_id:
-            raise ValueError("ID do torneio não encontrado na sessão")
+def persistir_classificacao(grupos_indices, jogadores_db, participacoes_db):
+    """Grava estatísticas e posições dos grupos com um UPDATE em lote por tabela (sem commit)"""
+    atualizacoes_jogadores = []
+    atualizacoes_participacoes = []
+    
+    for grupo_idx in grupos_indices:
+        for i, jogador_dados in enumerate(session['grupos'][grupo_idx]):
+            nome = jogador_dados['nome']
+            jogador = jogadores_db.get(session['jogadores'][nome]['id'])
+            if not jogador:
+                log_action("jogador_not_found_for_update", 
+                          f"Jogador não encontrado para atualização: {nome}")
+                continue
             
-        # Verificar jogadores no banco
-        with db.session.no_autoflush:
-            for nome in grupo_nomes:
-                jogador_id = session['jogadores'][nome]['id']
-                db_jogador = Jogador.query.get(jogador_id)
-                
-                if not db_jogador:
-                    log_action("jogador_not_found", f"Jogador não encontrado no banco: {nome} (ID: {jogador_id})")
-                    # Tente recuperar por nome e torneio
-                    db_jogador = Jogador.query.filter_by(nome=nome, torneio_id=torneio_id).first()
-                    
-                    if db_jogador:
-                        # Atualizar ID na sessão
-                        session['jogadores'][nome]['id'] = db_jogador.id
-                        log_action("jogador_id_fixed", f"ID do jogador {nome} atualizado para {db_jogador.id}")
-                    else:
-                        # Se ainda não encontrar, criar um novo
-                        # Primeiro encontrar ou criar o jogador permanente
-                        jogador_permanente = JogadorPermanente.query.filter_by(nome=nome).first()
-                        if not jogador_permanente:
-                            jogador_permanente = JogadorPermanente(nome=nome)
-                            db.session.add(jogador_permanente)
-                            db.session.flush()
-                        
-                        # Criar novo jogador
-                        novo_jogador = Jogador(
-                            nome=nome, 
-                            torneio_id=torneio_id,
-                            jogador_permanente_id=jogador_permanente.id
-                        )
-                        db.session.add(novo_jogador)
-                        db.session.flush()
-                        session['jogadores'][nome]['id'] = novo_jogador.id
-                        log_action("jogador_created", f"Novo jogador criado: {nome} (ID: {novo_jogador.id})")
+            # Estatísticas e posição no grupo (1-based)
+            dados = {
+                'vitorias': jogador_dados['vitorias'],
+                'saldo_a_favor': jogador_dados['saldo_a_favor'],
+                'saldo_contra': jogador_dados['saldo_contra'],
+                'saldo_total': jogador_dados['saldo_total'],
+                'posicao_grupo': i + 1,
+                'grupo_idx': grupo_idx
+            }
+            atualizacoes_jogadores.append({'id': jogador.id, **dados})
             
-            # Commit para garantir que todos os jogadores estejam no banco
-            db.session.commit()
-        
-        # Processa cada confronto
-        for confronto_idx, confronto in enumerate(session['confrontos'][grupo_idx]):
-            campo_A = f"grupo_{grupo_idx}_confronto_{confronto_idx}_duplaA_favor"
-            campo_B = f"grupo_{grupo_idx}_confronto_{confronto_idx}_duplaB_favor"
+            # Também atualizar na tabela de participação
+            participacao = participacoes_db.get(jogador.jogador_permanente_id)
+            if participacao:
+                atualizacoes_participacoes.append({'id': participacao.id, **dados})
+    
+    if atualizacoes_jogadores:
+        db.session.bulk_update_mappings(Jogador, atualizacoes_jogadores)
+    if atualizacoes_participacoes:
+        db.session.bulk_update_mappings(ParticipacaoTorneio, atualizacoes_participacoes)
+    
+    return len(atualizacoes_jogadores)
+
+def aplicar_placares(torneio_id, grupos_indices, confrontos_db):
+    """Grava no banco os placares editados no formulário (sem commit)
 
+    Retorna (grupos alterados, conflitos). Um confronto só é gravado se o
+    placar enviado difere do que a página exibiu; se outro dispositivo o
+    gravou nesse meio-tempo, o placar do banco é mantido e o confronto entra
+    na lista de conflitos.
+    """
+    alterados = set()
+    conflitos = []
+    for grupo_idx in grupos_indices:
+        for confronto_idx, confronto in enumerate(session['confrontos'][grupo_idx]):
+            prefixo = f"grupo_{grupo_idx}_confronto_{confronto_idx}"
+            campo_A = f"{prefixo}_duplaA_favor"
+            campo_B = f"{prefixo}_duplaB_favor"
+            if campo_A not in request.form and campo_B not in request.form:
+                continue
+            placar = (ler_pontos(request.form.get(campo_A)), ler_pontos(request.form.get(campo_B)))
+            
+            confronto_db = confrontos_db.get((grupo_idx, confronto_idx))
+            if confronto_db is None:
+                # Se o confronto não existe (não deveria acontecer), crie-o
+                novo_confronto = Confronto(
+                    torneio_id=torneio_id,
+                    grupo_idx=grupo_idx,
+                    confronto_idx=confronto_idx,
+                    jogador_a1_id=session['jogadores'][confronto[0]['nome']]['id'],
+                    jogador_a2_id=session['jogadores'][confronto[1]['nome']]['id'],
+                    jogador_b1_id=session['jogadores'][confronto[2]['nome']]['id'],
+                    jogador_b2_id=session['jogadores'][confronto[3]['nome']]['id'],
+                    pontos_dupla_a=placar[0],
+                    pontos_dupla_b=placar[1]
+                )
+                db.session.add(novo_confronto)
+                alterados.add(grupo_idx)
+                log_action("confronto_created_late", 
+                          f"Confronto DB criado tardiamente: G{grupo_idx+1}-C{confronto_idx+1}")
+                continue
+            
             try:
-                saldoA = int(session['valores_salvos'].get(campo_A, 0)) if session['valores_salvos'].get(campo_A, '') else 0
-                saldoB = int(session['valores_salvos'].get(campo_B, 0)) if session['valores_salvos'].get(campo_B, '') else 0
-                
-                # Atualiza estatísticas para cada jogador
-                jogadores = {
-                    'A': [session['jogadores'][confronto[0]['nome']], 
-                         session['jogadores'][confronto[1]['nome']]],
-                    'B': [session['jogadores'][confronto[2]['nome']], 
-                         session['jogadores'][confronto[3]['nome']]]
-                }
+                editado = placar_editado(
+                    confronto_db, placar,
+                    versao=request.form.get(f"{prefixo}_versao", type=int),
+                    original=ler_placar_original(request.form.get(f"{prefixo}_original"))
+                )
+            except ConflitoPlacar as e:
+                conflitos.append(f"Grupo {grupo_idx + 1}, jogo {confronto_idx + 1}: {e}")
+                log_action("confronto_conflict", 
+                          f"G{grupo_idx+1}-C{confronto_idx+1}: versão {request.form.get(f'{prefixo}_versao')} "
+                          f"enviada, {confronto_db.versao} no banco")
+                continue
+            
+            if editado:
+                confronto_db.pontos_dupla_a, confronto_db.pontos_dupla_b = placar
+                alterados.add(grupo_idx)
+                log_action("confronto_updated", 
+                          f"Confronto DB atualizado: G{grupo_idx+1}-C{confronto_idx+1} - "
+                          f"Placar: {placar[0]} x {placar[1]}")
+    return alterados, conflitos
 
-                for jogador in jogadores['A']:
-                    jogador['saldo_a_favor'] += saldoA
-                    jogador['saldo_contra'] += saldoB
-                    if saldoA > saldoB:
-                        jogador['vitorias'] += 1
+def duplas_do_confronto(confronto):
+    """Nomes das duplas A e B de um confronto da sessão"""
+    return (confronto[0]['nome'], confronto[1]['nome']), (confronto[2]['nome'], confronto[3]['nome'])
 
-                for jogador in jogadores['B']:
-                    jogador['saldo_a_favor'] += saldoB
-                    jogador['saldo_contra'] += saldoA
-                    if saldoB > saldoA:
-                        jogador['vitorias'] += 1
+def placar_na_sessao(valores, prefixo):
+    """Placar (a, b) já aplicado na classificação da sessão, ou None se incompleto"""
+    pontos_a = valores.get(f"{prefixo}_duplaA_favor", '')
+    pontos_b = valores.get(f"{prefixo}_duplaB_favor", '')
+    if pontos_a == '' or pontos_b == '':
+        return None
+    return int(pontos_a), int(pontos_b)
 
-                # Atualiza o confronto no banco de dados
-                torneio_id = session.get('torneio_id')
-                confronto_db = Confronto.query.filter_by(
-                    torneio_id=torneio_id, 
-                    grupo_idx=grupo_idx, 
-                    confronto_idx=confronto_idx
-                ).first()
-                
-                if confronto_db:
-                    # Se o confronto já existe, atualize os resultados
-                    confronto_db.pontos_dupla_a = saldoA
-                    confronto_db.pontos_dupla_b = saldoB
-                    log_action("confronto_updated", 
-                              f"Confronto DB atualizado: G{grupo_idx+1}-C{confronto_idx+1} - "
-                              f"Placar: {saldoA} x {saldoB}")
-                else:
-                    # Se o confronto não existe (não deveria acontecer), crie-o
-                    novo_confronto = Confronto(
-                        torneio_id=torneio_id,
-                        grupo_idx=grupo_idx,
-                        confronto_idx=confronto_idx,
-                        jogador_a1_id=session['jogadores'][confronto[0]['nome']]['id'],
-                        jogador_a2_id=session['jogadores'][confronto[1]['nome']]['id'],
-                        jogador_b1_id=session['jogadores'][confronto[2]['nome']]['id'],
-                        jogador_b2_id=session['jogadores'][confronto[3]['nome']]['id'],
-                        pontos_dupla_a=saldoA,
-                        pontos_dupla_b=saldoB
-                    )
-                    db.session.add(novo_confronto)
-                    log_action("confronto_created_late", 
-                              f"Confronto DB criado tardiamente: G{grupo_idx+1}-C{confronto_idx+1}")
+def recalcular_grupos(torneio_id, grupos_indices):
+    """Traz para a sessão os placares do banco e reclassifica os grupos que mudaram
+
+    Os confrontos são relidos em uma consulta, então o resultado inclui o que
+    outros dispositivos gravaram; a sessão é só a cópia usada para exibir a
+    página. Cada placar diferente do que a sessão já tinha entra como delta
+    nas estatísticas dos seus quatro jogadores. Retorna
+    {(grupo_idx, confronto_idx): Confronto}.
+    """
+    grupos_indices = list(grupos_indices)
+    # populate_existing: confrontos já carregados nesta requisição também são relidos
+    consulta = Confronto.query.filter(
+        Confronto.torneio_id == torneio_id,
+        Confronto.grupo_idx.in_(grupos_indices)
+    ).populate_existing()
+    confrontos_db = {(c.grupo_idx, c.confronto_idx): c for c in consulta.all()}
+    valores = session.setdefault('valores_salvos', {})
+    
+    for grupo_idx in grupos_indices:
+        alterado = False
+        for confronto_idx, confronto in enumerate(session['confrontos'][grupo_idx]):
+            confronto_db = confrontos_db.get((grupo_idx, confronto_idx))
+            pontos_a = confronto_db.pontos_dupla_a if confronto_db else None
+            pontos_b = confronto_db.pontos_dupla_b if confronto_db else None
             
-            except (KeyError, ValueError) as e:
-                current_app.logger.error(f"Erro processando confronto {confronto_idx}: {str(e)}")
-                raise
+            prefixo = f"grupo_{grupo_idx}_confronto_{confronto_idx}"
+            anterior = placar_na_sessao(valores, prefixo)
+            novo = (pontos_a, pontos_b) if pontos_a is not None and pontos_b is not None else None
+            valores[f"{prefixo}_duplaA_favor"] = '' if pontos_a is None else str(pontos_a)
+            valores[f"{prefixo}_duplaB_favor"] = '' if pontos_b is None else str(pontos_b)
             
-        # Atualiza e classifica o grupo
-        for jogador in session['grupos'][grupo_idx]:
-            jogador_ref = session['jogadores'][jogador['nome']]
-            jogador.update({
-                'vitorias': jogador_ref['vitorias'],
-                'saldo_a_favor': jogador_ref['saldo_a_favor'],
-                'saldo_contra': jogador_ref['saldo_contra'],
-                'saldo_total': jogador_ref['saldo_a_favor'] - jogador_ref['saldo_contra']
-            })
+            if trocar_placar(session['jogadores'], *duplas_do_confronto(confronto), anterior, novo):
+                alterado = True
+        
+        if alterado:
+            classificar_grupo_sessao(grupo_idx)
+    
+    session.modified = True
+    return confrontos_db
 
-        session['grupos'][grupo_idx].sort(key=lambda x: (-x['vitorias'], -x['saldo_total']))
-        session.modified = True
+def classificar_grupo_sessao(grupo_idx):
+    """Copia as estatísticas para o grupo na sessão e o ordena pela cadeia de desempate"""
+    for jogador in session['grupos'][grupo_idx]:
+        jogador_ref = session['jogadores'][jogador['nome']]
+        jogador.update({
+            'vitorias': jogador_ref['vitorias'],
+            'saldo_a_favor': jogador_ref['saldo_a_favor'],
+            'saldo_contra': jogador_ref['saldo_contra'],
+            'saldo_total': jogador_ref['saldo_a_favor'] - jogador_ref['saldo_contra']
+        })
 
-        # Primeiro commit para salvar as alterações nos confrontos
-        db.session.commit()
+    valores = session.get('valores_salvos', {})
+    confrontos = session['confrontos'][grupo_idx]
+    resultados = []
+    for confronto_idx, confronto in enumerate(confrontos):
+        placar = placar_na_sessao(valores, f"grupo_{grupo_idx}_confronto_{confronto_idx}")
+        if placar is not None:
+            resultados.append((*duplas_do_confronto(confronto), *placar))
+    
+    # O primeiro confronto guarda a ordem do sorteio (gerar_confrontos)
+    ordem_sorteio = [jogador['nome'] for jogador in confrontos[0]] if confrontos else []
+    ordenar_grupo(session['grupos'][grupo_idx], resultados, ordem_sorteio)
+
+def publicar_grupos(torneio_id, grupos_indices):
+    """Envia placares e classificação dos grupos ao placar ao vivo"""
+    valores = session.get('valores_salvos', {})
+    grupos = []
+    for grupo_idx in grupos_indices:
+        grupos.append({
+            'grupo_idx': grupo_idx,
+            'confrontos': [
+                [valores.get(f'grupo_{grupo_idx}_confronto_{confronto_idx}_duplaA_favor', ''),
+                 valores.get(f'grupo_{grupo_idx}_confronto_{confronto_idx}_duplaB_favor', '')]
+                for confronto_idx in range(len(session['confrontos'][grupo_idx]))
+            ],
+            'classificacao': session['grupos'][grupo_idx]
+        })
+    EventosManager.publicar(torneio_id, 'grupo', {'grupos': grupos})
+
+def salvar_placares(grupos_indices):
+    """Grava os placares do formulário e refaz a classificação dos grupos
+
+    Retorna a lista de conflitos (confrontos não gravados porque outro
+    dispositivo os alterou). Levanta StaleDataError se outro dispositivo
+    gravar o mesmo confronto durante esta requisição.
+    """
+    grupos_indices = list(grupos_indices)
+    torneio_id = session.get('torneio_id')
+    if not torneio_id:
+        raise ValueError("ID do torneio não encontrado na sessão")
+    
+    # Jogadores e participações do torneio em duas consultas
+    jogadores_db, participacoes_db = carregar_jogadores_torneio(torneio_id)
+    
+    # Verificar jogadores no banco
+    nomes = [jogador['nome'] for grupo_idx in grupos_indices for jogador in session['grupos'][grupo_idx]]
+    with db.session.no_autoflush:
+        verificar_jogadores_sessao(torneio_id, nomes, jogadores_db)
+    
+    # Confrontos dos grupos em uma única consulta
+    confrontos_db = {
+        (c.grupo_idx, c.confronto_idx): c
+        for c in Confronto.query.filter(
+            Confronto.torneio_id == torneio_id,
+            Confronto.grupo_idx.in_(grupos_indices)
+        ).all()
+    }
+    
+    with db.session.no_autoflush:
+        alterados, conflitos = aplicar_placares(torneio_id, grupos_indices, confrontos_db)
+    
+    # UPDATE ... WHERE versao = <lida>: falha se outro dispositivo gravou o confronto agora
+    db.session.flush()
+    
+    # Classificação a partir dos confrontos gravados, não da cópia na sessão
+    recalcular_grupos(torneio_id, grupos_indices)
+    
+    # Só os grupos alterados aqui; os outros são gravados por quem os alterou
+    persistir_classificacao(sorted(alterados), jogadores_db, participacoes_db)
+    
+    # Um único commit para confrontos, estatísticas e posições
+    db.session.commit()
+    if alterados:
+        RatingManager.atualizar_torneio(torneio_id)
+    publicar_grupos(torneio_id, grupos_indices)
+    return conflitos
+
+def responder_salvamento(conflitos, descricao):
+    """Volta para a página dos grupos, avisando dos confrontos não gravados"""
+    if conflitos:
+        mensagem = (
+            f"{descricao}: alguns placares foram alterados em outro dispositivo e não foram "
+            f"sobrescritos ({'; '.join(conflitos)}). Confira os valores atuais e salve de novo."
+        )
+        session['erro_validacao'] = mensagem
+        resposta = responder_conflito(mensagem)
+        if resposta is not None:
+            return resposta
+    return redirect(url_for('main.novo_torneio'))
+
+def responder_gravacao_simultanea(descricao):
+    """Outro dispositivo gravou o mesmo confronto durante a requisição: nada foi gravado"""
+    db.session.rollback()
+    mensagem = (
+        f"{descricao}: outro dispositivo gravou o mesmo jogo ao mesmo tempo e nada foi salvo. "
+        f"Confira os placares e salve de novo."
+    )
+    current_app.logger.warning(mensagem)
+    session['erro_validacao'] = mensagem
+    resposta = responder_conflito(mensagem)
+    if resposta is not None:
+        return resposta
+    return redirect(url_for('main.novo_torneio'))
+
+@rota_do_torneio(bp, '/salvar_grupo/<int:grupo_idx>', methods=['POST'])
+@invalida_cache
+def salvar_grupo(grupo_idx):
+    """Função para salvar os resultados de apenas um grupo especifico"""
+    try:
+        log_action("group_save_start", 
+                  f"Salvando Grupo {grupo_idx + 1} - Dados: {dict(request.form)}") 
         
-        # Atualiza os jogadores no banco com os dados de posição
-        for i, jogador_dados in enumerate(session['grupos'][grupo_idx]):
-            nome = jogador_dados['nome']
-            posicao = i + 1  # Posição no grupo (1-based)
-            
-            # Buscar jogador no banco
-            jogador = Jogador.query.get(session['jogadores'][nome]['id'])
-            if jogador:
-                # Atualiza estatísticas e posição
-                jogador.vitorias = jogador_dados['vitorias']
-                jogador.saldo_a_favor = jogador_dados['saldo_a_favor']
-                jogador.saldo_contra = jogador_dados['saldo_contra']
-                jogador.saldo_total = jogador_dados['saldo_total']
-                jogador.posicao_grupo = posicao
-                jogador.grupo_idx = grupo_idx
-                
-                # Também atualizar na tabela de participação
-                if jogador.jogador_permanente_id:
-                    participacao = ParticipacaoTorneio.query.filter_by(
-                        jogador_permanente_id=jogador.jogador_permanente_id,
-                        torneio_id=torneio_id
-                    ).first()
-                    
-                    if participacao:
-                        participacao.vitorias = jogador_dados['vitorias']
-                        participacao.saldo_a_favor = jogador_dados['saldo_a_favor']
-                        participacao.saldo_contra = jogador_dados['saldo_contra']
-                        participacao.saldo_total = jogador_dados['saldo_total']
-                        participacao.posicao_grupo = posicao
-                        participacao.grupo_idx = grupo_idx
-                
-                # Commit individual para garantir a persistência
-                db.session.commit()
-            else:
-                current_app.logger.warning(f"Jogador não encontrado para atualização: {nome}")
+        for key, value in request.form.items():
+            if key.endswith('_favor') and not value.isdigit() and value:
+                current_app.logger.warning(f"Valor inválido no campo {key}: {value}")
+        
+        conflitos = salvar_placares([grupo_idx])
         
         log_action("group_saved", 
                   f"Grupo {grupo_idx + 1} salvo - Resultados: {session['grupos'][grupo_idx]}")
         current_app.logger.info(f"✅ Grupo {grupo_idx + 1} salvo com sucesso no banco")
-        session.modified = True  # ⚠️ ADICIONAR ESTA LINHA
-        return redirect(url_for('main.novo_torneio'))
+        return responder_salvamento(conflitos, f"Grupo {grupo_idx + 1}")
+    
+    except StaleDataError:
+        return responder_gravacao_simultanea(f"Grupo {grupo_idx + 1}")
     
     except Exception as e:
         error_msg = f"Erro ao salvar Grupo {grupo_idx + 1}: {str(e)}"
@@ -557,198 +710,26 @@ def salvar_grupo(grupo_idx):
         db.session.rollback()
         return redirect(url_for('main.novo_torneio'))
 
-@bp.route('/salvar_todos_grupos', methods=['POST'])
+@rota_do_torneio(bp, '/salvar_todos_grupos', methods=['POST'])
+@invalida_cache
 def salvar_todos_grupos():
     """Função para salvar resultados parciais ou de todos os grupos"""
     try:
         log_action("all_groups_save_start", "Salvando todos os grupos")
         
-        # Inicializa valores salvos se necessário
-        session.setdefault('valores_salvos', {})
-
-        # Processa campos do formulário
         for key, value in request.form.items():
-            session['valores_salvos'][key] = value
-            if key.startswith('grupo_') and not value.isdigit() and value:
+            if key.endswith('_favor') and not value.isdigit() and value:
                 current_app.logger.warning(f"Valor inválido no campo {key}: {value}")
-
-        # Reset estatísticas para todos os jogadores
-        for nome, jogador in session['jogadores'].items():
-            jogador.update({
-                'vitorias': 0,
-                'saldo_a_favor': 0,
-                'saldo_contra': 0,
-                'saldo_total': 0
-            })
-        
-        # Verificar se os jogadores existem no banco antes de processar confrontos
-        torneio_id = session.get('torneio_id')
-        if not torneio_id:
-            raise ValueError("ID do torneio não encontrado na sessão")
-            
-        # Verificar jogadores no banco
-        jogadores_db = {}
-        for nome, jogador in session['jogadores'].items():
-            db_jogador = Jogador.query.get(jogador['id'])
-            if not db_jogador:
-                log_action("jogador_not_found", f"Jogador não encontrado no banco: {nome} (ID: {jogador['id']})")
-                # Tente recuperar por nome e torneio
-                db_jogador = Jogador.query.filter_by(nome=nome, torneio_id=torneio_id).first()
-                if db_jogador:
-                    # Atualizar ID na sessão
-                    jogador['id'] = db_jogador.id
-                    log_action("jogador_id_fixed", f"ID do jogador {nome} atualizado para {db_jogador.id}")
-                else:
-                    # Se ainda não encontrar, criar um novo
-                    # Primeiro encontrar ou criar o jogador permanente
-                    jogador_permanente = JogadorPermanente.query.filter_by(nome=nome).first()
-                    if not jogador_permanente:
-                        jogador_permanente = JogadorPermanente(nome=nome)
-                        db.session.add(jogador_permanente)
-                        db.session.flush()
-                    
-                    # Criar novo jogador
-                    novo_jogador = Jogador(
-                        nome=nome, 
-                        torneio_id=torneio_id,
-                        jogador_permanente_id=jogador_permanente.id
-                    )
-                    db.session.add(novo_jogador)
-                    db.session.flush()
-                    jogador['id'] = novo_jogador.id
-                    log_action("jogador_created", f"Novo jogador criado: {nome} (ID: {novo_jogador.id})")
-            
-            jogadores_db[nome] = db_jogador or Jogador.query.get(jogador['id'])
         
-        # Commit para garantir que todos os jogadores estejam no banco
-        db.session.commit()
+        num_grupos = len(session.get('grupos', []))
+        conflitos = salvar_placares(range(num_grupos))
         
-        with db.session.no_autoflush:  # Evita problemas de autoflush
-            # Processa cada grupo
-            for grupo_idx in range(len(session['grupos'])):
-                # Processa cada confronto do grupo
-                for confronto_idx, confronto in enumerate(session['confrontos'][grupo_idx]):
-                    campo_A = f"grupo_{grupo_idx}_confronto_{confronto_idx}_duplaA_favor"
-                    campo_B = f"grupo_{grupo_idx}_confronto_{confronto_idx}_duplaB_favor"
-
-                    try:
-                        saldoA = int(session['valores_salvos'].get(campo_A, 0)) if session['valores_salvos'].get(campo_A, '') else 0
-                        saldoB = int(session['valores_salvos'].get(campo_B, 0)) if session['valores_salvos'].get(campo_B, '') else 0
-                        
-                        # Atualiza estatísticas para cada jogador
-                        jogadores = {
-                            'A': [session['jogadores'][confronto[0]['nome']], 
-                                  session['jogadores'][confronto[1]['nome']]],
-                            'B': [session['jogadores'][confronto[2]['nome']], 
-                                  session['jogadores'][confronto[3]['nome']]]
-                        }
-
-                        for jogador in jogadores['A']:
-                            jogador['saldo_a_favor'] += saldoA
-                            jogador['saldo_contra'] += saldoB
-                            if saldoA > saldoB:
-                                jogador['vitorias'] += 1
-
-                        for jogador in jogadores['B']:
-                            jogador['saldo_a_favor'] += saldoB
-                            jogador['saldo_contra'] += saldoA
-                            if saldoB > saldoA:
-                                jogador['vitorias'] += 1
-
-                        # Atualiza o confronto no banco de dados
-                        # Verificar se existe e atualizar ou criar
-                        confronto_db = Confronto.query.filter_by(
-                            torneio_id=torneio_id, 
-                            grupo_idx=grupo_idx, 
-                            confronto_idx=confronto_idx
-                        ).first()
-                        
-                        if confronto_db:
-                            # Se o confronto já existe, apenas atualize os resultados
-                            confronto_db.pontos_dupla_a = saldoA
-                            confronto_db.pontos_dupla_b = saldoB
-                            log_action("confronto_updated", 
-                                      f"Confronto DB atualizado: G{grupo_idx+1}-C{confronto_idx+1} - "
-                                      f"Placar: {saldoA} x {saldoB}")
-                        else:
-                            # Se o confronto não existe, crie-o
-                            novo_confronto = Confronto(
-                                torneio_id=torneio_id,
-                                grupo_idx=grupo_idx,
-                                confronto_idx=confronto_idx,
-                                jogador_a1_id=session['jogadores'][confronto[0]['nome']]['id'],
-                                jogador_a2_id=session['jogadores'][confronto[1]['nome']]['id'],
-                                jogador_b1_id=session['jogadores'][confronto[2]['nome']]['id'],
-                                jogador_b2_id=session['jogadores'][confronto[3]['nome']]['id'],
-                                pontos_dupla_a=saldoA,
-                                pontos_dupla_b=saldoB
-                            )
-                            db.session.add(novo_confronto)
-                            log_action("confronto_created_late", 
-                                      f"Confronto DB criado: G{grupo_idx+1}-C{confronto_idx+1}")
-                    
-                    except (KeyError, ValueError) as e:
-                        current_app.logger.error(f"Erro processando confronto {confronto_idx} do grupo {grupo_idx}: {str(e)}")
-                        continue  # Continue processando outros confrontos mesmo se um falhar
-                
-                # Atualiza e classifica o grupo
-                for jogador in session['grupos'][grupo_idx]:
-                    jogador_ref = session['jogadores'][jogador['nome']]
-                    jogador.update({
-                        'vitorias': jogador_ref['vitorias'],
-                        'saldo_a_favor': jogador_ref['saldo_a_favor'],
-                        'saldo_contra': jogador_ref['saldo_contra'],
-                        'saldo_total': jogador_ref['saldo_a_favor'] - jogador_ref['saldo_contra']
-                    })
-
-                # Classifica o grupo
-                session['grupos'][grupo_idx].sort(key=lambda x: (-x['vitorias'], -x['saldo_total']))
-        
-        session.modified = True
-
-        # Commit para salvar as alterações nos confrontos
-        db.session.commit()
-        
-        # Atualiza os jogadores no banco com os dados de posição
-        for grupo_idx in range(len(session['grupos'])):
-            for i, jogador_dados in enumerate(session['grupos'][grupo_idx]):
-                nome = jogador_dados['nome']
-                posicao = i + 1  # Posição no grupo (1-based)
-                
-                # Buscar jogador no banco
-                jogador = Jogador.query.get(session['jogadores'][nome]['id'])
-                if jogador:
-                    # Atualiza estatísticas e posição
-                    jogador.vitorias = jogador_dados['vitorias']
-                    jogador.saldo_a_favor = jogador_dados['saldo_a_favor']
-                    jogador.saldo_contra = jogador_dados['saldo_contra']
-                    jogador.saldo_total = jogador_dados['saldo_total']
-                    jogador.posicao_grupo = posicao
-                    jogador.grupo_idx = grupo_idx
-                    
-                    # Atualizar também na tabela de participação
-                    participacao = ParticipacaoTorneio.query.filter_by(
-                        jogador_permanente_id=jogador.jogador_permanente_id,
-                        torneio_id=torneio_id
-                    ).first()
-                    
-                    if participacao:
-                        participacao.vitorias = jogador_dados['vitorias']
-                        participacao.saldo_a_favor = jogador_dados['saldo_a_favor']
-                        participacao.saldo_contra = jogador_dados['saldo_contra']
-                        participacao.saldo_total = jogador_dados['saldo_total']
-                        participacao.posicao_grupo = posicao
-                        participacao.grupo_idx = grupo_idx                  
-                else:
-                    log_action("jogador_not_found_for_update", 
-                              f"Jogador não encontrado para atualização: {nome}")
-        
-        # Commit final
-        db.session.commit()
-        log_action("all_groups_saved", f"Todos os {len(session['grupos'])} grupos salvos com sucesso")
-        current_app.logger.info(f"✅ Todos os {len(session['grupos'])} grupos salvos no banco")
-        session.modified = True  # ⚠️ ADICIONAR ESTA LINHA
-        return redirect(url_for('main.novo_torneio'))
+        log_action("all_groups_saved", f"Todos os {num_grupos} grupos salvos com sucesso")
+        current_app.logger.info(f"✅ Todos os {num_grupos} grupos salvos no banco")
+        return responder_salvamento(conflitos, "Salvar jogos")
+    
+    except StaleDataError:
+        return responder_gravacao_simultanea("Salvar jogos")
     
     except Exception as e:
         error_msg = f"Erro ao salvar todos os grupos: {str(e)}"
@@ -797,7 +778,7 @@ def carregar_torneio(torneio_id):
         torneio = Torneio.query.get_or_404(torneio_id)
         
         # Recupera os jogadores do torneio
-        jogadores = Jogador.query.filter_by(torneio_id=torneio_id).all()
+        jogadores = list(ElencoTorneio.carregar(torneio_id))
         
         # Recupera os confrontos do torneio
         confrontos_db = obter_confrontos_db(torneio_id)
@@ -827,7 +808,8 @@ def carregar_torneio(torneio_id):
         session['erro_validacao'] = error_msg
         return redirect(url_for('main.home'))
     
-@bp.route('/trocar_jogador', methods=['POST'])
+@rota_do_torneio(bp, '/trocar_jogador', methods=['POST'])
+@invalida_cache
 def trocar_jogador():
     """Função para trocar um jogador com outro jogador de outro grupo aleatório"""
     try:
@@ -854,8 +836,9 @@ def trocar_jogador():
                 'error': 'É necessário ter pelo menos 2 grupos para fazer a troca'
             }), 400
         
-        # Verificar se o jogador existe
-        jogador = Jogador.query.get(jogador_id)
+        # Verificar se o jogador existe no torneio
+        elenco = ElencoTorneio.carregar(torneio_id)
+        jogador = elenco.jogador(jogador_id)
         if not jogador:
             log_action("player_swap_error", f"Jogador ID {jogador_id} não encontrado")
             return jsonify({'success': False, 'error': 'Jogador não encontrado'}), 400
@@ -909,7 +892,7 @@ def trocar_jogador():
         jogador_destino_id = jogador_destino_sessao['id']
         
         # Verificar se o jogador de destino existe no banco
-        jogador_destino = Jogador.query.get(jogador_destino_id)
+        jogador_destino = elenco.jogador(jogador_destino_id)
         if not jogador_destino:
             log_action("player_swap_error", f"Jogador destino ID {jogador_destino_id} não encontrado")
             return jsonify({'success': False, 'error': 'Jogador destino não encontrado'}), 400
@@ -976,6 +959,8 @@ def trocar_jogador():
         # Salvar alterações no banco
         db.session.commit()
         session.modified = True
+        RatingManager.atualizar_torneio(torneio_id)
+        EventosManager.publicar(torneio_id, 'recarregar', {'motivo': 'troca'})
         
         log_action("player_swap_success", 
                   f"Troca concluída: Jogador {jogador.nome} movido para grupo {grupo_destino_idx}, "
@@ -994,7 +979,21 @@ def trocar_jogador():
         current_app.logger.error(error_msg, exc_info=True)
         return jsonify({'success': False, 'error': error_msg}), 500
     
-@bp.route('/buscar_jogadores_disponiveis', methods=['GET'])
+@rota_do_torneio(bp, '/chances_classificacao', methods=['GET'])
+def chances_classificacao():
+    """Chances de cada jogador se classificar, simuladas a partir dos placares gravados"""
+    try:
+        torneio_id = session.get('torneio_id')
+        chances = SimuladorClassificacao.obter(torneio_id) if torneio_id else None
+        if chances is None:
+            return jsonify({'success': False, 'error': 'Grupos do torneio incompletos'}), 404
+        return jsonify(dict(chances, success=True))
+    
+    except Exception as e:
+        current_app.logger.error(f"Erro ao simular a classificação: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@rota_do_torneio(bp, '/buscar_jogadores_disponiveis', methods=['GET'])
 def buscar_jogadores_disponiveis():
     """Endpoint para buscar jogadores que não estão no torneio atual"""
     try:
@@ -1007,25 +1006,24 @@ def buscar_jogadores_disponiveis():
             return jsonify([])
         
         # Obter IDs dos jogadores que já estão no torneio atual
-        jogadores_torneio = Jogador.query.filter_by(torneio_id=torneio_id).all()
-        jogadores_permanentes_ids = [j.jogador_permanente_id for j in jogadores_torneio if j.jogador_permanente_id]
-        
-        # Buscar jogadores permanentes que contenham o termo e não estão no torneio atual
-        jogadores = JogadorPermanente.query.filter(
-            JogadorPermanente.nome.ilike(f'%{termo}%'),
-            ~JogadorPermanente.id.in_(jogadores_permanentes_ids) if jogadores_permanentes_ids else True
-        ).order_by(JogadorPermanente.nome).limit(10).all()
+        jogadores_permanentes_ids = {
+            jogador_id for (jogador_id,) in db.session.query(Jogador.jogador_permanente_id).filter(
+                Jogador.torneio_id == torneio_id,
+                Jogador.jogador_permanente_id.isnot(None)
+            )
+        }
         
-        # Formatando resultado
-        resultados = [{'id': j.id, 'nome': j.nome} for j in jogadores]
+        # Buscar no índice em memória os que não estão no torneio atual
+        resultados = BuscaJogadores.buscar(termo, limite=10, excluir=jogadores_permanentes_ids)
         
-        return jsonify(resultados)
+        return responder_busca(resultados, privada=True)
     
     except Exception as e:
         current_app.logger.error(f"Erro ao buscar jogadores disponíveis: {str(e)}", exc_info=True)
         return jsonify([])
 
-@bp.route('/substituir_jogador', methods=['POST'])
+@rota_do_torneio(bp, '/substituir_jogador', methods=['POST'])
+@invalida_cache
 def substituir_jogador():
     """Função para substituir um jogador por outro jogador"""
     try:
@@ -1046,8 +1044,9 @@ def substituir_jogador():
                   f"Jogador ID: {jogador_id}, Grupo: {grupo_atual}, " 
                   f"Usando jogador existente: {jogador_existente}")
         
-        # Verificar se o jogador a ser substituído existe
-        jogador = Jogador.query.get(jogador_id)
+        # Verificar se o jogador a ser substituído existe no torneio
+        elenco = ElencoTorneio.carregar(torneio_id)
+        jogador = elenco.jogador(jogador_id)
         if not jogador:
             log_action("player_substitution_error", f"Jogador ID {jogador_id} não encontrado")
             return jsonify({'success': False, 'error': 'Jogador não encontrado'}), 400
@@ -1101,10 +1100,9 @@ def substituir_jogador():
                           f"Criado novo jogador permanente: {novo_jogador_nome} (ID: {jogador_permanente_novo.id})")
         
         # Verificar se o jogador já está no torneio
-        jogador_ja_no_torneio = Jogador.query.filter_by(
-            torneio_id=torneio_id,
-            jogador_permanente_id=jogador_permanente_novo.id
-        ).first()
+        jogador_ja_no_torneio = any(
+            j.jogador_permanente_id == jogador_permanente_novo.id for j in elenco
+        )
         
         if jogador_ja_no_torneio:
             log_action("player_substitution_error", f"Jogador {jogador_permanente_novo.nome} já está no torneio")
@@ -1115,8 +1113,10 @@ def substituir_jogador():
         
         # Atualizar o jogador no banco de dados
         nome_antigo = jogador.nome
+        jogador_permanente_antigo_id = jogador.jogador_permanente_id
         jogador.nome = jogador_permanente_novo.nome
         jogador.jogador_permanente_id = jogador_permanente_novo.id
+        ElencoTorneio.descartar(torneio_id)
         
         # Criar ou atualizar a participação no torneio
         participacao = ParticipacaoTorneio.query.filter_by(
@@ -1174,6 +1174,14 @@ def substituir_jogador():
         db.session.commit()
         session.modified = True
         
+        # Atualizar o ranking dos dois jogadores envolvidos
+        RankingManager.atualizar_ranking_jogadores(
+            [jogador_permanente_antigo_id, jogador_permanente_novo.id]
+        )
+        RatingManager.atualizar_torneio(torneio_id)
+        BuscaJogadores.invalidar()
+        EventosManager.publicar(torneio_id, 'recarregar', {'motivo': 'substituicao'})
+        
         log_action("player_substitution_success", 
                   f"Substituição concluída: Jogador {nome_antigo} substituído por {jogador_permanente_novo.nome}")
         
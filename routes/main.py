@@ -1,9 +1,23 @@
 """Funções para as principais rotas"""
 from datetime import datetime
 from flask import Blueprint, render_template, session, current_app, redirect, url_for, request, jsonify
-from database.models import Torneio, Jogador, Confronto, ConfrontoEliminatoria, JogadorPermanente, ParticipacaoTorneio
+from sqlalchemy import delete
+from database.models import Torneio, Jogador, Confronto, ConfrontoEliminatoria, JogadorPermanente, JogadorArquivado
 from database.ranking import RankingManager
+from database.rating import RatingManager
+from database.historico import HistoricoManager
+from database.perfil import PerfilManager
+from database.snapshot import SnapshotManager
+from database.elenco import ElencoTorneio
+from database.busca import BuscaJogadores, responder_busca
+from database.estado import descartar_estado_torneio
+from database.cache import CacheRespostas, invalida_cache
+from database.replica import somente_leitura
+from database.chave import MODOS, descrever_modo, grupos_do_modo, modo_por_jogadores
+from database.classificacao import estatisticas_zeradas, ordenar_grupo, trocar_placar
 from database.db import db
+from routes.groups import recalcular_grupos
+from routes.escopo import rota_do_torneio, sair_do_torneio, torneio_da_sessao, torneios_em_andamento
 
 bp = Blueprint('main', __name__)
 
@@ -26,109 +40,43 @@ def inject_enumerate():
     return dict(enumerate=enumerate)
 
 @bp.route('/')
+@somente_leitura
 def home():
     """Função para a home page"""    
     log_route_access('home')
     
-    # Buscar todos os torneios, ordenados pelo mais recente
-    torneios = Torneio.query.order_by(Torneio.data_criacao.desc()).all()
-    
-    torneio_em_andamento_db = Torneio.query.filter_by(finalizado=False).first()
-    torneio_em_andamento = torneio_em_andamento_db is not None
-    modo_torneio_dict = {}
-    
-    # Define um mapeamento para o número de jogadores
-    modos_descricao = {
-        '16j': '16 Jogadores',
-        '20j': '20 Jogadores',
-        '24j': '24 Jogadores',
-        '28j': '28 Jogadores',
-        '32j': '32 Jogadores'
-    }
-    
-    # Verificar se a sessão está sincronizada com o banco
-    torneio_id_sessao = session.get('torneio_id')
-    
-    if torneio_em_andamento_db:
-        # Se existe torneio em andamento no banco, garantir que está na sessão
-        if torneio_id_sessao != torneio_em_andamento_db.id:
-            current_app.logger.info(
-                f"Sincronizando sessão com torneio em andamento: {torneio_em_andamento_db.id}"
-            )
-            # Limpar sessão antiga se houver
-            for key in ['torneio_id', 'grupos', 'confrontos', 'jogadores', 'valores_salvos', 'nome_torneio']:
-                session.pop(key, None)
-    else:
-        # Se não há torneio em andamento no banco mas há ID na sessão, limpar
-        if torneio_id_sessao:
-            current_app.logger.warning(
-                f"Torneio ID {torneio_id_sessao} não encontrado ou já finalizado. Limpando sessão."
-            )
-            for key in ['torneio_id', 'grupos', 'confrontos', 'jogadores', 'valores_salvos', 'nome_torneio']:
-                session.pop(key, None)
-    
-    # Para cada torneio, recuperar campeões e vice-campeões e modo do torneio
-    for torneio in torneios:
-
-        # Contar jogadores para determinar o modo
-        jogadores_count = Jogador.query.filter_by(torneio_id=torneio.id).count()
-        
-        if jogadores_count <= 16:
-            modo_torneio_dict[torneio.id] = modos_descricao['16j']
-        elif jogadores_count <= 20:
-            modo_torneio_dict[torneio.id] = modos_descricao['20j']
-        elif jogadores_count <= 24:
-            modo_torneio_dict[torneio.id] = modos_descricao['24j']
-        elif jogadores_count <= 28:
-            modo_torneio_dict[torneio.id] = modos_descricao['28j']
-        else:
-            modo_torneio_dict[torneio.id] = modos_descricao['32j']
-
-        if torneio.finalizado:
-            # Buscar confronto da final
-            final = ConfrontoEliminatoria.query.filter_by(
-                torneio_id=torneio.id,
-                fase='final'
-            ).first()
-            
-            if final:
-                # Determinar campeões e vice-campeões
-                jogador_a1 = Jogador.query.get(final.jogador_a1_id)
-                jogador_a2 = Jogador.query.get(final.jogador_a2_id)
-                jogador_b1 = Jogador.query.get(final.jogador_b1_id)
-                jogador_b2 = Jogador.query.get(final.jogador_b2_id)
-                
-                # Determinar quem é o campeão e quem é o vice
-                if final.pontos_dupla_a > final.pontos_dupla_b:
-                    torneio.campeoes = [jogador_a1.nome, jogador_a2.nome]
-                    torneio.vice_campeoes = [jogador_b1.nome, jogador_b2.nome]
-                else:
-                    torneio.campeoes = [jogador_b1.nome, jogador_b2.nome]
-                    torneio.vice_campeoes = [jogador_a1.nome, jogador_a2.nome]
-            else:
-                torneio.campeoes = None
-                torneio.vice_campeoes = None
-        else:
-            torneio.campeoes = None
-            torneio.vice_campeoes = None
+    pagina = request.args.get('pagina', 1, type=int)
     
-    # Obter o ranking de jogadores
-    ranking_jogadores = RankingManager.obter_ranking()
+    # Torneios em andamento (pode haver vários, um por quadra)
+    em_andamento = [{'id': torneio.id, 'nome': torneio.nome} for torneio in torneios_em_andamento()]
     
-    # Limitar para os top 10 jogadores, se necessário
-    ranking_jogadores = ranking_jogadores[:10] if len(ranking_jogadores) > 10 else ranking_jogadores
+    # Fechar na sessão um torneio que já foi finalizado ou apagado
+    torneio_da_sessao()
     
     # Mensagens de sucesso ou erro
     erro_validacao = session.pop('erro_validacao', None)
     sucesso_validacao = session.pop('sucesso_validacao', None)
     
-    return render_template('home.html', 
-                          torneios=torneios,
-                          ranking_jogadores=ranking_jogadores,
-                          erro_validacao=erro_validacao,
-                          sucesso_validacao=sucesso_validacao,
-                          torneio_em_andamento=torneio_em_andamento,
-                          modo_torneio_dict=modo_torneio_dict)
+    def renderizar():
+        # Página do histórico de torneios
+        por_pagina = current_app.config.get('HISTORICO_POR_PAGINA', 20)
+        historico = HistoricoManager.obter_historico(pagina, por_pagina)
+        
+        # Obter os top 10 jogadores do ranking
+        ranking_jogadores = RankingManager.obter_ranking(limite=10)
+        
+        return render_template('home.html', 
+                              torneios=historico['torneios'],
+                              paginacao=historico,
+                              ranking_jogadores=ranking_jogadores,
+                              erro_validacao=erro_validacao,
+                              sucesso_validacao=sucesso_validacao,
+                              torneios_em_andamento=em_andamento)
+    
+    # Páginas com mensagens são únicas do usuário e não vão para o cache
+    if erro_validacao or sucesso_validacao:
+        return renderizar()
+    return CacheRespostas.responder(f'home:{pagina}', renderizar)
 
 def carregar_torneio_na_sessao(torneio_id):
     """Carrega torneio do banco e popula a sessão"""
@@ -140,62 +88,22 @@ def carregar_torneio_na_sessao(torneio_id):
             current_app.logger.error(f"❌ Torneio {torneio_id} não encontrado")
             return False
         
-        # Buscar jogadores
-        jogadores = Jogador.query.filter_by(torneio_id=torneio_id).all()
+        # Buscar jogadores (uma consulta para todo o torneio)
+        elenco = ElencoTorneio.carregar(torneio_id)
+        jogadores = list(elenco)
         current_app.logger.info(f"📊 Encontrados {len(jogadores)} jogadores")
         
         # Determinar modo
-        num_jogadores = len(jogadores)
-        if num_jogadores <= 16:
-            modo, num_grupos = '16j', 4
-        elif num_jogadores <= 20:
-            modo, num_grupos = '20j', 5
-        elif num_jogadores <= 24:
-            modo, num_grupos = '24j', 6
-        elif num_jogadores <= 28:
-            modo, num_grupos = '28j', 7
-        else:
-            modo, num_grupos = '32j', 8
-        
-        # Organizar jogadores por grupo
-        jogadores_por_grupo = {}
-        for jogador in jogadores:
-            grupo_idx = jogador.grupo_idx
-            if grupo_idx not in jogadores_por_grupo:
-                jogadores_por_grupo[grupo_idx] = []
-            
-            jogadores_por_grupo[grupo_idx].append({
-                'nome': jogador.nome,
-                'id': jogador.id,
-                'vitorias': jogador.vitorias,
-                'saldo_a_favor': jogador.saldo_a_favor,
-                'saldo_contra': jogador.saldo_contra,
-                'saldo_total': jogador.saldo_total
-            })
-        
-        current_app.logger.info(f"👥 Grupos organizados: {len(jogadores_por_grupo)} grupos")
-        
-        # Ordenar jogadores
-        for grupo_idx in jogadores_por_grupo:
-            jogadores_por_grupo[grupo_idx].sort(
-                key=lambda x: (-x['vitorias'], -x['saldo_total'])
-            )
-        
-        # Criar estrutura de grupos
-        grupos = []
-        for grupo_idx in sorted(jogadores_por_grupo.keys()):
-            grupos.append(jogadores_por_grupo[grupo_idx])
+        modo = modo_por_jogadores(len(jogadores))
+        num_grupos = grupos_do_modo(modo)
         
-        # Criar dicionário de jogadores
+        # Criar dicionário de jogadores (estatísticas refeitas a partir dos placares abaixo)
         jogadores_dict = {}
         for jogador in jogadores:
             jogadores_dict[jogador.nome] = {
                 'nome': jogador.nome,
                 'id': jogador.id,
-                'vitorias': jogador.vitorias,
-                'saldo_a_favor': jogador.saldo_a_favor,
-                'saldo_contra': jogador.saldo_contra,
-                'saldo_total': jogador.saldo_total
+                **estatisticas_zeradas()
             }
         
         # Buscar e organizar confrontos
@@ -206,6 +114,7 @@ def carregar_torneio_na_sessao(torneio_id):
         current_app.logger.info(f"⚔️ Encontrados {len(confrontos_db)} confrontos")
         
         confrontos = [[] for _ in range(num_grupos)]
+        resultados = [[] for _ in range(num_grupos)]
         valores_salvos = {}
         resultados_carregados = 0
         
@@ -213,10 +122,10 @@ def carregar_torneio_na_sessao(torneio_id):
             grupo_idx = confronto.grupo_idx
             confronto_idx = confronto.confronto_idx
             
-            jogador_a1 = Jogador.query.get(confronto.jogador_a1_id)
-            jogador_a2 = Jogador.query.get(confronto.jogador_a2_id)
-            jogador_b1 = Jogador.query.get(confronto.jogador_b1_id)
-            jogador_b2 = Jogador.query.get(confronto.jogador_b2_id)
+            jogador_a1 = elenco.jogador(confronto.jogador_a1_id)
+            jogador_a2 = elenco.jogador(confronto.jogador_a2_id)
+            jogador_b1 = elenco.jogador(confronto.jogador_b1_id)
+            jogador_b2 = elenco.jogador(confronto.jogador_b2_id)
             
             if all([jogador_a1, jogador_a2, jogador_b1, jogador_b2]):
                 confrontos[grupo_idx].append((
@@ -235,6 +144,25 @@ def carregar_torneio_na_sessao(torneio_id):
                     campo_b = f"grupo_{grupo_idx}_confronto_{confronto_idx}_duplaB_favor"
                     valores_salvos[campo_b] = str(confronto.pontos_dupla_b)
                     resultados_carregados += 1
+                
+                if confronto.pontos_dupla_a is not None and confronto.pontos_dupla_b is not None:
+                    duplas = ((jogador_a1.nome, jogador_a2.nome), (jogador_b1.nome, jogador_b2.nome))
+                    placar = (confronto.pontos_dupla_a, confronto.pontos_dupla_b)
+                    trocar_placar(jogadores_dict, *duplas, None, placar)
+                    resultados[grupo_idx].append((*duplas, *placar))
+        
+        # Organizar jogadores por grupo
+        jogadores_por_grupo = {}
+        for jogador in jogadores:
+            jogadores_por_grupo.setdefault(jogador.grupo_idx, []).append(dict(jogadores_dict[jogador.nome]))
+        
+        current_app.logger.info(f"👥 Grupos organizados: {len(jogadores_por_grupo)} grupos")
+        
+        # Ordenar jogadores pela cadeia de desempate (o primeiro confronto guarda a ordem do sorteio)
+        grupos = []
+        for grupo_idx in sorted(jogadores_por_grupo.keys()):
+            ordem_sorteio = [j['nome'] for j in confrontos[grupo_idx][0]] if confrontos[grupo_idx] else []
+            grupos.append(ordenar_grupo(jogadores_por_grupo[grupo_idx], resultados[grupo_idx], ordem_sorteio))
         
         current_app.logger.info(f"📝 {resultados_carregados} resultados carregados")
         
@@ -243,6 +171,7 @@ def carregar_torneio_na_sessao(torneio_id):
         session['nome_torneio'] = torneio.nome
         session['modo_torneio'] = modo
         session['formato_eliminatoria'] = torneio.formato_eliminatoria or 'separados'
+        session['disputa_terceiro_lugar'] = bool(torneio.disputa_terceiro_lugar)
         session['jogadores'] = jogadores_dict
         session['grupos'] = grupos
         session['confrontos'] = confrontos
@@ -262,18 +191,21 @@ def carregar_torneio_na_sessao(torneio_id):
         current_app.logger.error(f"❌ Erro ao carregar torneio {torneio_id}: {str(e)}", exc_info=True)
         return False
 
-@bp.route('/novo-torneio')
+@rota_do_torneio(bp, '/novo-torneio')
 def novo_torneio():
     """Função para criar um novo torneio"""
     try:
-        # Inicialização de sessão
-        session.setdefault('valores_salvos', {})
-        modos_validos = ['16j','20j', '24j', '28j', '32j']
+        # "Novo Torneio" na home: fechar o torneio aberto neste navegador (ele continua em andamento)
+        if request.args.get('novo'):
+            sair_do_torneio()
+
+        modos_validos = MODOS
         modo_atual = session.get('modo_torneio', '28j')
         
-        torneio_em_andamento_db = Torneio.query.filter_by(finalizado=False).first()
+        torneio_em_andamento_db = torneio_da_sessao()
         torneio_em_andamento = torneio_em_andamento_db is not None
         nome_torneio = ""
+        versoes = {}
 
         # NOVO: Detectar se há fase eliminatória em andamento
         fase_eliminatoria_existe = False
@@ -284,35 +216,21 @@ def novo_torneio():
             fase_eliminatoria_existe = confrontos_elim is not None
         
         if torneio_em_andamento_db:
-            # Se existe torneio em andamento, carregar seus dados
+            # Torneio aberto neste navegador: garantir que o estado dele está carregado
             torneio_id = torneio_em_andamento_db.id
             nome_torneio = torneio_em_andamento_db.nome
             
-            # Sincronizar sessão com o torneio do banco
-            torneio_id_sessao = session.get('torneio_id')
-            
-            if torneio_id_sessao != torneio_id:
-                current_app.logger.info(f"🔄 Sessão desatualizada. Sessão: {torneio_id_sessao}, Banco: {torneio_id}")
-                sucesso = carregar_torneio_na_sessao(torneio_id)
-                if sucesso:
-                    current_app.logger.info(f"✅ Torneio {torneio_id} sincronizado com sucesso")
-                else:
-                    current_app.logger.error(f"❌ Falha ao sincronizar torneio {torneio_id}")
-            elif not session.get('grupos'):
-                # Se tem torneio mas não tem grupos, carregar
+            if not session.get('grupos'):
                 current_app.logger.info(f"🔄 Torneio {torneio_id} na sessão mas grupos vazios. Recarregando...")
                 carregar_torneio_na_sessao(torneio_id)
-            else:
-                current_app.logger.info(f"✅ Sessão já sincronizada com torneio {torneio_id}")
-        else:
-            # Se não há torneio em andamento no banco mas há ID na sessão, limpar
-            torneio_id_sessao = session.get('torneio_id')
-            if torneio_id_sessao:
-                current_app.logger.warning(
-                    f"Torneio ID {torneio_id_sessao} não encontrado ou já finalizado. Limpando sessão."
-                )
-                for key in ['torneio_id', 'grupos', 'confrontos', 'jogadores', 'valores_salvos', 'nome_torneio']:
-                    session.pop(key, None)
+            
+            # Placares e versões do banco: outros dispositivos podem ter gravado desde o último acesso
+            if session.get('grupos'):
+                confrontos_db = recalcular_grupos(torneio_id, range(len(session['grupos'])))
+                versoes = {
+                    f"grupo_{grupo_idx}_confronto_{confronto_idx}": confronto.versao
+                    for (grupo_idx, confronto_idx), confronto in confrontos_db.items()
+                }
         
         # Validação do modo
         if modo_atual not in modos_validos:
@@ -338,17 +256,15 @@ def novo_torneio():
             grupos=session.get('grupos', []),
             confrontos=session.get('confrontos', []),
             valores_salvos=session.get('valores_salvos', {}),
+            versoes=versoes,
+            # Erros e conflitos ao salvar os grupos voltam para esta página
+            erro_validacao=session.pop('erro_validacao', None),
             modo_torneio=modo_atual,
             torneio_em_andamento=torneio_em_andamento,
             nome_torneio=nome_torneio,
             fase_eliminatoria_existe=fase_eliminatoria_existe,
-            modos_disponiveis=[
-                {'value': '16j', 'text': '16 Jogadores (4 grupos de 4)'},
-                {'value': '20j', 'text': '20 Jogadores (5 grupos de 4)'},
-                {'value': '24j', 'text': '24 Jogadores (6 grupos de 4)'},
-                {'value': '28j', 'text': '28 Jogadores (7 grupos de 4)'},
-                {'value': '32j', 'text': '32 Jogadores (8 grupos de 4)'}
-            ]
+            modos_disponiveis=[{'value': modo, 'text': descrever_modo(modo)} for modo in MODOS],
+            grupos_por_modo={modo: grupos_do_modo(modo) for modo in MODOS}
         )
 
     except Exception as e:
@@ -359,6 +275,7 @@ def novo_torneio():
         raise  # Re-lança a exceção para o handler do Flask
 
 @bp.route('/detalhes-torneio/<int:torneio_id>')
+@somente_leitura
 def detalhes_torneio(torneio_id):
     """Função para fazer os detalhes do torneio"""
     log_route_access(f'detalhes-torneio/{torneio_id}')
@@ -366,172 +283,44 @@ def detalhes_torneio(torneio_id):
     # Buscar o torneio pelo ID
     torneio = Torneio.query.get_or_404(torneio_id)
     
-    # Buscar todos os jogadores do torneio
-    jogadores = Jogador.query.filter_by(torneio_id=torneio_id).all()
-    
-    # Organizar jogadores por grupos
-    # Precisamos recuperar os confrontos para identificar os grupos
-    confrontos = Confronto.query.filter_by(torneio_id=torneio_id).all()
-    
-    # Dicionário para armazenar grupos e confrontos
-    grupos = {}
-    jogadores_por_grupo = {}
-    
-    # Primeiro, identificar quais jogadores pertencem a cada grupo
-    for confronto in confrontos:
-        grupo_idx = confronto.grupo_idx
-        
-        if grupo_idx not in jogadores_por_grupo:
-            jogadores_por_grupo[grupo_idx] = set()
-            grupos[grupo_idx] = {
-                'confrontos': [],
-                'jogadores_ordenados': []
-            }
-        
-        # Adicionar jogadores ao grupo
-        jogadores_ids = [
-            confronto.jogador_a1_id, 
-            confronto.jogador_a2_id, 
-            confronto.jogador_b1_id, 
-            confronto.jogador_b2_id
-        ]
+    def renderizar():
+        # Torneios finalizados vêm do snapshot, sem consultar os confrontos
+        detalhes = SnapshotManager.obter_detalhes(torneio)
         
-        for jogador_id in jogadores_ids:
-            jogadores_por_grupo[grupo_idx].add(jogador_id)
-        
-        # Adicionar o confronto ao grupo
-        grupos[grupo_idx]['confrontos'].append(confronto)
-    
-    # Mapear jogadores para facilitar a exibição
-    jogadores_map = {jogador.id: jogador for jogador in jogadores}
-    
-    # Para cada grupo, calcular manualmente as estatísticas dos jogadores
-    for grupo_idx, jogadores_ids in jogadores_por_grupo.items():
-        # Inicializar estatísticas para cada jogador
-        estatisticas = {jogador_id: {
-            'id': jogador_id,
-            'nome': jogadores_map[jogador_id].nome,
-            'vitorias': 0,
-            'saldo_a_favor': 0,
-            'saldo_contra': 0,
-            'saldo_total': 0,
-            'posicao_grupo': jogadores_map[jogador_id].posicao_grupo
-        } for jogador_id in jogadores_ids}
-        
-        # Processar todos os confrontos do grupo para calcular as estatísticas
-        for confronto in grupos[grupo_idx]['confrontos']:
-            # Só processa se o confronto tiver resultados
-            if confronto.pontos_dupla_a is not None and confronto.pontos_dupla_b is not None:
-                # Jogadores da dupla A
-                for jogador_id in [confronto.jogador_a1_id, confronto.jogador_a2_id]:
-                    estatisticas[jogador_id]['saldo_a_favor'] += confronto.pontos_dupla_a
-                    estatisticas[jogador_id]['saldo_contra'] += confronto.pontos_dupla_b
-                    if confronto.pontos_dupla_a > confronto.pontos_dupla_b:
-                        estatisticas[jogador_id]['vitorias'] += 1
-                
-                # Jogadores da dupla B
-                for jogador_id in [confronto.jogador_b1_id, confronto.jogador_b2_id]:
-                    estatisticas[jogador_id]['saldo_a_favor'] += confronto.pontos_dupla_b
-                    estatisticas[jogador_id]['saldo_contra'] += confronto.pontos_dupla_a
-                    if confronto.pontos_dupla_b > confronto.pontos_dupla_a:
-                        estatisticas[jogador_id]['vitorias'] += 1
-        
-        # Calcular saldo total
-        for jogador_id in estatisticas:
-            estatisticas[jogador_id]['saldo_total'] = estatisticas[jogador_id]['saldo_a_favor'] - estatisticas[jogador_id]['saldo_contra']
-        
-        # Converter para lista e ordenar
-        jogadores_stats = list(estatisticas.values())
-        
-        # Tentar usar a posição salva ou ordenar pelas estatísticas calculadas
-        if all(j['posicao_grupo'] > 0 for j in jogadores_stats):
-            # Se todos os jogadores têm posição definida, usar isso
-            jogadores_stats.sort(key=lambda x: x['posicao_grupo'])
-        else:
-            # Senão, ordenar por vitórias e saldo total
-            jogadores_stats.sort(key=lambda x: (-x['vitorias'], -x['saldo_total']))
-        
-        grupos[grupo_idx]['jogadores_ordenados'] = jogadores_stats
-    
-    # Buscar confrontos da fase eliminatória
-    confrontos_eliminatorias = ConfrontoEliminatoria.query.filter_by(torneio_id=torneio_id).all()
-    
-    # Organizar os confrontos por fase
-    fases_eliminatorias = {
-        'quartas': [],
-        'semi': [],
-        'final': None
-    }
-    
-    for confronto in confrontos_eliminatorias:
-        if confronto.fase == 'final':
-            fases_eliminatorias['final'] = confronto
-        else:
-            fases_eliminatorias[confronto.fase].append(confronto)
-    
-    # Determinar campeões e vice-campeões
-    final = fases_eliminatorias['final']
-    campeoes = None
-    vice_campeoes = None
-    placar_final = None
-    
-    if final:
-        jogador_a1 = Jogador.query.get(final.jogador_a1_id)
-        jogador_a2 = Jogador.query.get(final.jogador_a2_id)
-        jogador_b1 = Jogador.query.get(final.jogador_b1_id)
-        jogador_b2 = Jogador.query.get(final.jogador_b2_id)
-        
-        if final.pontos_dupla_a > final.pontos_dupla_b:
-            campeoes = [jogador_a1, jogador_a2]
-            vice_campeoes = [jogador_b1, jogador_b2]
-        else:
-            campeoes = [jogador_b1, jogador_b2]
-            vice_campeoes = [jogador_a1, jogador_a2]
-            
-        placar_final = f"{final.pontos_dupla_a}x{final.pontos_dupla_b}"
-    
-    # Calcular o modo do torneio baseado no número de grupos
-    modo_torneio = {
-        4: '16j',
-        5: '20j',
-        6: '24j',
-        7: '28j',
-        8: '32j'
-    }.get(len(grupos), '28j')
+        return render_template(
+            'detalhes_torneio.html',
+            torneio=torneio,
+            grupos=detalhes['grupos'],
+            jogadores=detalhes['jogadores'],
+            oitavas=detalhes.get('oitavas', []),
+            quartas=detalhes['quartas'],
+            semis=detalhes['semis'],
+            final=detalhes['final'],
+            terceiro=detalhes.get('terceiro'),
+            campeoes=detalhes['campeoes'],
+            vice_campeoes=detalhes['vice_campeoes'],
+            placar_final=detalhes['placar_final'],
+            modo_torneio=detalhes['modo_torneio'],
+            torneio_em_andamento=not torneio.finalizado
+        )
     
-    return render_template(
-        'detalhes_torneio.html',
-        torneio=torneio,
-        grupos=grupos,
-        jogadores=jogadores_map,
-        quartas=fases_eliminatorias['quartas'],
-        semis=fases_eliminatorias['semi'],
-        final=fases_eliminatorias['final'],
-        campeoes=campeoes,
-        vice_campeoes=vice_campeoes,
-        placar_final=placar_final,
-        modo_torneio=modo_torneio,
-        torneio_em_andamento=not torneio.finalizado
-    )
+    return CacheRespostas.responder(f'detalhes-torneio:{torneio_id}', renderizar)
 
 @bp.route('/buscar_jogadores', methods=['GET'])
+@somente_leitura
 def buscar_jogadores():
     """Endpoint AJAX para buscar jogadores por nome"""
     termo = request.args.get('termo', '')
     if len(termo) < 2:
         return jsonify([])
     
-    # Buscar jogadores que contenham o termo pesquisado
-    jogadores = JogadorPermanente.query.filter(
-        JogadorPermanente.nome.ilike(f'%{termo}%')
-    ).order_by(JogadorPermanente.nome).limit(10).all()
+    # Índice em memória: sem acentos, prefixos primeiro
+    resultados = BuscaJogadores.buscar(termo, limite=10)
     
-    # Formatando resultado
-    resultados = [{'id': j.id, 'nome': j.nome} for j in jogadores]
-    
-    return jsonify(resultados)
+    return responder_busca(resultados)
 
 @bp.route('/perfil_jogador', methods=['GET'])
+@somente_leitura
 def perfil_jogador():
     """Função para fazer o perfil do jogador"""
     log_route_access('perfil_jogador')
@@ -545,121 +334,41 @@ def perfil_jogador():
             mensagem="Por favor, informe o nome do jogador para pesquisa."
         )
     
-    # Buscar o jogador permanente
-    jogador = JogadorPermanente.query.filter(JogadorPermanente.nome.ilike(f"%{nome_jogador}%")).first()
-    
-    if not jogador:
-        # Tentar encontrar jogadores similares para sugestão
-        jogadores_similares = JogadorPermanente.query.filter(
-            JogadorPermanente.nome.ilike(f"%{nome_jogador.split()[0] if ' ' in nome_jogador else nome_jogador}%")
-        ).limit(5).all()
+    def renderizar():
+        # Buscar o jogador permanente
+        jogador = JogadorPermanente.query.filter(JogadorPermanente.nome.ilike(f"%{nome_jogador}%")).first()
+        
+        if not jogador:
+            # Tentar encontrar jogadores similares para sugestão
+            jogadores_similares = JogadorPermanente.query.filter(
+                JogadorPermanente.nome.ilike(f"%{nome_jogador.split()[0] if ' ' in nome_jogador else nome_jogador}%")
+            ).limit(5).all()
+        
+            return render_template(
+                'jogador_nao_encontrado.html',
+                termo_pesquisa=nome_jogador,
+                jogadores_similares=jogadores_similares
+            )
+        
+        # Estatísticas agregadas em número fixo de consultas
+        estatisticas = PerfilManager.obter_estatisticas(jogador.id)
         
         return render_template(
-            'jogador_nao_encontrado.html',
-            termo_pesquisa=nome_jogador,
-            jogadores_similares=jogadores_similares
+            'perfil_jogador.html',
+            jogador=jogador,
+            participacoes=estatisticas['participacoes'],
+            total_jogos=estatisticas['total_jogos'],
+            total_vitorias=estatisticas['total_vitorias'],
+            total_pontos=estatisticas['total_pontos'],
+            posicao_ranking=estatisticas['posicao_ranking'],
+            rating=estatisticas['rating'],
+            desvio_rating=estatisticas['desvio_rating']
         )
     
-    # Estatísticas gerais
-    total_jogos = 0
-    total_vitorias = 0
-    
-    # Obter o ranking completo
-    ranking = RankingManager.obter_ranking()
-    
-    # Encontrar a posição e pontuação do jogador no ranking
-    posicao_ranking = None
-    total_pontos = 0
-    for r in ranking:
-        if r['nome'] == jogador.nome:
-            posicao_ranking = r['posicao']
-            total_pontos = r['pontos']
-            break
-    
-    # Buscar todas as participações do jogador
-    participacoes = db.session.query(
-        ParticipacaoTorneio, Torneio, Jogador
-    ).join(
-        Torneio, ParticipacaoTorneio.torneio_id == Torneio.id
-    ).join(
-        Jogador, (Jogador.torneio_id == Torneio.id) & (Jogador.jogador_permanente_id == jogador.id)
-    ).filter(
-        ParticipacaoTorneio.jogador_permanente_id == jogador.id
-    ).all()
-    
-    # Processar cada participação para calcular estatísticas
-    participacoes_detalhadas = []
-    for participacao, torneio, jogador_torneio in participacoes:
-        # Jogos da fase de grupos (3 jogos por grupo)
-        jogos_grupo = 3
-        
-        # Buscar confrontos eliminatórias onde o jogador participou
-        confrontos_eliminatorias = ConfrontoEliminatoria.query.filter(
-            ConfrontoEliminatoria.torneio_id == torneio.id,
-            db.or_(
-                ConfrontoEliminatoria.jogador_a1_id == jogador_torneio.id,
-                ConfrontoEliminatoria.jogador_a2_id == jogador_torneio.id,
-                ConfrontoEliminatoria.jogador_b1_id == jogador_torneio.id,
-                ConfrontoEliminatoria.jogador_b2_id == jogador_torneio.id
-            )
-        ).all()
-        
-        # Contar vitórias nas eliminatórias
-        vitorias_eliminatorias = 0
-        for confronto in confrontos_eliminatorias:
-            # Verificar se o jogador estava no time vencedor
-            jogador_no_time_a = (confronto.jogador_a1_id == jogador_torneio.id or 
-                                confronto.jogador_a2_id == jogador_torneio.id)
-            time_a_venceu = confronto.pontos_dupla_a > confronto.pontos_dupla_b
-            
-            if (jogador_no_time_a and time_a_venceu) or (not jogador_no_time_a and not time_a_venceu):
-                vitorias_eliminatorias += 1
-        
-        jogos_eliminatorias = len(confrontos_eliminatorias)
-        vitorias_total = participacao.vitorias + vitorias_eliminatorias
-        jogos_torneio = jogos_grupo + jogos_eliminatorias
-        
-        # Atualizar estatísticas gerais
-        total_jogos += jogos_torneio
-        total_vitorias += vitorias_total
-        
-        # Adicionar detalhes desta participação
-        participacoes_detalhadas.append({
-            'torneio_id': torneio.id,
-            'jogador_id': jogador_torneio.id,
-            'torneio': torneio.nome,
-            'data': torneio.data_criacao.strftime('%d/%m/%Y'),
-            'jogos': jogos_torneio,
-            'vitorias': vitorias_total,
-            'vitorias_grupo': participacao.vitorias,
-            'vitorias_eliminatorias': vitorias_eliminatorias,
-            'pontuacao': jogador_torneio.pontuacao,
-            'finalizado': torneio.finalizado
-        })
-    
-    # Ordenar as participações por data (mais recentes primeiro)
-    participacoes_detalhadas.sort(key=lambda x: x['data'], reverse=True)
-    
-    return render_template(
-        'perfil_jogador.html',
-        jogador=jogador,
-        participacoes=participacoes_detalhadas,
-        total_jogos=total_jogos,
-        total_vitorias=total_vitorias,
-        total_pontos=total_pontos,
-        posicao_ranking=posicao_ranking
-    )
+    return CacheRespostas.responder(f'perfil:{nome_jogador}', renderizar)
 
-@bp.route('/detalhes_jogador/<int:torneio_id>/<int:jogador_id>', methods=['GET'])
-def detalhes_jogador(torneio_id, jogador_id):
-    """Função para fazer os detalhes do jogador"""
-    log_route_access(f'detalhes_jogador/{torneio_id}/{jogador_id}')
-    
-    # Buscar o jogador e o torneio
-    jogador = Jogador.query.get_or_404(jogador_id)
-    torneio = Torneio.query.get_or_404(torneio_id)
-    jogador_permanente = JogadorPermanente.query.get(jogador.jogador_permanente_id)
-    
+def buscar_confrontos_jogador(torneio_id, jogador_id):
+    """Confrontos de grupo e eliminatórios de um jogador e os jogadores envolvidos"""
     # Buscar os confrontos da fase de grupos
     confrontos_grupo = Confronto.query.filter(
         Confronto.torneio_id == torneio_id,
@@ -691,6 +400,30 @@ def detalhes_jogador(torneio_id, jogador_id):
         jogadores_ids.update([c.jogador_a1_id, c.jogador_a2_id, c.jogador_b1_id, c.jogador_b2_id])
     
     jogadores_map = {j.id: j for j in Jogador.query.filter(Jogador.id.in_(jogadores_ids)).all()}
+    return confrontos_grupo, confrontos_eliminatorias, jogadores_map
+
+@bp.route('/detalhes_jogador/<int:torneio_id>/<int:jogador_id>', methods=['GET'])
+@somente_leitura
+def detalhes_jogador(torneio_id, jogador_id):
+    """Função para fazer os detalhes do jogador"""
+    log_route_access(f'detalhes_jogador/{torneio_id}/{jogador_id}')
+    
+    # Buscar o torneio e o jogador
+    torneio = Torneio.query.get_or_404(torneio_id)
+    
+    if torneio.arquivado:
+        # Torneio arquivado: confrontos e nomes vêm do snapshot
+        jogador = JogadorArquivado.query.get_or_404((torneio_id, jogador_id))
+        jogador_permanente = JogadorPermanente.query.get(jogador.jogador_permanente_id)
+        confrontos_grupo, confrontos_eliminatorias, jogadores_map = SnapshotManager.confrontos_do_jogador(
+            torneio, jogador_id
+        )
+    else:
+        jogador = Jogador.query.get_or_404(jogador_id)
+        jogador_permanente = JogadorPermanente.query.get(jogador.jogador_permanente_id)
+        confrontos_grupo, confrontos_eliminatorias, jogadores_map = buscar_confrontos_jogador(
+            torneio_id, jogador_id
+        )
     
     # Processar os confrontos de grupo para fácil exibição
     confrontos_grupo_data = []
@@ -768,6 +501,7 @@ def detalhes_jogador(torneio_id, jogador_id):
     )
 
 @bp.route('/apagar_torneio/<int:torneio_id>', methods=['POST'])
+@invalida_cache
 def apagar_torneio(torneio_id):
     """Função para apagar torneio em andamento"""
     log_route_access(f'apagar_torneio/{torneio_id}')
@@ -784,24 +518,25 @@ def apagar_torneio(torneio_id):
         # Obter o nome do torneio para mensagem de confirmação
         nome_torneio = torneio.nome
         
-        # Deletar confrontos associados
-        Confronto.query.filter_by(torneio_id=torneio_id).delete()
-        
-        # Deletar confrontos eliminatórias associados
-        ConfrontoEliminatoria.query.filter_by(torneio_id=torneio_id).delete()
-        
-        # Deletar jogadores associados
-        Jogador.query.filter_by(torneio_id=torneio_id).delete()
+        # Jogadores permanentes afetados no ranking
+        jogadores_permanentes_ids = [
+            jogador_id for (jogador_id,) in db.session.query(Jogador.jogador_permanente_id).filter_by(torneio_id=torneio_id)
+        ]
         
-        # Deletar participações associadas
-        ParticipacaoTorneio.query.filter_by(torneio_id=torneio_id).delete()
+        # Rating refeito sem os jogos do torneio, antes de o histórico ir junto na cascata
+        RatingManager.retirar_torneio(torneio_id)
         
-        # Deletar o torneio
-        db.session.delete(torneio)
+        # Deletar o torneio; confrontos, jogadores, participações, snapshot e
+        # eventos são removidos pelo banco (ON DELETE CASCADE)
+        db.session.execute(delete(Torneio).where(Torneio.id == torneio_id))
         
         # Commit das mudanças
         db.session.commit()
         
+        # Atualizar o ranking materializado e descartar o estado guardado do torneio
+        RankingManager.atualizar_ranking_jogadores(jogadores_permanentes_ids)
+        descartar_estado_torneio(torneio_id)
+        
         # Limpar variáveis de sessão se for o torneio atual
         if session.get('torneio_id') == torneio_id:
             session['torneio_id'] = None
@@ -819,7 +554,8 @@ def apagar_torneio(torneio_id):
         session['erro_validacao'] = f"Erro ao apagar torneio: {str(e)}"
         return redirect(url_for('main.home'))
 
-@bp.route('/cancelar_torneio')
+@rota_do_torneio(bp, '/cancelar_torneio')
+@invalida_cache
 def cancelar_torneio():
     """Cancela o torneio atual e remove todos os dados relacionados"""
     log_route_access('cancelar_torneio')
@@ -843,20 +579,22 @@ def cancelar_torneio():
         
         nome_torneio = torneio.nome
         
-        # Deletar confrontos de eliminatórias
-        ConfrontoEliminatoria.query.filter_by(torneio_id=torneio_id).delete()
-        
-        # Deletar confrontos
-        Confronto.query.filter_by(torneio_id=torneio_id).delete()
+        # Jogadores permanentes afetados no ranking
+        jogadores_permanentes_ids = [
+            jogador_id for (jogador_id,) in db.session.query(Jogador.jogador_permanente_id).filter_by(torneio_id=torneio_id)
+        ]
         
-        # Deletar jogadores e participações
-        Jogador.query.filter_by(torneio_id=torneio_id).delete()
-        ParticipacaoTorneio.query.filter_by(torneio_id=torneio_id).delete()
+        # Rating refeito sem os jogos do torneio
+        RatingManager.retirar_torneio(torneio_id)
         
-        # Deletar o torneio
-        db.session.delete(torneio)
+        # Deletar o torneio e, em cascata no banco, todos os dados relacionados
+        db.session.execute(delete(Torneio).where(Torneio.id == torneio_id))
         db.session.commit()
         
+        # Atualizar o ranking materializado e descartar o estado guardado do torneio
+        RankingManager.atualizar_ranking_jogadores(jogadores_permanentes_ids)
+        descartar_estado_torneio(torneio_id)
+        
         # Limpar a sessão
         session['torneio_id'] = None
         session['grupos'] = []
@@ -874,6 +612,7 @@ def cancelar_torneio():
         return redirect(url_for('main.novo_torneio'))
     
 @bp.route('/listar_todos_jogadores', methods=['GET'])
+@somente_leitura
 def listar_todos_jogadores():
     """Endpoint AJAX para listar todos os jogadores cadastrados"""
     try:
@@ -889,15 +628,19 @@ def listar_todos_jogadores():
         return jsonify([])
     
 @bp.route('/ranking-completo')
+@somente_leitura
 def ranking_completo():
     """Função para fazer o ranking de jogadores completo, sem limitação de 10 jogadores"""
     log_route_access('ranking_completo')
     
-    # Obter o ranking completo de jogadores
-    ranking_jogadores = RankingManager.obter_ranking()
+    def renderizar():
+        # Obter o ranking completo de jogadores
+        ranking_jogadores = RankingManager.obter_ranking()
+        
+        return render_template(
+            'ranking_completo.html',
+            ranking_jogadores=ranking_jogadores,
+            titulo="Ranking Completo de Jogadores"
+        )
     
-    return render_template(
-        'ranking_completo.html',
-        ranking_jogadores=ranking_jogadores,
-        titulo="Ranking Completo de Jogadores"
-    )
\ No newline at end of file
+    return CacheRespostas.responder('ranking-completo', renderizar)
\ No newline at end of file
@@ -1,18 +1,30 @@
 """Funções para as rotas da fase eliminatoria"""
 from datetime import datetime
 from flask import Blueprint, render_template, session, url_for, redirect, request, flash, current_app, jsonify, make_response
-from database.models import Jogador, Torneio, ConfrontoEliminatoria, Confronto
+from sqlalchemy.orm.exc import StaleDataError
+from database.models import Torneio, ConfrontoEliminatoria, Confronto
 from database.ranking import RankingManager
+from database.rating import RatingManager
+from database.snapshot import SnapshotManager
+from database.elenco import ElencoTorneio
+from database.eventos import EventosManager
+from database.cache import invalida_cache
+from database.concorrencia import ConflitoPlacar, ler_placar_original, placar_editado, responder_conflito
+from database.chave import TITULOS_FASES, grupos_do_modo, obter_chave
+from database.classificacao import ordenar_entre_grupos
 from database.db import db
+from routes.escopo import rota_do_torneio
 
 bp = Blueprint('playoffs', __name__)
 
 def salvar_classificacao_geral(torneio_id, primeiros, segundos):
     """Salva a classificação geral dos jogadores no banco de dados"""
     try:
+        elenco = ElencoTorneio.carregar(torneio_id)
+        
         # Salvar ordem dos primeiros colocados (1, 2, 3, ...)
         for i, jogador in enumerate(primeiros):
-            db_jogador = Jogador.query.get(jogador['id'])
+            db_jogador = elenco.jogador(jogador['id'])
             if db_jogador:
                 db_jogador.classificacao_geral = i + 1
                 log_playoff_action("classificacao_salva", 
@@ -21,7 +33,7 @@ def salvar_classificacao_geral(torneio_id, primeiros, segundos):
         # Salvar ordem dos segundos colocados (101, 102, 103, ...)
         # Usamos 100+ para diferenciar dos primeiros
         for i, jogador in enumerate(segundos):
-            db_jogador = Jogador.query.get(jogador['id'])
+            db_jogador = elenco.jogador(jogador['id'])
             if db_jogador:
                 db_jogador.classificacao_geral = 100 + i + 1
                 log_playoff_action("classificacao_salva", 
@@ -38,14 +50,16 @@ def salvar_classificacao_geral(torneio_id, primeiros, segundos):
 def carregar_classificacao_geral(torneio_id, primeiros, segundos):
     """Carrega e aplica a classificação geral salva"""
     try:
+        elenco = ElencoTorneio.carregar(torneio_id)
+        
         # Atualizar os dicionários com a classificação salva do banco
         for jogador in primeiros:
-            db_jogador = Jogador.query.get(jogador['id'])
+            db_jogador = elenco.jogador(jogador['id'])
             if db_jogador and db_jogador.classificacao_geral > 0:
                 jogador['classificacao_geral'] = db_jogador.classificacao_geral
         
         for jogador in segundos:
-            db_jogador = Jogador.query.get(jogador['id'])
+            db_jogador = elenco.jogador(jogador['id'])
             if db_jogador and db_jogador.classificacao_geral > 0:
                 jogador['classificacao_geral'] = db_jogador.classificacao_geral
         
@@ -97,7 +111,8 @@ def carregar_eliminatorias_do_banco(torneio_id):
             # Salvar na sessão no formato esperado
             session[f'eliminatoria_jogo{jogo_numero}'] = {
                 'timeA': confronto.pontos_dupla_a if confronto.pontos_dupla_a is not None else '',
-                'timeB': confronto.pontos_dupla_b if confronto.pontos_dupla_b is not None else ''
+                'timeB': confronto.pontos_dupla_b if confronto.pontos_dupla_b is not None else '',
+                'versao': confronto.versao
             }
             
             log_playoff_action("confronto_carregado", 
@@ -131,7 +146,102 @@ def get_jogador_safe(lista, idx, default=None):
     current_app.logger.warning(f"Índice {idx} inválido para lista de {len(lista)} jogadores")
     return default or {'nome': 'Jogador Fantasma', 'vitorias': 0, 'saldo_total': 0}
 
-@bp.route('/fase_eliminatoria')
+def chave_do_torneio(modo=None):
+    """Chave pré-montada do modo e formato do torneio da sessão (None se o modo é inválido)
+
+    A disputa de 3º lugar é a gravada no torneio ao sortear os grupos.
+    """
+    terceiro_lugar = session.get('disputa_terceiro_lugar')
+    if terceiro_lugar is None:
+        # Sessões de antes da coluna: ler do torneio uma vez
+        torneio = db.session.get(Torneio, session['torneio_id']) if session.get('torneio_id') else None
+        terceiro_lugar = bool(torneio and torneio.disputa_terceiro_lugar)
+        session['disputa_terceiro_lugar'] = terceiro_lugar
+    return obter_chave(
+        modo or session.get('modo_torneio', '28j'),
+        session.get('formato_eliminatoria', 'separados'),
+        terceiro_lugar
+    )
+
+def salvar_jogo_eliminatoria(torneio_id, fase, jogo):
+    """Grava na sessão e no banco o placar de um jogo enviado pelo formulário da chave"""
+    timeA = int(request.form.get(f'jogo_{jogo}_timeA', 0))
+    timeB = int(request.form.get(f'jogo_{jogo}_timeB', 0))
+    
+    # Salvar na sessão
+    session[f'eliminatoria_jogo{jogo}'] = {
+        'timeA': timeA,
+        'timeB': timeB
+    }
+    
+    # Pegar os nomes dos jogadores do formulário
+    nomes = [
+        request.form.get(f'timeA_jogador1_{jogo}'),
+        request.form.get(f'timeA_jogador2_{jogo}'),
+        request.form.get(f'timeB_jogador1_{jogo}'),
+        request.form.get(f'timeB_jogador2_{jogo}')
+    ]
+    
+    if torneio_id and all(nomes):
+        # Verificar se já existe este confronto no banco
+        confronto_db = ConfrontoEliminatoria.query.filter_by(
+            torneio_id=torneio_id,
+            fase=fase,
+            jogo_numero=jogo
+        ).first()
+        
+        # Buscar IDs dos jogadores no elenco do torneio
+        ids = ElencoTorneio.carregar(torneio_id).ids_dos_jogadores(nomes)
+        
+        if ids:
+            if confronto_db:
+                # Atualizar confronto existente (só se o placar foi editado nesta página)
+                if placar_eliminatoria_editado(confronto_db, jogo, timeA, timeB):
+                    confronto_db.pontos_dupla_a = timeA
+                    confronto_db.pontos_dupla_b = timeB
+                    confronto_db.atualizado_em = datetime.now()
+            else:
+                # Criar novo confronto
+                confronto_db = ConfrontoEliminatoria(
+                    torneio_id=torneio_id,
+                    fase=fase,
+                    jogo_numero=jogo,
+                    jogador_a1_id=ids[0],
+                    jogador_a2_id=ids[1],
+                    jogador_b1_id=ids[2],
+                    jogador_b2_id=ids[3],
+                    pontos_dupla_a=timeA,
+                    pontos_dupla_b=timeB
+                )
+                db.session.add(confronto_db)
+            
+            db.session.commit()
+            current_app.logger.info(f"{TITULOS_FASES[fase]} Jogo {jogo} salvo no DB: {timeA}x{timeB}")
+        else:
+            current_app.logger.warning(f"Não foi possível encontrar todos os jogadores para o confronto {jogo}")
+    
+    current_app.logger.info(f"{TITULOS_FASES[fase]} Jogo {jogo} salvo na sessão: {timeA}x{timeB}")
+
+def placar_eliminatoria_editado(confronto_db, jogo, timeA, timeB):
+    """Indica se o placar enviado para o jogo deve ser gravado (ver database/concorrencia.py)"""
+    return placar_editado(
+        confronto_db, (timeA, timeB),
+        versao=request.form.get(f'jogo_{jogo}_versao', type=int),
+        original=ler_placar_original(request.form.get(f'jogo_{jogo}_original'))
+    )
+
+def responder_conflito_eliminatoria(erro):
+    """Placar alterado em outro dispositivo: avisa e volta para a chave sem sobrescrever"""
+    if isinstance(erro, ConflitoPlacar):
+        mensagem = f"Jogo {erro.confronto.jogo_numero}: {erro}. Confira o placar atual e salve de novo."
+    else:
+        mensagem = "Outro dispositivo gravou o mesmo jogo ao mesmo tempo. Confira o placar atual e salve de novo."
+    db.session.rollback()
+    log_playoff_action("conflito_placar", mensagem)
+    flash(mensagem, "warning")
+    return responder_conflito(mensagem) or redirect(url_for('playoffs.fase_eliminatoria'))
+
+@rota_do_torneio(bp, '/fase_eliminatoria')
 def fase_eliminatoria():
     """Função para criar as fases eliminatorias"""
     try:
@@ -170,13 +280,7 @@ def fase_eliminatoria():
         
         # Verificar modo do torneio para determinar número de grupos
         modo = session.get('modo_torneio', '28j')
-        total_grupos_esperados = {
-            '16j': 4,
-            '20j': 5,
-            '24j': 6,
-            '28j': 7,
-            '32j': 8
-        }.get(modo, 7)
+        total_grupos_esperados = grupos_do_modo(modo) or 7
         
         # Obter todos os confrontos do torneio
         confrontos = Confronto.query.filter_by(torneio_id=torneio_id).all()
@@ -241,15 +345,14 @@ def fase_eliminatoria():
             if len(grupo) > 1:
                 segundos.append(grupo[1])
 
-        # Ordenação inicial por desempenho
-        primeiros.sort(key=lambda x: (-x['vitorias'], -x['saldo_total']))
-        segundos.sort(key=lambda x: (-x['vitorias'], -x['saldo_total']))
+        # Ordenação inicial por desempenho (vitórias, saldo, pontos a favor e ordem dos grupos)
+        ordenar_entre_grupos(primeiros)
+        ordenar_entre_grupos(segundos)
         
         # NOVO: Verificar se já existe classificação salva
         torneio_id = session.get('torneio_id')
-        ja_classificado = Jogador.query.filter_by(
-            torneio_id=torneio_id
-        ).filter(Jogador.classificacao_geral > 0).first()
+        elenco = ElencoTorneio.carregar(torneio_id)
+        ja_classificado = any(jogador.classificacao_geral > 0 for jogador in elenco)
         
         if ja_classificado:
             # Já foi classificado antes: carregar a ordem salva
@@ -262,482 +365,65 @@ def fase_eliminatoria():
                              "Salvando ordem da classificação pela primeira vez")
             salvar_classificacao_geral(torneio_id, primeiros, segundos)
 
-        # ===================================================================
-        # CONFIGURAÇÃO COMPLETA PARA TODOS OS MODOS - SEPARADOS E MISTOS
-        # ===================================================================
-        
-        config = None
-        
-        if modo == '16j':
-            if formato_eliminatoria == 'mistos':
-                # Formato MISTOS para 16j
-                config = {
-                    'semi_finais': [
-                        {'timeA': [get_jogador_safe(primeiros, 0), get_jogador_safe(segundos, 0)],
-                         'timeB': [get_jogador_safe(primeiros, 3), get_jogador_safe(segundos, 3)], 
-                         'jogo': 1},
-                        {'timeA': [get_jogador_safe(primeiros, 1), get_jogador_safe(segundos, 1)],
-                         'timeB': [get_jogador_safe(primeiros, 2), get_jogador_safe(segundos, 2)], 
-                         'jogo': 2},
-                    ],
-                    'required_players': {'primeiros': 4, 'segundos': 4},
-                    'final_jogo': 3
-                }
-            else:
-                # Formato SEPARADOS para 16j (original)
-                config = {
-                    'semi_finais': [
-                        {'timeA': [get_jogador_safe(primeiros, 0), get_jogador_safe(primeiros, 1)],
-                         'timeB': [get_jogador_safe(segundos, 2), get_jogador_safe(segundos, 3)], 
-                         'jogo': 1},
-                        {'timeA': [get_jogador_safe(primeiros, 2), get_jogador_safe(primeiros, 3)],
-                         'timeB': [get_jogador_safe(segundos, 0), get_jogador_safe(segundos, 1)], 
-                         'jogo': 2},
-                    ],
-                    'required_players': {'primeiros': 4, 'segundos': 4},
-                    'final_jogo': 3
-                }
-        
-        elif modo == '20j':
-            if formato_eliminatoria == 'mistos':
-                # Formato MISTOS para 20j
-                config = {
-                    'quartas': [
-                        {'timeA': [get_jogador_safe(primeiros, 3), get_jogador_safe(segundos, 3)],
-                         'timeB': [get_jogador_safe(primeiros, 4), get_jogador_safe(segundos, 4)], 
-                         'jogo': 1}
-                    ],
-                    'required_players': {'primeiros': 5, 'segundos': 5},
-                    'final_jogo': 4
-                }
-            else:
-                # Formato SEPARADOS para 20j (original)
-                config = {
-                    'quartas': [
-                        {'timeA': [get_jogador_safe(segundos, 1), get_jogador_safe(segundos, 2)],
-                         'timeB': [get_jogador_safe(segundos, 3), get_jogador_safe(segundos, 4)], 
-                         'jogo': 1}
-                    ],
-                    'required_players': {'primeiros': 5, 'segundos': 5},
-                    'final_jogo': 4
-                }
-        
-        elif modo == '24j':
-            if formato_eliminatoria == 'mistos':
-                # Formato MISTOS para 24j
-                config = {
-                    'quartas': [
-                        {'timeA': [get_jogador_safe(primeiros, 3), get_jogador_safe(segundos, 3)],
-                         'timeB': [get_jogador_safe(primeiros, 4), get_jogador_safe(segundos, 4)], 
-                         'jogo': 1},
-                        {'timeA': [get_jogador_safe(primeiros, 2), get_jogador_safe(segundos, 2)],
-                         'timeB': [get_jogador_safe(primeiros, 5), get_jogador_safe(segundos, 5)], 
-                         'jogo': 2}
-                    ],
-                    'required_players': {'primeiros': 6, 'segundos': 6},
-                    'final_jogo': 5
-                }
-            else:
-                # Formato SEPARADOS para 24j (original)
-                config = {
-                    'quartas': [
-                        {'timeA': [get_jogador_safe(segundos, 0), get_jogador_safe(segundos, 1)],
-                         'timeB': [get_jogador_safe(segundos, 2), get_jogador_safe(segundos, 3)], 
-                         'jogo': 1},
-                        {'timeA': [get_jogador_safe(primeiros, 4), get_jogador_safe(primeiros, 5)],
-                         'timeB': [get_jogador_safe(segundos, 4), get_jogador_safe(segundos, 5)], 
-                         'jogo': 2}
-                    ],
-                    'required_players': {'primeiros': 6, 'segundos': 6},
-                    'final_jogo': 5
-                }
-        
-        elif modo == '28j':
-            if formato_eliminatoria == 'mistos':
-                # Formato MISTOS para 28j
-                config = {
-                    'quartas': [
-                        {'timeA': [get_jogador_safe(primeiros, 1), get_jogador_safe(segundos, 1)],
-                         'timeB': [get_jogador_safe(primeiros, 6), get_jogador_safe(segundos, 6)], 
-                         'jogo': 1},
-                        {'timeA': [get_jogador_safe(primeiros, 2), get_jogador_safe(segundos, 2)],
-                         'timeB': [get_jogador_safe(primeiros, 5), get_jogador_safe(segundos, 5)], 
-                         'jogo': 2},
-                        {'timeA': [get_jogador_safe(primeiros, 3), get_jogador_safe(segundos, 3)],
-                         'timeB': [get_jogador_safe(primeiros, 4), get_jogador_safe(segundos, 4)], 
-                         'jogo': 3}
-                    ],
-                    'required_players': {'primeiros': 7, 'segundos': 7},
-                    'final_jogo': 6
-                }
-            else:
-                # Formato SEPARADOS para 28j (original)
-                config = {
-                    'quartas': [
-                        {'timeA': [get_jogador_safe(primeiros, 6), get_jogador_safe(segundos, 0)],
-                         'timeB': [get_jogador_safe(segundos, 1), get_jogador_safe(segundos, 2)], 
-                         'jogo': 1},
-                        {'timeA': [get_jogador_safe(primeiros, 2), get_jogador_safe(primeiros, 3)],
-                         'timeB': [get_jogador_safe(segundos, 5), get_jogador_safe(segundos, 6)], 
-                         'jogo': 2},
-                        {'timeA': [get_jogador_safe(primeiros, 4), get_jogador_safe(primeiros, 5)],
-                         'timeB': [get_jogador_safe(segundos, 3), get_jogador_safe(segundos, 4)], 
-                         'jogo': 3}
-                    ],
-                    'required_players': {'primeiros': 7, 'segundos': 7},
-                    'final_jogo': 6
-                }
-        
-        elif modo == '32j':
-            if formato_eliminatoria == 'mistos':
-                # Formato MISTOS para 32j
-                config = {
-                    'quartas': [
-                        {'timeA': [get_jogador_safe(primeiros, 0), get_jogador_safe(segundos, 0)],
-                         'timeB': [get_jogador_safe(primeiros, 7), get_jogador_safe(segundos, 7)], 
-                         'jogo': 1},
-                        {'timeA': [get_jogador_safe(primeiros, 1), get_jogador_safe(segundos, 1)],
-                         'timeB': [get_jogador_safe(primeiros, 6), get_jogador_safe(segundos, 6)], 
-                         'jogo': 2},
-                        {'timeA': [get_jogador_safe(primeiros, 2), get_jogador_safe(segundos, 2)],
-                         'timeB': [get_jogador_safe(primeiros, 5), get_jogador_safe(segundos, 5)], 
-                         'jogo': 3},
-                        {'timeA': [get_jogador_safe(primeiros, 3), get_jogador_safe(segundos, 3)],
-                         'timeB': [get_jogador_safe(primeiros, 4), get_jogador_safe(segundos, 4)], 
-                         'jogo': 4}
-                    ],
-                    'required_players': {'primeiros': 8, 'segundos': 8},
-                    'final_jogo': 7
-                }
-            else:
-                # Formato SEPARADOS para 32j (original)
-                config = {
-                    'quartas': [
-                        {'timeA': [get_jogador_safe(primeiros, 0), get_jogador_safe(primeiros, 1)],
-                         'timeB': [get_jogador_safe(segundos, 6), get_jogador_safe(segundos, 7)], 
-                         'jogo': 1},
-                        {'timeA': [get_jogador_safe(primeiros, 6), get_jogador_safe(primeiros, 7)],
-                         'timeB': [get_jogador_safe(segundos, 0), get_jogador_safe(segundos, 1)], 
-                         'jogo': 2},
-                        {'timeA': [get_jogador_safe(primeiros, 4), get_jogador_safe(primeiros, 5)],
-                         'timeB': [get_jogador_safe(segundos, 2), get_jogador_safe(segundos, 3)], 
-                         'jogo': 3},
-                        {'timeA': [get_jogador_safe(primeiros, 2), get_jogador_safe(primeiros, 3)],
-                         'timeB': [get_jogador_safe(segundos, 4), get_jogador_safe(segundos, 5)],                          
-                         'jogo': 4}
-                    ],
-                    'required_players': {'primeiros': 8, 'segundos': 8},
-                    'final_jogo': 7
-                }
-
-        if not config:
+        # Confrontos de cada fase por consulta à chave do modo e formato (database/chave.py)
+        chave = chave_do_torneio(modo)
+        if not chave:
             current_app.logger.error(f"Modo de torneio inválido: {modo}")
             flash("Modo de torneio inválido", "error")
             return redirect(url_for('main.novo_torneio'))
         
-        if modo == '16j':
-            # Para 16j, só precisamos dos 4 primeiros e 4 segundos colocados
-            if len(primeiros) < 4 or len(segundos) < 4:
-                error_msg = (f"Jogadores insuficientes para modo {modo}. "
-                        f"Necessário: 4 primeiros/4 segundos. "
-                        f"Encontrado: {len(primeiros)} primeiros/{len(segundos)} segundos")
-                current_app.logger.error(error_msg)
-                flash("Erro: Configuração de torneio incompleta", "error")
-                return redirect(url_for('main.novo_torneio'))
-        else:
-            # Validação normal para outros modos
-            req = config['required_players']
-            if len(primeiros) < req['primeiros'] or len(segundos) < req['segundos']:
-                error_msg = (f"Jogadores insuficientes para modo {modo}. "
-                        f"Necessário: {req['primeiros']}P/{req['segundos']}S. "
-                        f"Encontrado: {len(primeiros)}P/{len(segundos)}S")
-                current_app.logger.error(error_msg)
-                flash("Erro: Configuração de torneio incompleta", "error")
-                return redirect(url_for('main.novo_torneio'))
-
-        # Geração de confrontos - VERSÃO LIMPA
-        confrontos = config.get('quartas', [])
-        historico_jogos = {}
-        semi_finais = []
-        final = None
-
-        # Para 16 jogadores, pular quartas e ir direto para semi-finais
-        if modo == '16j':
-            # Usar as semi-finais definidas na configuração
-            semi_finais = config['semi_finais']
-
-            for i, semi in enumerate(semi_finais):
-                nomes_a = [j['nome'] for j in semi['timeA']]
-                nomes_b = [j['nome'] for j in semi['timeB']]
-                current_app.logger.info(f"Semi {i+1} (Jogo {semi['jogo']}): {nomes_a} vs {nomes_b}")
-        else:
-            # Processa histórico das quartas para outros modos
-            for jogo in confrontos:
-                jogo_key = f'eliminatoria_jogo{jogo["jogo"]}'
-                if jogo_key in session:
-                    historico_jogos[f'Quartas - Jogo {jogo["jogo"]}'] = {
-                        'timeA': session[jogo_key]['timeA'],
-                        'timeB': session[jogo_key]['timeB'],
-                        'timeA_nomes': [j['nome'] for j in jogo['timeA']],
-                        'timeB_nomes': [j['nome'] for j in jogo['timeB']]
-                    } 
-
-            # Geração das semi-finais (se todas quartas estiverem salvas)
-            if all(f'eliminatoria_jogo{j["jogo"]}' in session for j in confrontos):
-                if modo == '20j':
-                    vencedor_jogo1 = 'timeA' if session['eliminatoria_jogo1']['timeA'] > session['eliminatoria_jogo1']['timeB'] else 'timeB'
-
-                    if formato_eliminatoria == 'mistos':
-                        # Formato MISTOS para 20j - Semi-finais
-                        semi_finais = [
-                            {
-                                'timeA': [get_jogador_safe(primeiros, 0), get_jogador_safe(segundos, 0)],
-                                'timeB': confrontos[0][vencedor_jogo1],
-                                'jogo': 2
-                            },
-                            {
-                                'timeA': [get_jogador_safe(primeiros, 1), get_jogador_safe(segundos, 1)],
-                                'timeB': [get_jogador_safe(primeiros, 2), get_jogador_safe(segundos, 2)],
-                                'jogo': 3
-                            }
-                        ]
-                    else:
-                        # Formato SEPARADOS para 20j - Semi-finais (original)
-                        semi_finais = [
-                            {
-                                'timeA': [get_jogador_safe(primeiros, 0), get_jogador_safe(primeiros, 1)],
-                                'timeB': confrontos[0][vencedor_jogo1],
-                                'jogo': 2
-                            },
-                            {
-                                'timeA': [get_jogador_safe(primeiros, 2), get_jogador_safe(primeiros, 3)],
-                                'timeB': [get_jogador_safe(primeiros, 4), get_jogador_safe(segundos, 0)],
-                                'jogo': 3
-                            }
-                        ]
-
-                elif modo == '24j':
-                    vencedor_jogo1 = 'timeA' if session['eliminatoria_jogo1']['timeA'] > session['eliminatoria_jogo1']['timeB'] else 'timeB'
-                    vencedor_jogo2 = 'timeA' if session['eliminatoria_jogo2']['timeA'] > session['eliminatoria_jogo2']['timeB'] else 'timeB'
-
-                    if formato_eliminatoria == 'mistos':
-                        # Formato MISTOS para 24j - Semi-finais
-                        semi_finais = [
-                            {
-                                'timeA': [get_jogador_safe(primeiros, 0), get_jogador_safe(segundos, 0)],
-                                'timeB': confrontos[0][vencedor_jogo1],
-                                'jogo': 3
-                            },
-                            {
-                                'timeA': [get_jogador_safe(primeiros, 1), get_jogador_safe(segundos, 1)],
-                                'timeB': confrontos[1][vencedor_jogo2],
-                                'jogo': 4
-                            }
-                        ]
-                    else:
-                        # Formato SEPARADOS para 24j - Semi-finais (original)
-                        semi_finais = [
-                            {
-                                'timeA': [get_jogador_safe(primeiros, 0), get_jogador_safe(primeiros, 1)],
-                                'timeB': confrontos[0][vencedor_jogo1],
-                                'jogo': 3
-                            },
-                            {
-                                'timeA': [get_jogador_safe(primeiros, 2), get_jogador_safe(primeiros, 3)],
-                                'timeB': confrontos[1][vencedor_jogo2],
-                                'jogo': 4
-                            }
-                        ]
-
-                elif modo == '28j':
-                    vencedor_jogo1 = 'timeA' if session['eliminatoria_jogo1']['timeA'] > session['eliminatoria_jogo1']['timeB'] else 'timeB'
-                    vencedor_jogo2 = 'timeA' if session['eliminatoria_jogo2']['timeA'] > session['eliminatoria_jogo2']['timeB'] else 'timeB'
-                    vencedor_jogo3 = 'timeA' if session['eliminatoria_jogo3']['timeA'] > session['eliminatoria_jogo3']['timeB'] else 'timeB'
-
-                    if formato_eliminatoria == 'mistos':
-                    # Formato MISTOS para 28j - Semi-finais
-                        semi_finais = [
-                            {
-                                'timeA': confrontos[0][vencedor_jogo1],
-                                'timeB': confrontos[1][vencedor_jogo2],
-                                'jogo': 4                                
-                            },
-                            {
-                                'timeA': [get_jogador_safe(primeiros, 0), get_jogador_safe(segundos, 0)],
-                                'timeB': confrontos[2][vencedor_jogo3],
-                                'jogo': 5
-                            }
-                        ]
-                    else:
-                        # Formato SEPARADOS para 28j - Semi-finais (original)
-                        semi_finais = [
-                            {
-                                'timeA': [get_jogador_safe(primeiros, 0), get_jogador_safe(primeiros, 1)],
-                                'timeB': confrontos[0][vencedor_jogo1],
-                                'jogo': 4
-                            },
-                            {
-                                'timeA': confrontos[1][vencedor_jogo2],
-                                'timeB': confrontos[2][vencedor_jogo3],
-                                'jogo': 5
-                            }
-                        ]
-
-                elif modo == '32j':
-                    vencedor_jogo1 = 'timeA' if session['eliminatoria_jogo1']['timeA'] > session['eliminatoria_jogo1']['timeB'] else 'timeB'
-                    vencedor_jogo2 = 'timeA' if session['eliminatoria_jogo2']['timeA'] > session['eliminatoria_jogo2']['timeB'] else 'timeB'
-                    vencedor_jogo3 = 'timeA' if session['eliminatoria_jogo3']['timeA'] > session['eliminatoria_jogo3']['timeB'] else 'timeB'
-                    vencedor_jogo4 = 'timeA' if session['eliminatoria_jogo4']['timeA'] > session['eliminatoria_jogo4']['timeB'] else 'timeB'
-                    
-                    if formato_eliminatoria == 'mistos':
-                    # Formato MISTOS para 32j - Semi-finais
-                        semi_finais = [
-                            {
-                                'timeA': confrontos[0][vencedor_jogo1],
-                                'timeB': confrontos[3][vencedor_jogo4],
-                                'jogo': 5
-                            },
-                            {
-                                'timeA': confrontos[1][vencedor_jogo2],
-                                'timeB': confrontos[2][vencedor_jogo3],
-                                'jogo': 6
-                            }
-                        ]
-                    else:
-                        # Formato SEPARADOS para 32j - Semi-finais (original)
-                        semi_finais = [
-                            {
-                                'timeA': confrontos[0][vencedor_jogo1],
-                                'timeB': confrontos[1][vencedor_jogo2],
-                                'jogo': 5
-                            },
-                            {
-                                'timeA': confrontos[2][vencedor_jogo3],
-                                'timeB': confrontos[3][vencedor_jogo4],
-                                'jogo': 6
-                            }
-                        ]
+        if len(primeiros) < total_grupos_esperados or len(segundos) < total_grupos_esperados:
+            error_msg = (f"Jogadores insuficientes para modo {modo}. "
+                    f"Necessário: {total_grupos_esperados}P/{total_grupos_esperados}S. "
+                    f"Encontrado: {len(primeiros)}P/{len(segundos)}S")
+            current_app.logger.error(error_msg)
+            flash("Erro: Configuração de torneio incompleta", "error")
+            return redirect(url_for('main.novo_torneio'))
 
+        # Placares salvos; cada fase só é montada com a anterior toda jogada
+        resultados = {
+            jogo.jogo: session[f'eliminatoria_jogo{jogo.jogo}']
+            for jogo in chave.jogos if f'eliminatoria_jogo{jogo.jogo}' in session
+        }
+        fases = chave.montar(primeiros, segundos, resultados, get_jogador_safe)
 
-        # Processa histórico das semi-finais (PARA TODOS OS MODOS)
-        for jogo in semi_finais:
-            jogo_key = f'eliminatoria_jogo{jogo["jogo"]}'
-            if jogo_key in session:
+        for fase, jogos in fases.items():
+            for jogo in jogos:
                 nomes_a = [j['nome'] for j in jogo['timeA']]
                 nomes_b = [j['nome'] for j in jogo['timeB']]
-                historico_jogos[f'Semi-Final - Jogo {jogo["jogo"]}'] = {
-                    'timeA': session[jogo_key]['timeA'],
-                    'timeB': session[jogo_key]['timeB'],
-                    'timeA_nomes': nomes_a,
-                    'timeB_nomes': nomes_b
-                }
-        
-        if modo == '16j':
-            # Para 16j: verificar se jogos 1 e 2 existem na sessão
-            if 'eliminatoria_jogo1' in session and 'eliminatoria_jogo2' in session:
-                
-                final_jogo = config['final_jogo']  # Deve ser 3
-                
-                jogo1_data = session['eliminatoria_jogo1']
-                jogo2_data = session['eliminatoria_jogo2']
-                
-                current_app.logger.info(f"Jogo 1: {jogo1_data}")
-                current_app.logger.info(f"Jogo 2: {jogo2_data}")
-                
-                # Determinar vencedores
-                vencedor_jogo1 = 'timeA' if jogo1_data['timeA'] > jogo1_data['timeB'] else 'timeB'
-                vencedor_jogo2 = 'timeA' if jogo2_data['timeA'] > jogo2_data['timeB'] else 'timeB'
-                
-                current_app.logger.info(f"Vencedor jogo 1: {vencedor_jogo1} ({jogo1_data['timeA']} x {jogo1_data['timeB']})")
-                current_app.logger.info(f"Vencedor jogo 2: {vencedor_jogo2} ({jogo2_data['timeA']} x {jogo2_data['timeB']})")
-                
-                # Obter as duplas finalistas
-                dupla_final_A = semi_finais[0][vencedor_jogo1]  # Vencedor da primeira semi
-                dupla_final_B = semi_finais[1][vencedor_jogo2]  # Vencedor da segunda semi
-                
-                nomes_a = [j['nome'] for j in dupla_final_A]
-                nomes_b = [j['nome'] for j in dupla_final_B]
-                
-                final = {
-                    'timeA': dupla_final_A,
-                    'timeB': dupla_final_B,
-                    'jogo': final_jogo
-                }
-                current_app.logger.info(f"Final: Jogo {final_jogo} - {nomes_a} vs {nomes_b}")
-                
-            else:
-                current_app.logger.warning(f"eliminatoria_jogo1 existe: {'eliminatoria_jogo1' in session}")
-                current_app.logger.warning(f"eliminatoria_jogo2 existe: {'eliminatoria_jogo2' in session}")
-
-        else:
-            # Verificar se todas as semi-finais foram jogadas
-            if semi_finais and all(f'eliminatoria_jogo{j["jogo"]}' in session for j in semi_finais):
-                final_jogo = config['final_jogo']
-
-                if modo == '20j':
-                    if 'eliminatoria_jogo2' in session and 'eliminatoria_jogo3' in session:
-                        vencedor_jogo2 = 'timeA' if session['eliminatoria_jogo2']['timeA'] > session['eliminatoria_jogo2']['timeB'] else 'timeB'
-                        vencedor_jogo3 = 'timeA' if session['eliminatoria_jogo3']['timeA'] > session['eliminatoria_jogo3']['timeB'] else 'timeB'
-                        
-                        final = {
-                            'timeA': semi_finais[0][vencedor_jogo2],
-                            'timeB': semi_finais[1][vencedor_jogo3],
-                            'jogo': final_jogo
-                        }
-
-                elif modo == '24j':
-                    if 'eliminatoria_jogo3' in session and 'eliminatoria_jogo4' in session:
-                        vencedor_jogo3 = 'timeA' if session['eliminatoria_jogo3']['timeA'] > session['eliminatoria_jogo3']['timeB'] else 'timeB'
-                        vencedor_jogo4 = 'timeA' if session['eliminatoria_jogo4']['timeA'] > session['eliminatoria_jogo4']['timeB'] else 'timeB'
-                        
-                        final = {
-                            'timeA': semi_finais[0][vencedor_jogo3],
-                            'timeB': semi_finais[1][vencedor_jogo4],
-                            'jogo': final_jogo
-                        }
+                current_app.logger.info(f"{TITULOS_FASES[fase]} (Jogo {jogo['jogo']}): {nomes_a} vs {nomes_b}")
 
-                elif modo == '28j':
-                    if 'eliminatoria_jogo4' in session and 'eliminatoria_jogo5' in session:
-                        vencedor_jogo4 = 'timeA' if session['eliminatoria_jogo4']['timeA'] > session['eliminatoria_jogo4']['timeB'] else 'timeB'
-                        vencedor_jogo5 = 'timeA' if session['eliminatoria_jogo5']['timeA'] > session['eliminatoria_jogo5']['timeB'] else 'timeB'
-                        
-                        final = {
-                            'timeA': semi_finais[0][vencedor_jogo4],
-                            'timeB': semi_finais[1][vencedor_jogo5],
-                            'jogo': final_jogo
-                        }
-
-                elif modo == '32j':
-                    if 'eliminatoria_jogo5' in session and 'eliminatoria_jogo6' in session:
-                        vencedor_jogo5 = 'timeA' if session['eliminatoria_jogo5']['timeA'] > session['eliminatoria_jogo5']['timeB'] else 'timeB'
-                        vencedor_jogo6 = 'timeA' if session['eliminatoria_jogo6']['timeA'] > session['eliminatoria_jogo6']['timeB'] else 'timeB'
-                        
-                        final = {
-                            'timeA': semi_finais[0][vencedor_jogo5],
-                            'timeB': semi_finais[1][vencedor_jogo6],
-                            'jogo': final_jogo
-                        }
-
-        if final:
-            current_app.logger.info(f"Dados da final: {final}")
+        # Rodada anterior às semi-finais em andamento (oitavas ou quartas)
+        fase_confrontos = next(
+            (fase for fase in reversed(chave.fases_antes_da_semi()) if fase in fases), None
+        )
+        confrontos = fases.get(fase_confrontos, [])
+        semi_finais = fases.get('semi', [])
+        final = (fases.get('final') or [None])[0]
+        terceiro = (fases.get('terceiro') or [None])[0]
 
-        # Processa histórico da final
-        if final and f'eliminatoria_jogo{final["jogo"]}' in session:
-            final_nomes_a = [j['nome'] for j in final['timeA']]
-            final_nomes_b = [j['nome'] for j in final['timeB']]
-            historico_jogos['Final'] = {
-                'timeA': session[f'eliminatoria_jogo{final["jogo"]}']['timeA'],
-                'timeB': session[f'eliminatoria_jogo{final["jogo"]}']['timeB'],
-                'timeA_nomes': final_nomes_a,
-                'timeB_nomes': final_nomes_b
-            }        
+        # Histórico: jogos com placar salvo, fase a fase
+        historico_jogos = []
+        for fase, jogos in fases.items():
+            jogados = [{
+                'jogo': jogo['jogo'],
+                'timeA': resultados[jogo['jogo']]['timeA'],
+                'timeB': resultados[jogo['jogo']]['timeB'],
+                'timeA_nomes': [j['nome'] for j in jogo['timeA']],
+                'timeB_nomes': [j['nome'] for j in jogo['timeB']]
+            } for jogo in jogos if jogo['jogo'] in resultados]
+            if jogados:
+                historico_jogos.append({'fase': fase, 'titulo': TITULOS_FASES[fase], 'jogos': jogados})
 
         response = make_response(render_template('fase_eliminatoria.html',
                           primeiros=primeiros,
                           segundos=segundos,
                           confrontos=confrontos,
+                          fase_confrontos=fase_confrontos,
+                          titulo_confrontos=TITULOS_FASES.get(fase_confrontos),
                           semi_finais=semi_finais,
                           final=final,
+                          terceiro=terceiro,
                           historico_jogos=historico_jogos,
                           modo_torneio=modo,
                           torneio_finalizado=torneio.finalizado))
@@ -757,7 +443,8 @@ def fase_eliminatoria():
         flash("Erro crítico ao gerar a fase eliminatória", "error")
         return redirect(url_for('main.novo_torneio'))
 
-@bp.route('/salvar_eliminatorias', methods=['POST'])
+@rota_do_torneio(bp, '/salvar_eliminatorias', methods=['POST'])
+@invalida_cache
 def salvar_eliminatorias():
     """Função para salvar os resultados das eliminatorias"""
     try:
@@ -765,78 +452,36 @@ def salvar_eliminatorias():
         torneio_id = session.get('torneio_id')
         log_playoff_action("save_quarterfinals_start")
 
-        if modo == '16j':
+        # Rodada anterior às semi-finais (oitavas ou quartas); modos sem ela (16j) não têm o que salvar aqui
+        chave = chave_do_torneio(modo)
+        fase = request.form.get('fase', 'quartas')
+        if not chave or fase not in chave.fases_antes_da_semi():
             return redirect(url_for('playoffs.fase_eliminatoria'))
 
-        # NOVO: Verificar se as semi-finais já existem
-        if verificar_fase_ja_existe(torneio_id, 'semi'):
-            log_playoff_action("semis_ja_existem", "Semi-finais já foram criadas - não sobrescrever")
-            flash("As semi-finais já foram geradas. Use o botão 'Resetar' se precisar refazer.", "warning")
+        # NOVO: Verificar se a fase seguinte já existe
+        proxima_fase = chave.fases_posteriores(fase)[0]
+        if verificar_fase_ja_existe(torneio_id, proxima_fase):
+            log_playoff_action("fase_ja_existe", f"{TITULOS_FASES[proxima_fase]} já foram criadas - não sobrescrever")
+            flash(f"As {TITULOS_FASES[proxima_fase].lower()} já foram geradas. Use o botão 'Resetar' se precisar refazer.", "warning")
             return redirect(url_for('playoffs.fase_eliminatoria'))
 
-        num_jogos = {'20j':1, '24j':2, '28j':3, '32j':4}.get(modo, 3)
-        
-        for jogo in range(1, num_jogos + 1):
-            timeA = int(request.form.get(f'jogo_{jogo}_timeA', 0))
-            timeB = int(request.form.get(f'jogo_{jogo}_timeB', 0))
-            
-            # Salvar na sessão
-            session[f'eliminatoria_jogo{jogo}'] = {
-                'timeA': timeA,
-                'timeB': timeB
-            }
-            
-            # Pegar os nomes dos jogadores do formulário
-            timeA_jogador1 = request.form.get(f'timeA_jogador1_{jogo}')
-            timeA_jogador2 = request.form.get(f'timeA_jogador2_{jogo}')
-            timeB_jogador1 = request.form.get(f'timeB_jogador1_{jogo}')
-            timeB_jogador2 = request.form.get(f'timeB_jogador2_{jogo}')
-            
-            if torneio_id and all([timeA_jogador1, timeA_jogador2, timeB_jogador1, timeB_jogador2]):
-                # Verificar se já existe este confronto no banco
-                confronto_db = ConfrontoEliminatoria.query.filter_by(
-                    torneio_id=torneio_id,
-                    fase='quartas',
-                    jogo_numero=jogo
-                ).first()
-                
-                # Buscar IDs dos jogadores
-                jogador_a1 = Jogador.query.filter_by(nome=timeA_jogador1, torneio_id=torneio_id).first()
-                jogador_a2 = Jogador.query.filter_by(nome=timeA_jogador2, torneio_id=torneio_id).first()
-                jogador_b1 = Jogador.query.filter_by(nome=timeB_jogador1, torneio_id=torneio_id).first()
-                jogador_b2 = Jogador.query.filter_by(nome=timeB_jogador2, torneio_id=torneio_id).first()
-                
-                if all([jogador_a1, jogador_a2, jogador_b1, jogador_b2]):
-                    if confronto_db:
-                        # Atualizar confronto existente
-                        confronto_db.pontos_dupla_a = timeA
-                        confronto_db.pontos_dupla_b = timeB
-                        confronto_db.atualizado_em = datetime.now()
-                    else:
-                        # Criar novo confronto
-                        confronto_db = ConfrontoEliminatoria(
-                            torneio_id=torneio_id,
-                            fase='quartas',
-                            jogo_numero=jogo,
-                            jogador_a1_id=jogador_a1.id,
-                            jogador_a2_id=jogador_a2.id,
-                            jogador_b1_id=jogador_b1.id,
-                            jogador_b2_id=jogador_b2.id,
-                            pontos_dupla_a=timeA,
-                            pontos_dupla_b=timeB
-                        )
-                        db.session.add(confronto_db)
-                    
-                    db.session.commit()
-                    current_app.logger.info(f"Quartas Jogo {jogo} salvo no DB: {timeA}x{timeB}")
-                else:
-                    current_app.logger.warning(f"Não foi possível encontrar todos os jogadores para o confronto {jogo}")
-            
-            current_app.logger.info(f"Quartas Jogo {jogo} salvo na sessão: {timeA}x{timeB}")
+        jogos_fase = chave.numeros_da_fase(fase)
+        for jogo in jogos_fase:
+            salvar_jogo_eliminatoria(torneio_id, fase, jogo)
+        RatingManager.atualizar_torneio(torneio_id)
 
         session.modified = True
+        
+        # Fase seguinte preenchida: espectadores recarregam a chave
+        EventosManager.publicar(torneio_id, 'chave', {
+            'fase': fase,
+            'jogos': [dict(session[f'eliminatoria_jogo{jogo}'], jogo=jogo) for jogo in jogos_fase]
+        })
         return redirect(url_for('playoffs.fase_eliminatoria'))
     
+    except (ConflitoPlacar, StaleDataError) as e:
+        return responder_conflito_eliminatoria(e)
+    
     except Exception as e:
         current_app.logger.error(
             f"Erro ao salvar quartas: {str(e)}",
@@ -846,7 +491,8 @@ def salvar_eliminatorias():
         flash("Erro ao salvar resultados das quartas", "error")
         return redirect(url_for('playoffs.fase_eliminatoria'))
 
-@bp.route('/salvar_semi_finais', methods=['POST'])
+@rota_do_torneio(bp, '/salvar_semi_finais', methods=['POST'])
+@invalida_cache
 def salvar_semi_finais():
     """Função para salvar os resultados das semi finais"""
     try:
@@ -861,75 +507,24 @@ def salvar_semi_finais():
             flash("A final já foi gerada. Use o botão 'Resetar' se precisar refazer.", "warning")
             return redirect(url_for('playoffs.fase_eliminatoria'))
 
-        if modo == '16j':
-            inicio_semis = 1
-            jogos_semis = [1, 2]
-        else:
-            inicio_semis = {'20j':2, '24j':3, '28j':4, '32j':5}.get(modo, 4)
-            jogos_semis = [inicio_semis, inicio_semis + 1]
-        log_playoff_action("save_semifinals_start", f"Jogos: {inicio_semis}-{inicio_semis+1}")
+        jogos_semis = chave_do_torneio(modo).numeros_da_fase('semi')
+        log_playoff_action("save_semifinals_start", f"Jogos: {jogos_semis[0]}-{jogos_semis[-1]}")
 
-        for jogo in [inicio_semis, inicio_semis + 1]:
-            timeA = int(request.form.get(f'jogo_{jogo}_timeA', 0))
-            timeB = int(request.form.get(f'jogo_{jogo}_timeB', 0))
-
-            current_app.logger.info(f"Salvando jogo {jogo}: {timeA} x {timeB}")
-            
-            # Salvar na sessão
-            session[f'eliminatoria_jogo{jogo}'] = {
-                'timeA': timeA,
-                'timeB': timeB
-            }
-            
-            # Pegar os nomes dos jogadores do formulário
-            timeA_jogador1 = request.form.get(f'timeA_jogador1_{jogo}')
-            timeA_jogador2 = request.form.get(f'timeA_jogador2_{jogo}')
-            timeB_jogador1 = request.form.get(f'timeB_jogador1_{jogo}')
-            timeB_jogador2 = request.form.get(f'timeB_jogador2_{jogo}')
-            
-            if torneio_id and all([timeA_jogador1, timeA_jogador2, timeB_jogador1, timeB_jogador2]):
-                # Verificar se já existe este confronto no banco
-                confronto_db = ConfrontoEliminatoria.query.filter_by(
-                    torneio_id=torneio_id,
-                    fase='semi',
-                    jogo_numero=jogo
-                ).first()
-                
-                # Buscar IDs dos jogadores
-                jogador_a1 = Jogador.query.filter_by(nome=timeA_jogador1, torneio_id=torneio_id).first()
-                jogador_a2 = Jogador.query.filter_by(nome=timeA_jogador2, torneio_id=torneio_id).first()
-                jogador_b1 = Jogador.query.filter_by(nome=timeB_jogador1, torneio_id=torneio_id).first()
-                jogador_b2 = Jogador.query.filter_by(nome=timeB_jogador2, torneio_id=torneio_id).first()
-                
-                if all([jogador_a1, jogador_a2, jogador_b1, jogador_b2]):
-                    if confronto_db:
-                        # Atualizar confronto existente
-                        confronto_db.pontos_dupla_a = timeA
-                        confronto_db.pontos_dupla_b = timeB
-                        confronto_db.atualizado_em = datetime.now()
-                    else:
-                        # Criar novo confronto
-                        confronto_db = ConfrontoEliminatoria(
-                            torneio_id=torneio_id,
-                            fase='semi',
-                            jogo_numero=jogo,
-                            jogador_a1_id=jogador_a1.id,
-                            jogador_a2_id=jogador_a2.id,
-                            jogador_b1_id=jogador_b1.id,
-                            jogador_b2_id=jogador_b2.id,
-                            pontos_dupla_a=timeA,
-                            pontos_dupla_b=timeB
-                        )
-                        db.session.add(confronto_db)
-                    
-                    db.session.commit()
-                else:
-                    current_app.logger.warning(f"Não foi possível encontrar todos os jogadores para o confronto {jogo}")
+        for jogo in jogos_semis:
+            salvar_jogo_eliminatoria(torneio_id, 'semi', jogo)
+        RatingManager.atualizar_torneio(torneio_id)
 
         session.modified = True
+        EventosManager.publicar(torneio_id, 'chave', {
+            'fase': 'semi',
+            'jogos': [dict(session[f'eliminatoria_jogo{jogo}'], jogo=jogo) for jogo in jogos_semis]
+        })
         current_app.logger.info(f"Semi-finais salvas com sucesso para modo {modo}")
         return redirect(url_for('playoffs.fase_eliminatoria'))
     
+    except (ConflitoPlacar, StaleDataError) as e:
+        return responder_conflito_eliminatoria(e)
+    
     except Exception as e:
         current_app.logger.error(
             f"Erro ao salvar semi-finais: {str(e)}",
@@ -939,13 +534,15 @@ def salvar_semi_finais():
         flash("Erro ao salvar semi-finais", "error")
         return redirect(url_for('playoffs.fase_eliminatoria'))
 
-@bp.route('/salvar_final', methods=['POST'])
+@rota_do_torneio(bp, '/salvar_final', methods=['POST'])
+@invalida_cache
 def salvar_final():
     """Função para salvar os resultados da final"""
     try:
         modo = request.form.get('modo', '28j')
         torneio_id = session.get('torneio_id')
-        jogo_final = {'16j':3, '20j':4, '24j':5, '28j':6, '32j':7}.get(modo, 6)
+        chave = chave_do_torneio(modo)
+        jogo_final = chave.jogo_final
 
         # Obter os nomes dos jogadores do formulário
         timeA_jogador1 = request.form.get('timeA_jogador1', 'N/A')
@@ -974,16 +571,16 @@ def salvar_final():
 
         # VERIFICAR: Buscar IDs dos jogadores da sessão
         if torneio_id and all([timeA_jogador1, timeA_jogador2, timeB_jogador1, timeB_jogador2]):
-            # Buscar IDs no dicionário de jogadores
-            jogadores_dict = session.get('jogadores', {})
+            # Buscar IDs no elenco do torneio
+            elenco = ElencoTorneio.carregar(torneio_id)
             
             timeA_ids = [
-                jogadores_dict.get(timeA_jogador1, {}).get('id'),
-                jogadores_dict.get(timeA_jogador2, {}).get('id')
+                elenco.id_do_jogador(timeA_jogador1),
+                elenco.id_do_jogador(timeA_jogador2)
             ]
             timeB_ids = [
-                jogadores_dict.get(timeB_jogador1, {}).get('id'),
-                jogadores_dict.get(timeB_jogador2, {}).get('id')
+                elenco.id_do_jogador(timeB_jogador1),
+                elenco.id_do_jogador(timeB_jogador2)
             ]
             
             # Verificar se todos os IDs foram encontrados
@@ -996,11 +593,12 @@ def salvar_final():
                 ).first()
                 
                 if confronto_db:
-                    # Atualizar confronto existente
-                    confronto_db.pontos_dupla_a = timeA
-                    confronto_db.pontos_dupla_b = timeB
-                    confronto_db.atualizado_em = datetime.now()
-                    log_playoff_action("final_atualizada", f"Final atualizada: {timeA}x{timeB}")
+                    # Atualizar confronto existente (só se o placar foi editado nesta página)
+                    if placar_eliminatoria_editado(confronto_db, jogo_final, timeA, timeB):
+                        confronto_db.pontos_dupla_a = timeA
+                        confronto_db.pontos_dupla_b = timeB
+                        confronto_db.atualizado_em = datetime.now()
+                        log_playoff_action("final_atualizada", f"Final atualizada: {timeA}x{timeB}")
                 else:
                     # Criar novo confronto
                     confronto_db = ConfrontoEliminatoria(
@@ -1023,7 +621,19 @@ def salvar_final():
                 current_app.logger.warning(f"⚠️ IDs dos jogadores não encontrados para salvar final")
                 current_app.logger.warning(f"timeA_ids: {timeA_ids}, timeB_ids: {timeB_ids}")
         
+        # Disputa de 3º lugar, enviada no mesmo formulário da final
+        jogos = [{'jogo': jogo_final, 'timeA': timeA, 'timeB': timeB}]
+        if chave.jogo_terceiro and f'jogo_{chave.jogo_terceiro}_timeA' in request.form:
+            salvar_jogo_eliminatoria(torneio_id, 'terceiro', chave.jogo_terceiro)
+            jogos.append(dict(session[f'eliminatoria_jogo{chave.jogo_terceiro}'], jogo=chave.jogo_terceiro))
+        if torneio_id:
+            RatingManager.atualizar_torneio(torneio_id)
+        
         session.modified = True
+        EventosManager.publicar(torneio_id, 'eliminatoria', {
+            'fase': 'final',
+            'jogos': jogos
+        })
         return redirect(url_for('playoffs.fase_eliminatoria'))
         
         # Determina os campeões
@@ -1042,12 +652,12 @@ def salvar_final():
             # Obter IDs dos jogadores
             # Precisamos encontrar os IDs no dicionário de jogadores
             timeA_ids = [
-                session['jogadores'].get(timeA_jogador1, {}).get('id', None),
-                session['jogadores'].get(timeA_jogador2, {}).get('id', None)
+                session.get('jogadores', {}).get(timeA_jogador1, {}).get('id', None),
+                session.get('jogadores', {}).get(timeA_jogador2, {}).get('id', None)
             ]
             timeB_ids = [
-                session['jogadores'].get(timeB_jogador1, {}).get('id', None),
-                session['jogadores'].get(timeB_jogador2, {}).get('id', None)
+                session.get('jogadores', {}).get(timeB_jogador1, {}).get('id', None),
+                session.get('jogadores', {}).get(timeB_jogador2, {}).get('id', None)
             ]
             
             # Verificar se todos os IDs foram encontrados
@@ -1080,24 +690,36 @@ def salvar_final():
         session.modified = True
         return redirect(url_for('playoffs.fase_eliminatoria'))
     
+    except (ConflitoPlacar, StaleDataError) as e:
+        return responder_conflito_eliminatoria(e)
+    
     except Exception as e:
         current_app.logger.error(f"Erro ao salvar final: {str(e)}")
         db.session.rollback()
         flash("Erro ao salvar a final", "error")
         return redirect(url_for('playoffs.fase_eliminatoria'))
 
-@bp.route('/finalizar_torneio')
+@rota_do_torneio(bp, '/finalizar_torneio')
+@invalida_cache
 def finalizar_torneio():
     """Função para finalizar o torneio"""
     try:
-        modo = session.get('modo_torneio', '28j')
         torneio_id = session.get('torneio_id')
-        jogo_final = {'16j':3, '20j':4, '24j':5, '28j':6, '32j':7}.get(modo, 6)
+        chave = chave_do_torneio()
+        if not chave:
+            current_app.logger.error(f"Modo de torneio inválido: {session.get('modo_torneio')}")
+            flash("Modo de torneio inválido", "error")
+            return redirect(url_for('main.novo_torneio'))
+        jogo_final = chave.jogo_final
         
         if f'eliminatoria_jogo{jogo_final}' not in session:
             flash("A final ainda não foi disputada!", "error")
             return redirect(url_for('playoffs.fase_eliminatoria'))
         
+        if chave.jogo_terceiro and f'eliminatoria_jogo{chave.jogo_terceiro}' not in session:
+            flash("A disputa de 3º lugar ainda não foi disputada!", "error")
+            return redirect(url_for('playoffs.fase_eliminatoria'))
+        
         final_data = session[f'eliminatoria_jogo{jogo_final}']
         
         # Determinar vencedor
@@ -1131,6 +753,15 @@ def finalizar_torneio():
                 else:
                     current_app.logger.warning(f"Erro ao calcular pontuação do torneio {torneio_id}")
                     flash("Erro ao calcular pontuação do ranking", "warning")
+                
+                # Página de detalhes passa a ser servida do snapshot
+                SnapshotManager.gerar(torneio_id)
+                
+                EventosManager.publicar(torneio_id, 'campeao', {
+                    'campeoes': [jogador['nome'] for jogador in campeoes],
+                    'vice_campeoes': [jogador['nome'] for jogador in vice_campeoes],
+                    'placar': session['campeoes_finais']['placar']
+                })
         
         return redirect(url_for('playoffs.campeoes'))
     
@@ -1139,7 +770,7 @@ def finalizar_torneio():
         flash("Erro ao finalizar o torneio", "error")
         return redirect(url_for('playoffs.fase_eliminatoria'))
     
-@bp.route('/campeoes')
+@rota_do_torneio(bp, '/campeoes')
 def campeoes():
     """Função para apresentar os campeões de um torneio"""
     try:
@@ -1198,6 +829,13 @@ def obter_confrontos_eliminatorias_db(torneio_id):
         log_playoff_action("confrontos_eliminatorias_load_error", f"Erro ao carregar confrontos: {str(e)}")
         return {}
 
+def fases_montadas_depois(fase):
+    """Fases da chave do torneio montadas a partir do resultado de 'fase'"""
+    chave = chave_do_torneio()
+    if not chave or fase not in chave.fases:
+        return []
+    return chave.fases_posteriores(fase)
+
 def verificar_fase_ja_existe(torneio_id, fase):
     """Verifica se uma fase já foi criada no banco"""
     try:
@@ -1211,7 +849,8 @@ def verificar_fase_ja_existe(torneio_id, fase):
         current_app.logger.error(f"Erro ao verificar fase: {str(e)}")
         return False
 
-@bp.route('/editar_confronto/<int:confronto_id>', methods=['GET', 'POST'])
+@rota_do_torneio(bp, '/editar_confronto/<int:confronto_id>', methods=['GET', 'POST'])
+@invalida_cache
 def editar_confronto(confronto_id):
     """Permite editar um confronto já salvo"""
     try:
@@ -1233,6 +872,12 @@ def editar_confronto(confronto_id):
                 flash("Não é permitido empate! Os placares devem ser diferentes.", "error")
                 return redirect(url_for('playoffs.editar_confronto', confronto_id=confronto_id))
             
+            # Formulário aberto antes de outro dispositivo alterar o jogo: não sobrescrever
+            if not placar_editado(confronto, (novo_placar_a, novo_placar_b),
+                                  versao=request.form.get('versao', type=int)):
+                flash("O placar não foi alterado.", "info")
+                return redirect(url_for('playoffs.fase_eliminatoria'))
+            
             # Atualizar no banco
             confronto.pontos_dupla_a = novo_placar_a
             confronto.pontos_dupla_b = novo_placar_b
@@ -1252,49 +897,47 @@ def editar_confronto(confronto_id):
             
             flash(f"Resultado do jogo {confronto.jogo_numero} atualizado com sucesso!", "success")
             
-            # Se for quartas ou semi, verificar se precisa deletar fases posteriores
-            if confronto.fase == 'quartas':
-                # Deletar semi-finais e final
-                ConfrontoEliminatoria.query.filter_by(
-                    torneio_id=torneio_id,
-                    fase='semi'
-                ).delete()
-                ConfrontoEliminatoria.query.filter_by(
-                    torneio_id=torneio_id,
-                    fase='final'
-                ).delete()
+            # Fases montadas a partir deste jogo (ver database/chave.py) são refeitas
+            fases_refeitas = fases_montadas_depois(confronto.fase)
+            if fases_refeitas:
+                ConfrontoEliminatoria.query.filter(
+                    ConfrontoEliminatoria.torneio_id == torneio_id,
+                    ConfrontoEliminatoria.fase.in_(fases_refeitas)
+                ).delete(synchronize_session=False)
                 
                 # Limpar sessão das fases posteriores
-                modo = session.get('modo_torneio', '28j')
-                jogos_para_limpar = range(1, 8)  # Limpar todos os jogos possíveis
-                for jogo in jogos_para_limpar:
-                    if jogo > confronto.jogo_numero:  # Só limpar jogos posteriores
+                chave = chave_do_torneio()
+                for fase in fases_refeitas:
+                    for jogo in chave.numeros_da_fase(fase):
                         session.pop(f'eliminatoria_jogo{jogo}', None)
+                if 'final' in fases_refeitas:
+                    session.pop('final_dupla_timeA', None)
+                    session.pop('final_dupla_timeB', None)
                 
                 db.session.commit()
-                flash("Semi-finais e final foram resetadas devido à alteração nas quartas.", "info")
-                
-            elif confronto.fase == 'semi':
-                # Deletar apenas a final
-                ConfrontoEliminatoria.query.filter_by(
-                    torneio_id=torneio_id,
-                    fase='final'
-                ).delete()
-                
-                # Limpar sessão da final
-                modo = session.get('modo_torneio', '28j')
-                jogo_final = {'16j':3, '20j':4, '24j':5, '28j':6, '32j':7}.get(modo, 6)
-                session.pop(f'eliminatoria_jogo{jogo_final}', None)
-                session.pop('final_dupla_timeA', None)
-                session.pop('final_dupla_timeB', None)
-                
-                db.session.commit()
-                flash("Final foi resetada devido à alteração nas semi-finais.", "info")
+                nomes = [TITULOS_FASES[fase] for fase in fases_refeitas]
+                texto = ', '.join(nomes[:-1]) + ' e ' + nomes[-1] if len(nomes) > 1 else nomes[0]
+                flash(f"Fases resetadas devido à alteração em {TITULOS_FASES[confronto.fase]}: {texto}.", "info")
+            
+            # Rating deste torneio e dos criados depois dele
+            RatingManager.atualizar_torneio(torneio_id)
+            
+            # Torneio já finalizado: refazer o snapshot com o novo resultado
+            torneio = Torneio.query.get(torneio_id)
+            if torneio and torneio.finalizado:
+                SnapshotManager.gerar(torneio_id)
+            
+            EventosManager.publicar(torneio_id, 'recarregar', {'motivo': 'edicao'})
             
             return redirect(url_for('playoffs.fase_eliminatoria'))
         
         # GET: Mostrar formulário de edição
-        return render_template('editar_confronto.html', confronto=confronto)
+        return render_template('editar_confronto.html', confronto=confronto,
+                               titulo_fase=TITULOS_FASES.get(confronto.fase, confronto.fase),
+                               fases_refeitas=[TITULOS_FASES[fase] for fase in fases_montadas_depois(confronto.fase)])
+    
+    except (ConflitoPlacar, StaleDataError) as e:
+        return responder_conflito_eliminatoria(e)
         
     except Exception as e:
         current_app.logger.error(f"Erro ao editar confronto: {str(e)}", exc_info=True)
@@ -1317,7 +960,8 @@ def editar_confronto_por_jogo(torneio_id, fase, jogo_numero):
         flash("Confronto não encontrado.", "error")
         return redirect(url_for('playoffs.fase_eliminatoria'))
 
-@bp.route('/resetar_eliminatorias', methods=['GET'])
+@rota_do_torneio(bp, '/resetar_eliminatorias', methods=['GET'])
+@invalida_cache
 def resetar_eliminatorias():
     """Reseta os dados de fase eliminatória da sessão e do banco de dados"""
     try:
@@ -1328,6 +972,8 @@ def resetar_eliminatorias():
             # Excluir todos os confrontos eliminatórios deste torneio do banco de dados
             ConfrontoEliminatoria.query.filter_by(torneio_id=torneio_id).delete()
             db.session.commit()
+            RatingManager.atualizar_torneio(torneio_id)
+            EventosManager.publicar(torneio_id, 'recarregar', {'motivo': 'reset_eliminatorias'})
             log_playoff_action("reset_db_eliminatorias", f"Confrontos eliminatórios do torneio {torneio_id} removidos do banco")
         
         # Limpar dados das eliminatórias na sessão
@@ -1351,7 +997,8 @@ def resetar_eliminatorias():
         log_playoff_action("reset_eliminatorias_error", f"Erro: {str(e)}")
         return jsonify({'success': False, 'error': str(e)})
 
-@bp.route('/resetar_e_voltar', methods=['GET'])
+@rota_do_torneio(bp, '/resetar_e_voltar', methods=['GET'])
+@invalida_cache
 def resetar_e_voltar():
     """Reseta os dados de fase eliminatória e redireciona para a página de novo torneio"""
     try:
@@ -1362,6 +1009,8 @@ def resetar_e_voltar():
             # Excluir todos os confrontos eliminatórios deste torneio do banco de dados
             ConfrontoEliminatoria.query.filter_by(torneio_id=torneio_id).delete()
             db.session.commit()
+            RatingManager.atualizar_torneio(torneio_id)
+            EventosManager.publicar(torneio_id, 'recarregar', {'motivo': 'reset_eliminatorias'})
             log_playoff_action("reset_db_eliminatorias", f"Confrontos eliminatórios do torneio {torneio_id} removidos do banco")
         
         # Limpar dados das eliminatórias na sessão
@@ -0,0 +1,110 @@
+// Placar ao vivo: aplica na página os eventos enviados por /eventos/<torneio_id>
+(function () {
+    const raiz = document.getElementById('placar-ao-vivo');
+    if (!raiz || !window.EventSource) {
+        return;
+    }
+
+    const pagina = raiz.dataset.pagina; // 'grupos' ou 'eliminatoria'
+    const fonte = new EventSource(raiz.dataset.url);
+
+    function definirValor(input, valor) {
+        // Não sobrescrever o campo que o usuário está digitando
+        if (input && document.activeElement !== input) {
+            input.value = valor === null || valor === undefined ? '' : valor;
+        }
+    }
+
+    function celula(texto, classe) {
+        const td = document.createElement('td');
+        td.textContent = texto;
+        if (classe) {
+            td.className = classe;
+        }
+        return td;
+    }
+
+    function linhaClassificacao(jogador, posicao) {
+        const tr = document.createElement('tr');
+        const saldo = jogador.saldo_total;
+        tr.append(
+            celula(posicao),
+            celula(jogador.nome),
+            celula(jogador.vitorias),
+            celula(jogador.saldo_a_favor),
+            celula(jogador.saldo_contra),
+            celula(saldo, saldo > 0 ? 'positivo' : (saldo < 0 ? 'negativo' : '')),
+            celula('-', 'chance-classificacao')
+        );
+        tr.lastChild.dataset.nome = jogador.nome;
+        return tr;
+    }
+
+    function atualizarGrupo(grupo) {
+        const g = grupo.grupo_idx;
+        grupo.confrontos.forEach(function (placar, c) {
+            definirValor(document.getElementById(`grupo_${g}_confronto_${c}_duplaA_favor`), placar[0]);
+            definirValor(document.getElementById(`grupo_${g}_confronto_${c}_duplaB_favor`), placar[1]);
+        });
+
+        const corpo = document.querySelector(`table[data-grupo="${g}"] tbody`);
+        if (corpo) {
+            corpo.replaceChildren(...grupo.classificacao.map(function (jogador, i) {
+                return linhaClassificacao(jogador, i + 1);
+            }));
+        }
+    }
+
+    // Resultados e classificação de grupos
+    fonte.addEventListener('grupo', function (evento) {
+        if (pagina !== 'grupos') {
+            return;
+        }
+        JSON.parse(evento.data).grupos.forEach(atualizarGrupo);
+        // Chances de classificação são recalculadas pela página
+        document.dispatchEvent(new CustomEvent('placar:grupos'));
+    });
+
+    // Placar de jogos eliminatórios já exibidos na página
+    fonte.addEventListener('eliminatoria', function (evento) {
+        if (pagina !== 'eliminatoria') {
+            return;
+        }
+        const dados = JSON.parse(evento.data);
+        for (const jogo of dados.jogos) {
+            const inputA = document.querySelector(`input[name="jogo_${jogo.jogo}_timeA"]`);
+            const inputB = document.querySelector(`input[name="jogo_${jogo.jogo}_timeB"]`);
+            if (!inputA || !inputB) {
+                // Página desatualizada: o jogo ainda não aparece nela
+                window.location.reload();
+                return;
+            }
+            definirValor(inputA, jogo.timeA);
+            definirValor(inputB, jogo.timeB);
+        }
+    });
+
+    // Nova fase preenchida na chave: as duplas só vêm do servidor
+    fonte.addEventListener('chave', function () {
+        if (pagina === 'eliminatoria') {
+            window.location.reload();
+        }
+    });
+
+    // Sorteio, trocas, edições e resets mudam a estrutura da página
+    fonte.addEventListener('recarregar', function () {
+        window.location.reload();
+    });
+
+    fonte.addEventListener('campeao', function (evento) {
+        const dados = JSON.parse(evento.data);
+        let aviso = document.getElementById('aviso-campeao');
+        if (!aviso) {
+            aviso = document.createElement('div');
+            aviso.id = 'aviso-campeao';
+            aviso.className = 'alert alert-success text-center';
+            raiz.parentNode.insertBefore(aviso, raiz);
+        }
+        aviso.textContent = `🏆 Campeões: ${dados.campeoes.join(' & ')} (${dados.placar})`;
+    });
+})();
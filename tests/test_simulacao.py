@@ -0,0 +1,53 @@
+"""A simulação de database/simulacao.py segue a cadeia de desempate de database/classificacao.py"""
+import random
+import numpy as np
+import pytest
+from database.classificacao import estatisticas_zeradas, ordenar_entre_grupos, ordenar_grupo, somar_placar
+from database.simulacao import simular
+
+# Confrontos de um grupo pela posição no sorteio, como em routes/groups.py:gerar_confrontos
+DUPLAS = [((0, 1), (2, 3)), ((0, 2), (1, 3)), ((0, 3), (1, 2))]
+# Outros arranjos (duplas repetidas, lados trocados), que a simulação também aceita
+TODAS_AS_DUPLAS = DUPLAS + [(dupla_b, dupla_a) for dupla_a, dupla_b in DUPLAS]
+# Placares com empates frequentes em vitórias, saldo e pontos a favor (e empates no jogo)
+PLACARES = [(6, 3), (3, 6), (6, 4), (4, 6), (5, 5), (6, 0), (0, 6), (7, 6), (6, 7)]
+
+
+def vagas_pela_classificacao(duplas, pontos):
+    """{(grupo, posição no sorteio): vaga} pela ordenação de database/classificacao.py"""
+    primeiros, segundos = [], []
+    for grupo_idx, (confrontos, placares) in enumerate(zip(duplas, pontos)):
+        estatisticas = {i: dict(estatisticas_zeradas(), id=i, grupo=grupo_idx) for i in range(4)}
+        resultados = []
+        for (dupla_a, dupla_b), (pontos_a, pontos_b) in zip(confrontos, placares):
+            somar_placar(estatisticas, dupla_a, dupla_b, pontos_a, pontos_b)
+            resultados.append((dupla_a, dupla_b, pontos_a, pontos_b))
+        grupo = ordenar_grupo(list(estatisticas.values()), resultados, [0, 1, 2, 3], chave='id')
+        primeiros.append(grupo[0])
+        segundos.append(grupo[1])
+
+    ordenar_entre_grupos(primeiros)
+    ordenar_entre_grupos(segundos)
+    vagas = {(j['grupo'], j['id']): i for i, j in enumerate(primeiros)}
+    vagas.update({(j['grupo'], j['id']): len(pontos) + i for i, j in enumerate(segundos)})
+    return vagas
+
+
+@pytest.mark.parametrize('rodizio', [True, False], ids=['rodizio', 'duplas_repetidas'])
+@pytest.mark.parametrize('semente', range(3))
+def test_grupos_jogados_seguem_a_cadeia_de_desempate(semente, rodizio):
+    rng = random.Random(semente)
+    for _ in range(600):
+        num_grupos = rng.randint(1, 6)
+        duplas = [DUPLAS if rodizio else [rng.choice(TODAS_AS_DUPLAS) for _ in range(3)]
+                  for _ in range(num_grupos)]
+        pontos = [[rng.choice(PLACARES) for _ in range(3)] for _ in range(num_grupos)]
+        jogos = np.array([[dupla_a + dupla_b for dupla_a, dupla_b in confrontos] for confrontos in duplas])
+
+        # Sem jogos restantes a simulação é determinística: uma execução basta
+        contagem = simular(jogos, np.array(pontos), np.full((num_grupos, 3), 0.5),
+                           np.array([(6, 3)]), 1, 0)
+
+        simuladas = {(g, i): int(np.flatnonzero(contagem[g, i])[0])
+                     for g in range(num_grupos) for i in range(4) if contagem[g, i].any()}
+        assert simuladas == vagas_pela_classificacao(duplas, pontos), (duplas, pontos)